@@ -0,0 +1,53 @@
+"""Bounded LRU cache of serialized read responses.
+
+Keys embed the store version the response was built from, so a write
+makes the affected keys unreachable instead of requiring explicit
+invalidation; stale entries simply age out of the LRU.
+"""
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """LRU of ``key -> (body, headers)`` bounded by entry count and total body bytes"""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, headers=None):
+        # A body that would evict most of the cache is not worth keeping
+        if len(body) > self.max_bytes // 4 or self.max_entries <= 0:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = (body, dict(headers or {}))
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,74 @@
+"""Bounded in-memory feed of registry changes for live clients.
+
+The mutation handlers publish one event per created, updated or deleted
+monkey. Events get consecutive sequence numbers and are encoded to JSON
+once, when published, into a ring buffer of the last ``size`` events, so
+handing an event to any number of subscribers never re-serializes it.
+
+Subscribers hold no queue of their own: each only remembers the last
+sequence it has seen, waits for the next publish and then reads what it
+missed straight from the ring buffer. Memory is therefore bounded by the
+buffer whatever the number of subscribers, and a subscriber that falls
+more than ``size`` events behind is told to reload instead of being
+buffered for.
+
+Sequence numbers can start anywhere (the server starts them at the
+current time in microseconds), so that a client resuming from a number
+handed out before a restart is told to reload rather than being given
+unrelated events that happen to reuse its numbers.
+"""
+import asyncio
+import json
+from collections import deque
+from itertools import islice
+
+
+class ChangeFeed:
+    """Ring buffer of encoded change events with sequence-based catch-up"""
+
+    def __init__(self, size=1000, start=0):
+        self.size = size
+        self.sequence = start
+        self._events = deque(maxlen=size)
+        # Resolved by the next publish; shared by every waiting subscriber
+        self._published = None
+
+    def __len__(self):
+        return len(self._events)
+
+    def publish(self, op, monkey_id, encoded=None):
+        """Record that ``monkey_id`` was created, updated or deleted and wake
+        every subscriber; ``encoded`` is the JSON of the monkey as now stored"""
+        self.sequence += 1
+        head = json.dumps({'sequence': self.sequence, 'op': op, 'monkey_id': monkey_id})
+        event = f'{head[:-1]}, "monkey": '.encode() + (encoded or b'null') + b'}'
+        self._events.append((self.sequence, event))
+        published, self._published = self._published, None
+        if published is not None and not published.done() and not published.get_loop().is_closed():
+            published.set_result(None)
+        return self.sequence
+
+    def since(self, sequence):
+        """``(sequence, encoded event)`` pairs published after ``sequence``,
+        or None if some of them have already left the buffer"""
+        if sequence > self.sequence:
+            return None
+        missed = self.sequence - sequence
+        if missed > len(self._events):
+            return None
+        # Walk back from the newest, so catching up costs what was missed
+        return list(islice(reversed(self._events), missed))[::-1]
+
+    async def wait(self, sequence, timeout=None):
+        """Wait until an event after ``sequence`` is published or ``timeout`` passes"""
+        if self.sequence > sequence:
+            return
+        loop = asyncio.get_running_loop()
+        if self._published is None or self._published.get_loop() is not loop:
+            self._published = loop.create_future()
+        try:
+            # Shielded so that one subscriber timing out leaves the shared
+            # future pending for the others
+            await asyncio.wait_for(asyncio.shield(self._published), timeout)
+        except asyncio.TimeoutError:
+            pass
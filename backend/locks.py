@@ -0,0 +1,56 @@
+"""Per-key asyncio locks for serializing registry mutations.
+
+Mutations of the same monkey (keyed by ``monkey_id``) or of the same name
+within a species (keyed by species and casefolded name) are serialized;
+everything else, including every read, runs without locking. Lock entries
+are reference counted and dropped once no task holds or waits for them, so
+the table only ever holds keys that are in use.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+
+def name_key(species, name):
+    return ('name', species, name.casefold())
+
+
+def id_key(monkey_id):
+    return ('id', monkey_id)
+
+
+class KeyedLocks:
+    """A table of asyncio locks created on demand for arbitrary hashable keys"""
+
+    def __init__(self):
+        self._locks = {}
+
+    def __len__(self):
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, *keys):
+        """Acquire the locks for ``keys`` in a canonical order and release them on exit"""
+        acquired = []
+        try:
+            for key in sorted(set(keys)):
+                entry = self._locks.get(key)
+                if entry is None:
+                    entry = self._locks[key] = [asyncio.Lock(), 0]
+                entry[1] += 1
+                try:
+                    await entry[0].acquire()
+                except BaseException:
+                    self._unref(key)
+                    raise
+                acquired.append(key)
+            yield
+        finally:
+            for key in reversed(acquired):
+                self._locks[key][0].release()
+                self._unref(key)
+
+    def _unref(self, key):
+        entry = self._locks[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._locks[key]
@@ -0,0 +1,94 @@
+"""Opt-in sampling profiler for a window of live requests.
+
+``SamplingProfiler.start()`` spawns a thread that, every ``interval``
+seconds, captures the stack of the thread running the event loop, but
+only while at least one request is being handled. After the window's
+number of requests has completed (or ``max_seconds`` have passed) it
+stops and keeps the result as collapsed stacks, one ``frame;frame;frame
+count`` line per distinct stack, which flamegraph.pl, speedscope and
+similar tools read directly. Nothing is sampled until a profile is
+started, so the profiler costs two integer updates per request otherwise.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{Path(code.co_filename).stem}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse(frame):
+    """The stack ending at ``frame`` as ``root;...;leaf``"""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples one thread's stack while requests are in flight, for a window of requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stacks = Counter()
+        self._in_flight = 0
+        self._remaining = 0
+        self.samples = 0
+        self.result = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id, requests=100, interval=0.005, max_seconds=60.0):
+        """Profile ``thread_id`` until ``requests`` more requests have completed"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A profile is already running")
+            self._stop.clear()
+            self._stacks = Counter()
+            self._remaining = requests
+            self.samples = 0
+            self.result = None
+            self._thread = threading.Thread(
+                target=self._run, args=(thread_id, interval, max_seconds),
+                name="monkey-profiler", daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self):
+        """End the running profile, if any, and wait for its result"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def request_started(self):
+        self._in_flight += 1
+
+    def request_finished(self):
+        self._in_flight -= 1
+        if self._remaining > 0:
+            self._remaining -= 1
+            if self._remaining == 0:
+                self._stop.set()
+
+    def _run(self, thread_id, interval, max_seconds):
+        deadline = time.monotonic() + max_seconds
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            if not self._in_flight:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            self._stacks[collapse(frame)] += 1
+            self.samples += 1
+            del frame
+        self.result = ''.join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
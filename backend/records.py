@@ -0,0 +1,110 @@
+"""Compact in-memory form of the registry's records.
+
+A record held as a dict costs a hash table of nine entries (272 bytes)
+on top of its values, and every record loaded from JSON brings its own
+copies of strings most records share. ``MonkeyRecord`` keeps the fields
+in ``__slots__`` instead (104 bytes), interns the species and favourite
+fruit so each distinct value is stored once, reuses ``created_at`` for
+``updated_at`` while a monkey has never been updated, and takes its
+``monkey_id`` from the registry key rather than holding a second copy.
+
+Records still read like the dicts they replace: ``record['name']``,
+``record.get(...)``, ``dict(record)`` and ``Monkey(**record)`` all work,
+so code outside the store is unaffected. Code in the hot loops of the
+store reads attributes (``record.name``), which costs the same as a dict
+lookup, whereas subscripting a ``MonkeyRecord`` costs a method call.
+Records are never mutated in place; updates replace the whole record.
+"""
+import sys
+from collections.abc import Mapping
+
+
+# The fields of a stored monkey, in the order the API returns them
+FIELDS = ('monkey_id', 'name', 'species', 'age_years', 'favourite_fruit',
+          'last_checkup_at', 'created_at', 'updated_at', 'version')
+
+
+class MonkeyRecord:
+    """Read-only mapping of the fields of one stored monkey"""
+
+    __slots__ = FIELDS
+
+    def __init__(self, monkey_id, name, species, age_years, favourite_fruit,
+                 last_checkup_at, created_at, updated_at, version):
+        self.monkey_id = monkey_id
+        self.name = name
+        self.species = sys.intern(species)
+        self.age_years = age_years
+        self.favourite_fruit = sys.intern(favourite_fruit)
+        self.last_checkup_at = last_checkup_at
+        self.created_at = created_at
+        self.updated_at = created_at if updated_at == created_at else updated_at
+        self.version = version
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except (AttributeError, TypeError):
+            raise KeyError(field) from None
+
+    def get(self, field, default=None):
+        return getattr(self, field, default) if field in FIELDS else default
+
+    def __contains__(self, field):
+        return field in FIELDS
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def keys(self):
+        return FIELDS
+
+    def values(self):
+        return [getattr(self, field) for field in FIELDS]
+
+    def items(self):
+        return [(field, getattr(self, field)) for field in FIELDS]
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def __eq__(self, other):
+        if isinstance(other, MonkeyRecord):
+            return self.values() == other.values()
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"MonkeyRecord({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return MonkeyRecord, tuple(self.values())
+
+
+Mapping.register(MonkeyRecord)
+
+
+def compact(record, monkey_id=None):
+    """The ``MonkeyRecord`` form of a record dict; ``monkey_id``, if given,
+    is the registry key to share. Fields other than ``FIELDS`` are dropped."""
+    if isinstance(record, MonkeyRecord):
+        return record
+    get = record.get
+    return MonkeyRecord(
+        monkey_id if monkey_id is not None else record['monkey_id'], record['name'], record['species'],
+        record['age_years'], record['favourite_fruit'], get('last_checkup_at'),
+        record['created_at'], get('updated_at', record['created_at']), get('version', 1),
+    )
+
+
+def compact_all(data):
+    """Replace every record of a registry mapping by its compact form, in place"""
+    for monkey_id, record in data.items():
+        data[monkey_id] = compact(record, monkey_id)
+    return data
@@ -0,0 +1,168 @@
+"""Incremental name search indexes used by ``MonkeyStore``.
+
+``NameSearchIndex`` answers the ``search`` parameter of the list endpoint:
+a substring match against lowercased names. Each indexed monkey gets a
+sequence number that follows the store's iteration order, and a trigram
+index maps every three-character slice of a name to the sequence numbers
+containing it, so a query only verifies the records that carry all of its
+trigrams. ``SortedIndex`` keeps ``(key, monkey_id)`` pairs in order and
+serves prefix (autocomplete) lookups with two binary searches.
+"""
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SortedIndex:
+    """Ordered list of unique ``(key, monkey_id)`` pairs"""
+
+    def __init__(self):
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def build(cls, pairs):
+        index = cls()
+        index._entries = sorted(pairs)
+        return index
+
+    def add(self, key, monkey_id):
+        insort(self._entries, (key, monkey_id))
+
+    def remove(self, key, monkey_id):
+        i = bisect_left(self._entries, (key, monkey_id))
+        if i < len(self._entries) and self._entries[i] == (key, monkey_id):
+            del self._entries[i]
+
+    def walk(self, after=None, descending=False, low=None, high=None):
+        """Yield ``(key, monkey_id)`` pairs strictly past the ``after`` pair,
+        keeping to keys ``low <= key < high`` if either bound is given"""
+        entries = self._entries
+        if descending:
+            i = len(entries) if after is None else bisect_left(entries, after)
+            if high is not None:
+                i = min(i, bisect_left(entries, (high,)))
+            while i > 0:
+                i -= 1
+                if low is not None and entries[i][0] < low:
+                    return
+                yield entries[i]
+        else:
+            i = 0 if after is None else bisect_right(entries, after)
+            if low is not None:
+                i = max(i, bisect_left(entries, (low,)))
+            while i < len(entries):
+                if high is not None and entries[i][0] >= high:
+                    return
+                yield entries[i]
+                i += 1
+
+    def count_below(self, key):
+        """Number of pairs whose key sorts before ``key``"""
+        return bisect_left(self._entries, (key,))
+
+    def prefix(self, prefix):
+        """Yield ``(key, monkey_id)`` pairs whose key starts with ``prefix``, in order"""
+        i = bisect_left(self._entries, (prefix,))
+        entries = self._entries
+        while i < len(entries) and entries[i][0].startswith(prefix):
+            yield entries[i]
+            i += 1
+
+
+class NameSearchIndex:
+    """Trigram and prefix indexes over lowercased monkey names"""
+
+    def __init__(self):
+        self._next_seq = 0
+        self._seq_of = {}
+        self._entry_of = {}
+        self._grams = {}
+        self._prefixes = SortedIndex()
+
+    @classmethod
+    def build(cls, pairs):
+        """Index ``(monkey_id, name)`` pairs in bulk, in the given order"""
+        index = cls()
+        prefixes = []
+        for monkey_id, name in pairs:
+            lowered = name.lower()
+            seq = index._seq_of[monkey_id] = index._next_seq
+            index._next_seq += 1
+            index._entry_of[seq] = (monkey_id, lowered)
+            for gram in trigrams(lowered):
+                postings = index._grams.get(gram)
+                if postings is None:
+                    postings = index._grams[gram] = set()
+                postings.add(seq)
+            prefixes.append((lowered, monkey_id))
+        index._prefixes = SortedIndex.build(prefixes)
+        return index
+
+    def __len__(self):
+        return len(self._seq_of)
+
+    @property
+    def order(self):
+        """``SortedIndex`` of ``(lowercased name, monkey_id)`` pairs"""
+        return self._prefixes
+
+    def add(self, monkey_id, name):
+        """Index ``name``; an already indexed monkey keeps its position"""
+        lowered = name.lower()
+        seq = self._seq_of.get(monkey_id)
+        if seq is None:
+            seq = self._seq_of[monkey_id] = self._next_seq
+            self._next_seq += 1
+        else:
+            old = self._entry_of[seq][1]
+            if old == lowered:
+                return
+            self._unlink(seq, old, monkey_id)
+        self._entry_of[seq] = (monkey_id, lowered)
+        for gram in trigrams(lowered):
+            postings = self._grams.get(gram)
+            if postings is None:
+                postings = self._grams[gram] = set()
+            postings.add(seq)
+        self._prefixes.add(lowered, monkey_id)
+
+    def remove(self, monkey_id):
+        seq = self._seq_of.pop(monkey_id, None)
+        if seq is None:
+            return
+        _, lowered = self._entry_of.pop(seq)
+        self._unlink(seq, lowered, monkey_id)
+
+    def _unlink(self, seq, lowered, monkey_id):
+        for gram in trigrams(lowered):
+            postings = self._grams[gram]
+            postings.discard(seq)
+            if not postings:
+                del self._grams[gram]
+        self._prefixes.remove(lowered, monkey_id)
+
+    def match(self, query):
+        """Return the IDs whose lowercased name contains ``query``, in index order"""
+        query = query.lower()
+        if len(query) < 3:
+            # Too short for a trigram; scan the (already lowercased) names
+            return [monkey_id for monkey_id, lowered in self._entry_of.values() if query in lowered]
+        postings = sorted((self._grams.get(gram, ()) for gram in trigrams(query)), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        entry_of = self._entry_of
+        return [
+            entry_of[seq][0]
+            for seq in sorted(candidates)
+            if query in entry_of[seq][1]
+        ]
+
+    def complete(self, prefix, limit=10):
+        """Return up to ``limit`` IDs whose lowercased name starts with ``prefix``"""
+        prefix = prefix.lower()
+        return [monkey_id for _, monkey_id in islice(self._prefixes.prefix(prefix), limit)]
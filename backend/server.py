@@ -1,22 +1,107 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
 import logging
+import asyncio
 import json
+import base64
+import hashlib
+import csv
+import io
+import threading
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from pydantic import AfterValidator, BaseModel, Field, TypeAdapter, ValidationError, model_validator
+from typing import Annotated, Any, Dict, List, Optional
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 
+from locks import KeyedLocks, id_key, name_key
+from cache import ResponseCache
+from changes import ChangeFeed
+from metrics import DUPLICATE_CHECKS, OPERATION_SECONDS, REGISTRY, REQUEST_SECONDS
+from profiler import SamplingProfiler
+from storage import create_storage
+from store import (
+    CHECKED, SORT_FIELDS, DuplicateNameError, MonkeyStore, VersionConflictError, name_index_key,
+    normalize_timestamp,
+)
+from writer import WriteError
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # JSON file storage setup (fallback from DynamoDB due to permission issues)
-DATA_FILE = ROOT_DIR / 'monkeys_data.json'
+DATA_FILE = Path(os.environ.get('DATA_FILE', ROOT_DIR / 'monkeys_data.json'))
+
+# Persistence engine: 'wal' (snapshot + append-only log), 'json' (whole-file
+# rewrite) or 'sqlite' (one row per monkey, in DATA_FILE with a .db suffix)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'wal')
+
+# Set when several server processes (uvicorn --workers N) share DATA_FILE;
+# requires the 'wal' backend
+SHARED_STORE = os.environ.get('SHARED_STORE', 'false').lower() == 'true'
+
+# How the 'wal' backend keeps its snapshot: 'json' (DATA_FILE itself) or
+# 'binary' (DATA_FILE with a .snap suffix, faster to load)
+SNAPSHOT_FORMAT = os.environ.get('SNAPSHOT_FORMAT', 'json')
+
+# Seconds between flushes (group fsync / snapshot rewrite) of the registry
+STORE_FLUSH_INTERVAL = float(os.environ.get('STORE_FLUSH_INTERVAL', '1.0'))
+
+# Records per chunk written by the streaming export
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Serve reads from the store's pre-encoded records instead of re-validating
+# every row through the Monkey model
+TRUSTED_OUTPUT = os.environ.get('TRUSTED_OUTPUT', 'true').lower() == 'true'
+
+# Entries and total body bytes kept by the LRU of serialized list responses
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '256'))
+RESPONSE_CACHE_BYTES = int(os.environ.get('RESPONSE_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+# Largest number of items accepted by one bulk request
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', '10000'))
+
+# Create/update/delete events kept for GET /api/monkeys/changes catch-up,
+# and seconds between keep-alive comments on an idle change stream
+CHANGE_FEED_SIZE = int(os.environ.get('CHANGE_FEED_SIZE', '1000'))
+CHANGE_STREAM_KEEPALIVE = float(os.environ.get('CHANGE_STREAM_KEEPALIVE', '15'))
+
+# Seconds between checks for other workers' changes by an idle change
+# stream, with SHARED_STORE
+CHANGE_STREAM_POLL = float(os.environ.get('CHANGE_STREAM_POLL', '0.5'))
+
+# Process-resident registry; loaded on startup and flushed on shutdown
+store = MonkeyStore(
+    storage=create_storage(STORAGE_BACKEND, DATA_FILE, shared=SHARED_STORE, snapshot_format=SNAPSHOT_FORMAT),
+    flush_interval=STORE_FLUSH_INTERVAL,
+)
+
+# Serialized list responses keyed by the store version they were built from
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_BYTES)
+
+# Recent mutations for live clients; sequences start at the current time in
+# microseconds so that they keep increasing across restarts
+change_feed = ChangeFeed(CHANGE_FEED_SIZE, start=time.time_ns() // 1000)
+
+# Stack sampler started on demand through POST /api/metrics/profile
+profiler = SamplingProfiler()
+
+REGISTRY.callback('monkey_registry_records', 'Monkeys in the registry', 'gauge', lambda: len(store))
+REGISTRY.callback('monkey_store_version', 'Mutations applied to the store since it was opened', 'counter',
+                  lambda: store.version)
+REGISTRY.callback('monkey_response_cache_hits_total', 'List responses served from the cache', 'counter',
+                  lambda: response_cache.hits)
+REGISTRY.callback('monkey_change_sequence', 'Sequence number of the latest change event', 'counter',
+                  lambda: change_feed.sequence)
+REGISTRY.callback('monkey_response_cache_misses_total', 'List responses built because they were not cached',
+                  'counter', lambda: response_cache.misses)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -33,33 +118,46 @@ class Species(str, Enum):
     HOWLER = "howler"
 
 
+def normalize_checkup_time(value: Optional[str]) -> Optional[str]:
+    """Checkup times are stored as naive UTC ISO timestamps so they can be range-queried"""
+    try:
+        return normalize_timestamp(value)
+    except ValueError:
+        raise ValueError('last_checkup_at must be an ISO 8601 date or date-time')
+
+
+# Checkup times are normalized as part of the field's own core schema
+CheckupTime = Annotated[Optional[str], AfterValidator(normalize_checkup_time)]
+
+MAX_MARMOSET_AGE = 22
+
+
 # Pydantic Models
 class MonkeyCreate(BaseModel):
     name: str = Field(..., min_length=2, max_length=40)
     species: Species
     age_years: int = Field(..., ge=0, le=45)
     favourite_fruit: str
-    last_checkup_at: Optional[str] = None
+    last_checkup_at: CheckupTime = None
 
-    @validator('age_years')
-    def validate_marmoset_age(cls, v, values):
-        if values.get('species') == Species.MARMOSET and v > 22:
-            raise ValueError('Marmoset age cannot exceed 22 years')
-        return v
+    @model_validator(mode='after')
+    def check_marmoset_age(self):
+        if self.species == Species.MARMOSET and self.age_years > MAX_MARMOSET_AGE:
+            raise ValueError(f'Marmoset age cannot exceed {MAX_MARMOSET_AGE} years')
+        return self
 
 
+# Rules spanning several fields are checked on the monkey with the update
+# applied, by invalid_records, since an update may send only one of them
 class MonkeyUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=2, max_length=40)
     species: Optional[Species] = None
     age_years: Optional[int] = Field(None, ge=0, le=45)
     favourite_fruit: Optional[str] = None
-    last_checkup_at: Optional[str] = None
-
-    @validator('age_years')
-    def validate_marmoset_age(cls, v, values):
-        if values.get('species') == Species.MARMOSET and v and v > 22:
-            raise ValueError('Marmoset age cannot exceed 22 years')
-        return v
+    last_checkup_at: CheckupTime = None
+    # Version the edit is based on; the update is refused with 409 if the
+    # monkey has changed since
+    expected_version: Optional[int] = Field(None, ge=1)
 
 
 class Monkey(BaseModel):
@@ -71,42 +169,357 @@ class Monkey(BaseModel):
     last_checkup_at: Optional[str] = None
     created_at: str
     updated_at: str
+    version: int
+
+
+class MonkeyBulkUpdate(MonkeyUpdate):
+    monkey_id: str
+
+
+# Batch validators, built once at import: a batch is validated in a single
+# call into pydantic-core instead of one call per item
+CREATE_BATCH = TypeAdapter(List[MonkeyCreate])
+UPDATE_BATCH = TypeAdapter(List[MonkeyBulkUpdate])
+
+
+class BulkMode(str, Enum):
+    ATOMIC = "atomic"
+    BEST_EFFORT = "best_effort"
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: int
+    monkey_id: Optional[str] = None
+    monkey: Optional[Monkey] = None
+    error: Optional[Any] = None
+
+
+class BulkResult(BaseModel):
+    committed: bool
+    results: List[BulkItemResult]
+
+
+class SpeciesStats(BaseModel):
+    count: int
+    mean_age: float
+    min_age: int
+    max_age: int
+
+
+class AgeBucket(BaseModel):
+    min_age: int
+    max_age: int
+    count: int
+
+
+class FruitCount(BaseModel):
+    fruit: str
+    count: int
+
+
+class CheckupStats(BaseModel):
+    overdue_days: int
+    cutoff: str
+    overdue: int
+    never_checked: int
+
+
+class MonkeyStats(BaseModel):
+    total: int
+    species: Dict[str, SpeciesStats]
+    age_histogram: List[AgeBucket]
+    top_fruits: List[FruitCount]
+    checkups: CheckupStats
 
 
 # JSON Storage Functions
 def load_monkeys_data():
-    """Load monkeys data from JSON file"""
-    if not DATA_FILE.exists():
-        return {}
-    try:
-        with open(DATA_FILE, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Error loading data: {e}")
-        return {}
+    """Return the in-memory registry (the file is only read at startup)"""
+    return store.all()
 
 
 def save_monkeys_data(data):
-    """Save monkeys data to JSON file"""
+    """Replace the in-memory registry; the store's writer thread persists it"""
     try:
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        store.replace(data)
     except Exception as e:
         logger.error(f"Error saving data: {e}")
         raise HTTPException(status_code=500, detail="Error saving data")
 
 
+# Mutations of the same monkey_id or (species, name) pair are serialized; reads never lock
+mutation_locks = KeyedLocks()
+
+# Taken by the request the writer thread holds a shared store's
+# inter-process lock for, so that requests take turns holding it
+shared_log_turn = asyncio.Lock()
+
+
 # Helper functions
+async def saved(pending_write):
+    """Wait, without blocking the event loop, until the store has written a mutation"""
+    try:
+        await asyncio.wrap_future(pending_write)
+    except WriteError as e:
+        # The store undid the mutation; tell live clients it did not happen
+        for monkey_id in e.reverted:
+            publish_revert(monkey_id)
+        raise
+
+
+async def room_to_write():
+    """Wait until the store can queue a mutation without blocking.
+
+    A full write queue (a slow disk) is waited on in a worker thread, so the
+    event loop keeps serving reads meanwhile. Call it right before the
+    store mutation, with no ``await`` in between, so the room cannot be
+    taken by another request first.
+    """
+    loop = asyncio.get_running_loop()
+    while not store.has_room():
+        await loop.run_in_executor(None, store.wait_for_room)
+
+
+@asynccontextmanager
+async def store_mutation():
+    """Make store mutations in the block without blocking the event loop.
+
+    Waits for room to queue them (``room_to_write``). With a shared store,
+    the writer thread first takes the inter-process lock and reads what
+    other workers logged, which is applied here so that the store's checks
+    see it; the lock is released once the block's mutations are written.
+    Await their writes after the block.
+    """
+    if not store.shared:
+        await room_to_write()
+        yield
+        return
+    async with shared_log_turn:
+        try:
+            await asyncio.wrap_future(store.hold_log())
+            publish_applied(store.apply_changes())
+            await room_to_write()
+            yield
+        finally:
+            store.release_log()
+
+
+def make_etag(version: int, query: tuple = ()) -> str:
+    """List ETag: the store epoch, the relevant version and a digest of the
+    query, so that one list's tag never validates another's"""
+    digest = hashlib.blake2b(repr(query).encode(), digest_size=6).hexdigest()
+    return f'"{store.epoch}.{version}.{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header names ``etag``"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    tags = {tag.strip() for tag in header.split(',')}
+    return '*' in tags or etag in {tag[2:] if tag.startswith('W/') else tag for tag in tags}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+
+def record_etag(record: dict) -> str:
+    """ETag of a single monkey: its record version, stable across restarts"""
+    return f'"{record["version"]}"'
+
+
+def if_match_fails(request: Request, record: dict) -> bool:
+    """Whether the request's If-Match header rules out the current ``record``"""
+    header = request.headers.get('if-match')
+    if not header:
+        return False
+    tags = {tag.strip() for tag in header.split(',')}
+    return '*' not in tags and record_etag(record) not in tags
+
+
+def version_conflict(record: dict) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Monkey was modified by someone else (now at version {record['version']}); reload it and retry",
+        headers={'ETag': record_etag(record)},
+    )
+
+
+def trusted_response(records, headers: dict = None) -> Response:
+    """JSON array of stored records, joined from their cached wire form.
+
+    Records were validated on the way in, so they bypass per-row model
+    construction and response_model validation; the declared response
+    models still document the shape in the OpenAPI schema.
+    """
+    body = b'[' + b','.join(map(store.encoded, records)) + b']'
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+def publish_change(record: dict = None, deleted_id: str = None):
+    """Announce a stored record (a create at version 1, else an update) or a deletion.
+
+    Called right after the store applied the change and before awaiting its
+    write, so events are published in the order the store saw them.
+    """
+    if record is None:
+        change_feed.publish('delete', deleted_id)
+    else:
+        op = 'create' if record['version'] == 1 else 'update'
+        change_feed.publish(op, record['monkey_id'], store.encoded(record))
+
+
+def publish_applied(monkey_ids: list):
+    """Announce the changes other workers made, which the store just applied"""
+    for monkey_id in monkey_ids:
+        record = store.get(monkey_id)
+        publish_change(record, deleted_id=monkey_id if record is None else None)
+
+
+async def refresh_store():
+    """Apply and announce what other workers have written since the last
+    refresh; the shared log is read in a worker thread"""
+    if store.shared:
+        await asyncio.get_running_loop().run_in_executor(None, store.fetch_changes)
+        publish_applied(store.apply_changes())
+
+
+def publish_revert(monkey_id: str):
+    """Announce that a monkey is back to its stored record (or absent) after
+    a change to it failed to be written"""
+    record = store.get(monkey_id)
+    change_feed.publish('revert', monkey_id, store.encoded(record) if record is not None else None)
+
+
+def new_monkey_record(monkey_data: MonkeyCreate) -> dict:
+    """Build the stored record for a new monkey"""
+    now = datetime.utcnow().isoformat()
+    return {
+        'monkey_id': str(uuid.uuid4()),
+        'name': monkey_data.name,
+        'species': monkey_data.species.value,
+        'age_years': monkey_data.age_years,
+        'favourite_fruit': monkey_data.favourite_fruit,
+        'last_checkup_at': monkey_data.last_checkup_at,
+        'created_at': now,
+        'updated_at': now,
+        'version': 1
+    }
+
+
+def update_fields(updates: MonkeyUpdate) -> dict:
+    """Fields an update sets; omitted and null fields are left unchanged"""
+    return {
+        key: value.value if isinstance(value, Species) else value
+        for key, value in updates.model_dump(exclude_unset=True, exclude={'expected_version'}).items()
+        if value is not None and key in MonkeyUpdate.model_fields
+    }
+
+
+def updated_monkey_record(existing: dict, update_dict: dict) -> dict:
+    """Return a copy of ``existing`` with ``update_dict`` applied, one version on"""
+    record = dict(existing)
+    record.update(update_dict)
+    record['updated_at'] = datetime.utcnow().isoformat()
+    record['version'] = existing['version'] + 1
+    return record
+
+
+def errors_by_index(error: ValidationError) -> dict:
+    """Split the errors of a batch validation by the index of the failing item"""
+    errors = {}
+    for item_error in error.errors(include_url=False, include_context=False):
+        index, *loc = item_error['loc']
+        errors.setdefault(index, []).append(dict(item_error, loc=tuple(loc)))
+    return errors
+
+
+def invalid_records(records: list) -> dict:
+    """Check whole records, such as a monkey with an update applied, against
+    every rule a create is held to, in one pass; maps the index of each
+    invalid record to its errors"""
+    try:
+        CREATE_BATCH.validate_python(records)
+    except ValidationError as e:
+        return errors_by_index(e)
+    return {}
+
+
+def encode_cursor(sort: str, descending: bool, position) -> str:
+    """Opaque list cursor: where the previous page ended in a given sort order"""
+    payload = json.dumps([sort, descending, position[0], position[1]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_descending, key, monkey_id = json.loads(payload)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort or cursor_descending != descending:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    # Keys are compared with the sort order's own, so they must be of its type
+    key_type = int if sort == 'age_years' else str
+    if type(key) is not key_type or not isinstance(monkey_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return (key, monkey_id)
+
+
+def parse_sort(sort: Optional[str]):
+    """Split ``sort`` ('field' or '-field' for descending) into (field, descending)"""
+    sort = sort or 'created_at'
+    field, descending = (sort[1:], True) if sort.startswith('-') else (sort, False)
+    if field not in SORT_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot sort by '{field}'; choose one of {', '.join(SORT_FIELDS)}"
+        )
+    return field, descending
+
+
+def parse_checkup_range(checkup_after: Optional[str], checkup_before: Optional[str],
+                        never_checked: Optional[bool]):
+    """Bounds ``[low, high)`` on the last_checkup_at sort key for the checkup
+    filters, or None without any; never-checked monkeys have the key ''"""
+    if checkup_after is None and checkup_before is None and never_checked is None:
+        return None
+    if never_checked and (checkup_after is not None or checkup_before is not None):
+        raise HTTPException(status_code=400, detail="never_checked cannot be combined with a checkup range")
+    if never_checked:
+        return None, CHECKED
+    bounds = []
+    for name, value in (('checkup_after', checkup_after), ('checkup_before', checkup_before)):
+        try:
+            bounds.append(normalize_timestamp(value) if value is not None else None)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 date or date-time")
+    low, high = bounds
+    # Without a lower bound the range still only covers checked monkeys
+    return low or CHECKED, high
+
+
+def parse_fields(fields: Optional[str]):
+    """Projected field names for ``fields=``; monkey_id is always included"""
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested - set(Monkey.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [field for field in Monkey.model_fields if field in requested or field == 'monkey_id']
+
+
 async def check_name_duplicate(name: str, species: str, exclude_monkey_id: str = None):
     """Check if a monkey with the same name and species already exists"""
     try:
-        data = load_monkeys_data()
-        for monkey_id, monkey in data.items():
-            if (monkey['name'].lower() == name.lower() and 
-                monkey['species'] == species and 
-                (exclude_monkey_id is None or monkey_id != exclude_monkey_id)):
-                return True
-        return False
+        with OPERATION_SECONDS.labels('duplicate_check').time():
+            owner = store.find_by_name(species, name)
+        duplicate = owner is not None and owner != exclude_monkey_id
+        DUPLICATE_CHECKS.labels('duplicate' if duplicate else 'unique').inc()
+        return duplicate
     except Exception as e:
         logger.error(f"Error checking duplicates: {e}")
         return False
@@ -118,80 +531,536 @@ async def root():
     return {"message": "Monkey Registry API"}
 
 
+@api_router.get("/metrics")
+async def get_metrics():
+    """Request latency per route, internal operation timings and counters, in Prometheus text format"""
+    return Response(content=REGISTRY.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_router.post("/metrics/profile", status_code=202)
+async def start_profile(
+    requests: int = Query(100, ge=1, le=100000),
+    interval_ms: float = Query(5.0, ge=0.5, le=1000.0),
+):
+    """Sample the event loop's stack every ``interval_ms`` while the next ``requests`` requests run.
+
+    The result is fetched from ``GET /api/metrics/profile`` once they have completed.
+    """
+    try:
+        # This request completes inside the window too, so it is not counted
+        profiler.start(threading.get_ident(), requests + 1, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": f"Profiling the next {requests} requests"}
+
+
+@api_router.get("/metrics/profile")
+async def get_profile():
+    """The last finished profile as collapsed stacks (``frame;frame;frame count`` per line),
+    ready for flamegraph.pl or speedscope"""
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="Profile still running")
+    if profiler.result is None:
+        raise HTTPException(status_code=404, detail="No profile has been taken")
+    return Response(content=profiler.result, media_type='text/plain; charset=utf-8')
+
+
 @api_router.post("/monkeys", response_model=Monkey, status_code=201)
 async def create_monkey(monkey_data: MonkeyCreate):
     """Create a new monkey"""
-    # Check for duplicate name within species
-    if await check_name_duplicate(monkey_data.name, monkey_data.species.value):
-        raise HTTPException(
-            status_code=400, 
-            detail=f"A monkey named '{monkey_data.name}' already exists in species '{monkey_data.species.value}'"
-        )
+    async with mutation_locks.hold(name_key(monkey_data.species.value, monkey_data.name)):
+        # Check for duplicate name within species
+        if await check_name_duplicate(monkey_data.name, monkey_data.species.value):
+            raise HTTPException(
+                status_code=400, 
+                detail=f"A monkey named '{monkey_data.name}' already exists in species '{monkey_data.species.value}'"
+            )
 
-    # Generate unique ID
-    monkey_id = str(uuid.uuid4())
-    now = datetime.utcnow().isoformat()
+        monkey_record = new_monkey_record(monkey_data)
 
-    # Create monkey record
-    monkey_record = {
-        'monkey_id': monkey_id,
-        'name': monkey_data.name,
-        'species': monkey_data.species.value,
-        'age_years': monkey_data.age_years,
-        'favourite_fruit': monkey_data.favourite_fruit,
-        'last_checkup_at': monkey_data.last_checkup_at,
-        'created_at': now,
-        'updated_at': now
-    }
+        try:
+            async with store_mutation():
+                pending_write = store.put(monkey_record)
+                publish_change(monkey_record)
+            await saved(pending_write)
 
-    try:
-        # Load existing data
-        data = load_monkeys_data()
-        data[monkey_id] = monkey_record
-        save_monkeys_data(data)
-        
-        return Monkey(**monkey_record)
-    except Exception as e:
-        logger.error(f"Error creating monkey: {e}")
-        raise HTTPException(status_code=500, detail="Error creating monkey")
+            return Monkey(**monkey_record)
+        except DuplicateNameError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error creating monkey: {e}")
+            raise HTTPException(status_code=500, detail="Error creating monkey")
 
 
 @api_router.get("/monkeys", response_model=List[Monkey])
-async def list_monkeys(species: Optional[str] = None, search: Optional[str] = None):
-    """List all monkeys with optional filtering"""
+async def list_monkeys(
+    request: Request,
+    response: Response,
+    species: Optional[str] = None,
+    search: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+    checkup_after: Optional[str] = None,
+    checkup_before: Optional[str] = None,
+    never_checked: Optional[bool] = None,
+):
+    """List all monkeys with optional filtering.
+
+    Passing ``limit``, ``cursor`` or ``sort`` returns records in a sort order
+    (``created_at`` by default, ``-field`` for descending); when more records
+    follow, the ``X-Next-Cursor`` response header holds the cursor for the
+    next page. ``fields`` projects each record onto the listed fields.
+
+    ``checkup_after`` (inclusive) and ``checkup_before`` (exclusive) keep
+    monkeys last checked in that range, ``never_checked=true`` those never
+    checked and ``never_checked=false`` those checked at some point. They
+    list in ``last_checkup_at`` order (the only sort allowed with them),
+    read straight off that index.
+
+    The ``ETag`` changes whenever a monkey of the filtered species (or any
+    monkey, without a species filter) changes; ``If-None-Match`` with the
+    current tag is answered with 304.
+    """
     try:
-        data = load_monkeys_data()
-        monkeys = []
-        
-        for monkey_record in data.values():
-            # Species filtering
-            if species and monkey_record['species'] != species:
-                continue
-                
-            # Search filtering
-            if search:
-                search_lower = search.lower()
-                if (search_lower not in monkey_record['name'].lower() and 
-                    search_lower not in monkey_record['species'].lower()):
-                    continue
-            
-            monkeys.append(Monkey(**monkey_record))
-
-        return monkeys
+        projection = parse_fields(fields)
+        checkups = parse_checkup_range(checkup_after, checkup_before, never_checked)
+        paginated = limit is not None or cursor is not None or sort is not None or checkups is not None
+        if paginated:
+            sort_field, descending = parse_sort(sort or ('last_checkup_at' if checkups else None))
+            if checkups is not None and sort_field != 'last_checkup_at':
+                raise HTTPException(status_code=400, detail="Checkup filters only list in last_checkup_at order")
+            after = decode_cursor(cursor, sort_field, descending) if cursor else None
+
+        query = (species or None, search or None, limit, cursor, sort, fields, checkups)
+        etag = make_etag(store.species_version(species or None), query)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        cacheable = TRUSTED_OUTPUT or projection is not None
+        cache_key = (etag, *query)
+        cached = response_cache.get(cache_key) if cacheable else None
+        if cached is not None:
+            body, headers = cached
+            return Response(content=body, media_type='application/json', headers=headers)
+
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        with OPERATION_SECONDS.labels('filter').time():
+            if paginated:
+                records, next_position = store.page(
+                    sort_field, descending, limit, after, species or None, search or None,
+                    *(checkups or (None, None))
+                )
+                if next_position is not None:
+                    headers['X-Next-Cursor'] = encode_cursor(sort_field, descending, next_position)
+            # Species filtering walks only that species' partition and search
+            # filtering only the records the name index nominates
+            elif search:
+                records = store.search(search, species or None)
+            else:
+                records = store.values(species or None)
+
+        with OPERATION_SECONDS.labels('serialize').time():
+            if projection is not None:
+                content = [{field: record[field] for field in projection} for record in records]
+                result = JSONResponse(content=content, headers=headers)
+            elif TRUSTED_OUTPUT:
+                result = trusted_response(records, headers)
+            else:
+                response.headers.update(headers)
+                monkeys = [Monkey(**monkey_record) for monkey_record in records]
+
+                return monkeys
+
+        response_cache.put(cache_key, result.body, headers)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing monkeys: {e}")
         raise HTTPException(status_code=500, detail="Error fetching monkeys")
 
 
+async def export_ndjson(species: Optional[str], search: Optional[str]):
+    fields = list(Monkey.model_fields)
+    for batch in store.scan(species, search, EXPORT_BATCH_SIZE):
+        yield ''.join(
+            json.dumps({field: record[field] for field in fields}) + '\n' for record in batch
+        )
+
+
+async def export_csv(species: Optional[str], search: Optional[str]):
+    fields = list(Monkey.model_fields)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for batch in store.scan(species, search, EXPORT_BATCH_SIZE):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@api_router.get("/monkeys/export")
+async def export_monkeys(
+    species: Optional[str] = None,
+    search: Optional[str] = None,
+    format: str = Query('ndjson', pattern='^(ndjson|csv)$'),
+):
+    """Stream the (optionally filtered) registry as NDJSON or CSV in created_at order.
+
+    Records are produced in fixed-size batches straight from the store, so
+    memory use does not depend on the size of the registry.
+    """
+    if format == 'csv':
+        return StreamingResponse(
+            export_csv(species or None, search or None),
+            media_type='text/csv',
+            headers={'Content-Disposition': 'attachment; filename="monkeys.csv"'},
+        )
+    return StreamingResponse(
+        export_ndjson(species or None, search or None),
+        media_type='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename="monkeys.ndjson"'},
+    )
+
+
+@api_router.get("/monkeys/stats", response_model=MonkeyStats)
+async def monkey_stats(
+    overdue_days: int = Query(365, ge=0, le=36500),
+    top_fruits: int = Query(5, ge=1, le=100),
+):
+    """Counts per species with their ages, the age histogram, the most common
+    favourite fruits and how many monkeys are overdue for a checkup.
+
+    Everything comes from aggregates the store keeps up to date on every
+    write, so the cost does not depend on the size of the registry. A
+    monkey is overdue if its last checkup was more than ``overdue_days``
+    ago; monkeys never checked are counted separately.
+    """
+    try:
+        cutoff = (datetime.utcnow() - timedelta(days=overdue_days)).isoformat()
+        return MonkeyStats(
+            total=len(store),
+            species=store.stats.species(),
+            age_histogram=[
+                AgeBucket(min_age=low, max_age=high, count=count)
+                for low, high, count in store.stats.age_histogram()
+            ],
+            top_fruits=[FruitCount(fruit=fruit, count=count) for fruit, count in store.stats.top_fruits(top_fruits)],
+            checkups=CheckupStats(
+                overdue_days=overdue_days,
+                cutoff=cutoff,
+                overdue=store.checkups_before(cutoff),
+                never_checked=store.stats.never_checked,
+            ),
+        )
+    except Exception as e:
+        logger.error(f"Error computing stats: {e}")
+        raise HTTPException(status_code=500, detail="Error computing stats")
+
+
+@api_router.get("/monkeys/suggest", response_model=List[Monkey])
+async def suggest_monkeys(prefix: str, limit: int = Query(10, ge=1, le=50)):
+    """Autocomplete: monkeys whose name starts with the prefix, ordered by name"""
+    try:
+        if TRUSTED_OUTPUT:
+            return trusted_response(store.complete(prefix, limit))
+        return [Monkey(**monkey_record) for monkey_record in store.complete(prefix, limit)]
+    except Exception as e:
+        logger.error(f"Error suggesting monkeys: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching suggestions")
+
+
+async def read_bulk_items(request: Request) -> list:
+    """Parse a bulk request body: a JSON array, or NDJSON with one item per line"""
+    body = await request.body()
+    try:
+        if 'ndjson' in request.headers.get('content-type', ''):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per bulk request")
+    return items
+
+
+def bulk_error(index: int, status: int, error, monkey_id: str = None) -> BulkItemResult:
+    return BulkItemResult(index=index, status=status, monkey_id=monkey_id, error=error)
+
+
+def validate_bulk_items(adapter: TypeAdapter, items: list, results: list) -> dict:
+    """Validate every item in one pass of the batch validator ``adapter``;
+    failures are recorded as 422 results"""
+    try:
+        return dict(enumerate(adapter.validate_python(items)))
+    except ValidationError as e:
+        errors = errors_by_index(e)
+    for index, item_errors in errors.items():
+        results[index] = bulk_error(index, 422, item_errors)
+    # Only a failed batch pays for a second pass, over the items that passed
+    indexes = [index for index in range(len(items)) if index not in errors]
+    return dict(zip(indexes, adapter.validate_python([items[index] for index in indexes])))
+
+
+async def commit_bulk(results: list, mode: BulkMode, puts=(), deletes=(), expected_versions=None):
+    """Persist a validated batch with a single store operation.
+
+    In atomic mode any failed item rejects the whole batch with a 400; the
+    items that were fine are reported with status 424. If a monkey changed
+    since the version in ``expected_versions`` its change was based on (in
+    another worker, say), nothing is committed and 409 is returned.
+    """
+    if mode == BulkMode.ATOMIC and any(result.status >= 400 for result in results):
+        for result in results:
+            if result.status < 400:
+                result.status, result.monkey, result.error = 424, None, "Batch not committed"
+        return JSONResponse(
+            status_code=400,
+            content=BulkResult(committed=False, results=results).model_dump(mode='json'),
+        )
+    try:
+        async with store_mutation():
+            pending_write = store.apply_batch(puts, deletes, expected_versions)
+            for record in puts:
+                publish_change(record)
+            for monkey_id in deletes:
+                publish_change(deleted_id=monkey_id)
+        await saved(pending_write)
+    except DuplicateNameError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except VersionConflictError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Monkey {e.monkey_id} was modified by someone else (now at version {e.current}); "
+                   f"nothing was committed, retry the batch",
+        )
+    except Exception as e:
+        logger.error(f"Error committing bulk request: {e}")
+        raise HTTPException(status_code=500, detail="Error saving data")
+    return BulkResult(committed=bool(puts or deletes), results=results)
+
+
+@api_router.post("/monkeys/bulk", response_model=BulkResult)
+async def bulk_create_monkeys(request: Request, mode: BulkMode = BulkMode.ATOMIC):
+    """Create many monkeys from a JSON array or NDJSON body of MonkeyCreate items"""
+    items = await read_bulk_items(request)
+    results = [None] * len(items)
+    records = {
+        index: new_monkey_record(monkey_data)
+        for index, monkey_data in validate_bulk_items(CREATE_BATCH, items, results).items()
+    }
+
+    async with mutation_locks.hold(*(name_key(r['species'], r['name']) for r in records.values())):
+        claimed = set()
+        for index, record in records.items():
+            key = name_index_key(record['species'], record['name'])
+            if key in claimed or store.find_by_name(record['species'], record['name']) is not None:
+                results[index] = bulk_error(
+                    index, 400,
+                    f"A monkey named '{record['name']}' already exists in species '{record['species']}'"
+                )
+                continue
+            claimed.add(key)
+            results[index] = BulkItemResult(
+                index=index, status=201, monkey_id=record['monkey_id'], monkey=Monkey(**record)
+            )
+        puts = [record for index, record in records.items() if results[index].status == 201]
+        return await commit_bulk(results, mode, puts=puts)
+
+
+@api_router.put("/monkeys/bulk", response_model=BulkResult)
+async def bulk_update_monkeys(request: Request, mode: BulkMode = BulkMode.ATOMIC):
+    """Update many monkeys from MonkeyUpdate items that each carry a monkey_id"""
+    items = await read_bulk_items(request)
+    results = [None] * len(items)
+    updates = validate_bulk_items(UPDATE_BATCH, items, results)
+
+    seen = set()
+    for index, update in list(updates.items()):
+        if update.monkey_id in seen:
+            results[index] = bulk_error(index, 400, "Monkey appears more than once in the batch", update.monkey_id)
+            del updates[index]
+        seen.add(update.monkey_id)
+
+    async with mutation_locks.hold(*(id_key(update.monkey_id) for update in updates.values())):
+        records = {}
+        currents = {}
+        for index, update in updates.items():
+            current = store.get(update.monkey_id)
+            if current is None:
+                results[index] = bulk_error(index, 404, "Monkey not found", update.monkey_id)
+                continue
+            if update.expected_version is not None and update.expected_version != current['version']:
+                results[index] = bulk_error(index, 409, version_conflict(current).detail, update.monkey_id)
+                continue
+            currents[index] = current
+            records[index] = updated_monkey_record(current, update_fields(update))
+
+        indexes = list(records)
+        for position, errors in invalid_records([records[index] for index in indexes]).items():
+            index = indexes[position]
+            results[index] = bulk_error(index, 422, errors, records.pop(index)['monkey_id'])
+            del currents[index]
+
+        name_keys = [name_key(r['species'], r['name']) for r in list(currents.values()) + list(records.values())]
+        async with mutation_locks.hold(*name_keys):
+            # A name slot is free if nobody holds it or its holder is renamed
+            # away in this batch; repeat until no further item fails, since
+            # a failed rename keeps its old slot occupied
+            while True:
+                released = {records[index]['monkey_id'] for index in records}
+                claimed = {}
+                failed = False
+                for index, record in list(records.items()):
+                    key = name_index_key(record['species'], record['name'])
+                    owner = claimed.get(key, store.find_by_name(record['species'], record['name']))
+                    if owner is not None and owner != record['monkey_id'] and \
+                            (key in claimed or owner not in released):
+                        results[index] = bulk_error(
+                            index, 400,
+                            f"A monkey named '{record['name']}' already exists in species '{record['species']}'",
+                            record['monkey_id'],
+                        )
+                        del records[index]
+                        failed = True
+                        continue
+                    claimed[key] = record['monkey_id']
+                if not failed:
+                    break
+
+            for index, record in records.items():
+                results[index] = BulkItemResult(
+                    index=index, status=200, monkey_id=record['monkey_id'], monkey=Monkey(**record)
+                )
+            return await commit_bulk(
+                results, mode, puts=list(records.values()),
+                expected_versions={currents[index]['monkey_id']: currents[index]['version'] for index in records},
+            )
+
+
+@api_router.delete("/monkeys/bulk", response_model=BulkResult)
+async def bulk_delete_monkeys(request: Request, mode: BulkMode = BulkMode.ATOMIC):
+    """Delete many monkeys given a JSON array or NDJSON body of monkey IDs"""
+    items = await read_bulk_items(request)
+    results = [None] * len(items)
+    monkey_ids = {}
+    seen = set()
+    for index, item in enumerate(items):
+        monkey_id = item.get('monkey_id') if isinstance(item, dict) else item
+        if not isinstance(monkey_id, str):
+            results[index] = bulk_error(index, 422, "Expected a monkey ID")
+        elif monkey_id in seen:
+            results[index] = bulk_error(index, 400, "Monkey appears more than once in the batch", monkey_id)
+        else:
+            monkey_ids[index] = monkey_id
+            seen.add(monkey_id)
+
+    async with mutation_locks.hold(*(id_key(monkey_id) for monkey_id in monkey_ids.values())):
+        records = {}
+        for index, monkey_id in monkey_ids.items():
+            record = store.get(monkey_id)
+            if record is None:
+                results[index] = bulk_error(index, 404, "Monkey not found", monkey_id)
+            else:
+                records[index] = record
+                results[index] = BulkItemResult(index=index, status=200, monkey_id=monkey_id)
+
+        async with mutation_locks.hold(*(name_key(r['species'], r['name']) for r in records.values())):
+            return await commit_bulk(results, mode, deletes=[r['monkey_id'] for r in records.values()])
+
+
+def sse_event(sequence: int, data: bytes, event: str = None) -> bytes:
+    head = f"id: {sequence}\n" + (f"event: {event}\n" if event else "")
+    return head.encode() + b"data: " + data + b"\n\n"
+
+
+async def change_stream(sequence: int):
+    """Server-sent events for every change after ``sequence``, as they happen"""
+    # Browsers reconnect after this many milliseconds, resuming from the last id
+    yield b"retry: 3000\n\n"
+    while True:
+        events = change_feed.since(sequence)
+        if events is None:
+            # Too far behind (or from before a restart): the client reloads
+            sequence = change_feed.sequence
+            yield sse_event(sequence, json.dumps({'sequence': sequence}).encode(), 'reset')
+        elif events:
+            yield b"".join(sse_event(number, event) for number, event in events)
+            sequence = events[-1][0]
+        if store.shared:
+            # Other workers' changes reach the feed when they are applied here
+            deadline = time.monotonic() + CHANGE_STREAM_KEEPALIVE
+            while change_feed.sequence == sequence and time.monotonic() < deadline:
+                await change_feed.wait(sequence, min(CHANGE_STREAM_POLL, deadline - time.monotonic()))
+                await refresh_store()
+        else:
+            await change_feed.wait(sequence, CHANGE_STREAM_KEEPALIVE)
+        if change_feed.sequence == sequence:
+            yield b": keep-alive\n\n"
+
+
+@api_router.get("/monkeys/changes")
+async def monkey_changes(request: Request, since: Optional[int] = None):
+    """Create/update/delete events, for clients keeping a copy of the list current.
+
+    Each event is ``{sequence, op, monkey_id, monkey}`` (``monkey`` is null
+    for deletes). With ``Accept: text/event-stream`` this is a server-sent
+    event stream of the changes after the ``Last-Event-ID`` header (sent on
+    reconnects), else ``since``, else from now on; a ``reset`` event means
+    the changes in between are no longer kept and the list should be
+    reloaded. Otherwise it returns
+    ``{sequence, events}`` with the events after ``since`` and the latest
+    sequence, or 410 if some of them are no longer kept.
+
+    With a shared store, changes made by other workers are reported once
+    this worker has applied them, before it handles a request and, while a
+    stream is idle, every ``CHANGE_STREAM_POLL`` seconds.
+    """
+    if 'text/event-stream' in request.headers.get('accept', ''):
+        # Browsers reconnecting send the id of the last event they received
+        last_event_id = request.headers.get('last-event-id', '')
+        if last_event_id.isdigit():
+            since = int(last_event_id)
+        elif since is None:
+            since = change_feed.sequence
+        return StreamingResponse(
+            change_stream(since), media_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    sequence = change_feed.sequence
+    events = change_feed.since(since if since is not None else sequence)
+    if events is None:
+        raise HTTPException(status_code=410, detail="Changes since that sequence are no longer available")
+    body = b'{"sequence": %d, "events": [%s]}' % (sequence, b", ".join(event for _, event in events))
+    return Response(content=body, media_type='application/json', headers={'Cache-Control': 'no-cache'})
+
+
 @api_router.get("/monkeys/{monkey_id}", response_model=Monkey)
-async def get_monkey(monkey_id: str):
+async def get_monkey(monkey_id: str, request: Request, response: Response):
     """Get a specific monkey by ID"""
     try:
-        data = load_monkeys_data()
-        if monkey_id not in data:
+        monkey_record = store.get(monkey_id)
+        if monkey_record is None:
             raise HTTPException(status_code=404, detail="Monkey not found")
-        
-        return Monkey(**data[monkey_id])
+
+        etag = record_etag(monkey_record)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if TRUSTED_OUTPUT:
+            return Response(content=store.encoded(monkey_record), media_type='application/json', headers=headers)
+
+        response.headers.update(headers)
+        return Monkey(**monkey_record)
     except HTTPException:
         raise
     except Exception as e:
@@ -200,40 +1069,68 @@ async def get_monkey(monkey_id: str):
 
 
 @api_router.put("/monkeys/{monkey_id}", response_model=Monkey)
-async def update_monkey(monkey_id: str, updates: MonkeyUpdate):
-    """Update an existing monkey"""
+async def update_monkey(monkey_id: str, updates: MonkeyUpdate, request: Request, response: Response):
+    """Update an existing monkey.
+
+    Sending the monkey's ETag in ``If-Match`` (or its version as
+    ``expected_version``) makes the update conditional: if the monkey has
+    changed since, nothing is written and 409 is returned.
+    """
     try:
-        data = load_monkeys_data()
-        if monkey_id not in data:
-            raise HTTPException(status_code=404, detail="Monkey not found")
-        
-        existing_monkey = data[monkey_id]
-        
-        # Check for name duplicate if name or species is being updated
-        update_dict = updates.dict(exclude_unset=True)
-        if 'name' in update_dict or 'species' in update_dict:
-            new_name = update_dict.get('name', existing_monkey['name'])
-            new_species = update_dict.get('species', existing_monkey['species'])
-            if await check_name_duplicate(new_name, new_species, monkey_id):
+        async with mutation_locks.hold(id_key(monkey_id)):
+            existing_monkey = store.get(monkey_id)
+            if existing_monkey is None:
+                raise HTTPException(status_code=404, detail="Monkey not found")
+            if if_match_fails(request, existing_monkey) or (
+                updates.expected_version is not None
+                and updates.expected_version != existing_monkey['version']
+            ):
+                raise version_conflict(existing_monkey)
+
+            update_dict = update_fields(updates)
+            errors = invalid_records([dict(existing_monkey, **update_dict)])
+            if errors:
                 raise HTTPException(
-                    status_code=400, 
-                    detail=f"A monkey named '{new_name}' already exists in species '{new_species}'"
+                    status_code=422, detail=[dict(error, loc=('body', *error['loc'])) for error in errors[0]]
                 )
+            new_name = update_dict.get('name', existing_monkey['name'])
+            new_species = update_dict.get('species', existing_monkey['species'])
+
+            # The old and new (species, name) slots are both held so that a
+            # concurrent create or rename cannot claim either of them midway
+            async with mutation_locks.hold(
+                name_key(existing_monkey['species'], existing_monkey['name']),
+                name_key(new_species, new_name),
+            ):
+                # Check for name duplicate if name or species is being updated
+                if 'name' in update_dict or 'species' in update_dict:
+                    if await check_name_duplicate(new_name, new_species, monkey_id):
+                        raise HTTPException(
+                            status_code=400, 
+                            detail=f"A monkey named '{new_name}' already exists in species '{new_species}'"
+                        )
+
+                # Update the monkey on a copy so readers never observe a
+                # half-applied update
+                updated_monkey = updated_monkey_record(existing_monkey, update_dict)
 
-        # Update the monkey
-        for key, value in update_dict.items():
-            if value is not None:
-                existing_monkey[key] = value
-        
-        existing_monkey['updated_at'] = datetime.utcnow().isoformat()
-        
-        # Save updated data
-        data[monkey_id] = existing_monkey
-        save_monkeys_data(data)
-        
-        return Monkey(**existing_monkey)
+                # Save updated data, unless the monkey changed since it was read
+                async with store_mutation():
+                    pending_write = store.put(updated_monkey, expected_version=existing_monkey['version'])
+                    publish_change(updated_monkey)
+
+        await saved(pending_write)
+        response.headers['ETag'] = record_etag(updated_monkey)
+        return Monkey(**updated_monkey)
     except HTTPException:
         raise
+    except DuplicateNameError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except VersionConflictError:
+        current = store.get(monkey_id)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Monkey not found")
+        raise version_conflict(current)
     except Exception as e:
         logger.error(f"Error updating monkey: {e}")
         raise HTTPException(status_code=500, detail="Error updating monkey")
@@ -243,14 +1140,18 @@ async def update_monkey(monkey_id: str, updates: MonkeyUpdate):
 async def delete_monkey(monkey_id: str):
     """Delete a monkey by ID"""
     try:
-        data = load_monkeys_data()
-        if monkey_id not in data:
-            raise HTTPException(status_code=404, detail="Monkey not found")
+        async with mutation_locks.hold(id_key(monkey_id)):
+            current = store.get(monkey_id)
+            if current is None:
+                raise HTTPException(status_code=404, detail="Monkey not found")
+
+            # Delete the monkey
+            async with mutation_locks.hold(name_key(current['species'], current['name'])):
+                async with store_mutation():
+                    pending_write = store.delete(monkey_id)
+                    publish_change(deleted_id=monkey_id)
 
-        # Delete the monkey
-        del data[monkey_id]
-        save_monkeys_data(data)
-        
+        await saved(pending_write)
         return {"message": "Monkey deleted successfully"}
     except HTTPException:
         raise
@@ -259,15 +1160,77 @@ async def delete_monkey(monkey_id: str):
         raise HTTPException(status_code=500, detail="Error deleting monkey")
 
 
+@app.on_event("startup")
+async def open_store():
+    store.open()
+    store.attach(asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+async def close_store():
+    store.close()
+
+
+class RefreshStore:
+    """ASGI middleware that applies the mutations other workers have
+    written to the store before each request is handled; they are read
+    from the shared log in a worker thread"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await refresh_store()
+        await self.app(scope, receive, send)
+
+
+class RequestMetrics:
+    """ASGI middleware recording each request's latency by method, route
+    template and status, and telling the profiler which requests are in flight"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        profiler.request_started()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Routing stores the matched route in the scope; label by its
+            # template so that IDs do not each make a series
+            route = scope.get('route')
+            REQUEST_SECONDS.labels(
+                scope['method'], route.path if route is not None else 'unmatched', str(status)
+            ).observe(time.perf_counter() - start)
+            profiler.request_finished()
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(RefreshStore)
+app.add_middleware(RequestMetrics)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Configure logging
@@ -0,0 +1,156 @@
+"""Binary registry snapshots, and a tool converting them to and from JSON.
+
+A JSON snapshot is parsed as one object per monkey with a key per field,
+and each record then has to be converted into a ``MonkeyRecord``. The
+binary format instead stores the registry column by column, so loading
+it decodes each column in one C-level call and builds the records
+straight from the columns.
+
+Format version 1, all integers little-endian::
+
+    header   8-byte magic b'MONKEYS\\x00', u16 format version, u16 flags
+             (zero), u32 number of records
+    columns  one section per field of ``records.FIELDS``, in that order,
+             each a u32 byte length followed by the column
+
+String columns are UTF-8 JSON arrays (``last_checkup_at`` holds nulls).
+``species`` and ``favourite_fruit`` are a JSON array of the distinct
+values followed by a u32 array of indexes into it, in two sections.
+``age_years`` and ``version`` are arrays of i64. Readers refuse formats
+newer than they know, so the layout can change under a new version.
+
+Convert an existing registry (snapshot plus any log) to the other format
+with, from the backend directory::
+
+    python snapshot.py monkeys_data.json        # writes monkeys_data.snap
+    python snapshot.py monkeys_data.snap        # writes monkeys_data.json
+"""
+import argparse
+import json
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+from records import FIELDS, MonkeyRecord, compact_all
+
+MAGIC = b'MONKEYS\x00'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHHI')
+LENGTH = struct.Struct('<I')
+
+# Suffix of a binary snapshot, next to the registry's JSON file
+SUFFIX = '.snap'
+
+# Columns stored as a table of distinct values plus indexes into it
+CODED = ('species', 'favourite_fruit')
+INTEGERS = ('age_years', 'version')
+
+
+class SnapshotFormatError(ValueError):
+    """Raised when a file is not a binary snapshot this version can read"""
+
+
+def _json_column(values):
+    return json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _array_bytes(typecode, values):
+    column = array(typecode, values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+
+def _array(typecode, blob):
+    column = array(typecode)
+    column.frombytes(blob)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def encode_snapshot(data):
+    """Binary snapshot of a ``{monkey_id: record}`` mapping, as bytes"""
+    rows = [record.values() if isinstance(record, MonkeyRecord) else [record.get(field) for field in FIELDS]
+            for record in data.values()]
+    columns = dict(zip(FIELDS, zip(*rows))) if rows else {field: () for field in FIELDS}
+    sections = []
+    for field in FIELDS:
+        values = columns[field]
+        if field in CODED:
+            table = {}
+            codes = [table.setdefault(value, len(table)) for value in values]
+            sections += [_json_column(list(table)), _array_bytes('I', codes)]
+        elif field in INTEGERS:
+            sections.append(_array_bytes('q', values))
+        else:
+            sections.append(_json_column(list(values)))
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(rows))]
+    for section in sections:
+        parts += [LENGTH.pack(len(section)), section]
+    return b''.join(parts)
+
+
+def decode_snapshot(blob):
+    """The ``{monkey_id: MonkeyRecord}`` mapping held by a binary snapshot"""
+    if len(blob) < HEADER.size:
+        raise SnapshotFormatError("Truncated snapshot header")
+    magic, version, _, count = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise SnapshotFormatError("Not a binary registry snapshot")
+    if version > FORMAT_VERSION:
+        raise SnapshotFormatError(f"Snapshot format {version} is newer than the supported {FORMAT_VERSION}")
+    view = memoryview(blob)
+    offset = HEADER.size
+
+    def section():
+        nonlocal offset
+        if offset + LENGTH.size > len(blob):
+            raise SnapshotFormatError("Truncated snapshot")
+        (length,) = LENGTH.unpack_from(blob, offset)
+        start, offset = offset + LENGTH.size, offset + LENGTH.size + length
+        if offset > len(blob):
+            raise SnapshotFormatError("Truncated snapshot")
+        return view[start:offset]
+
+    columns = []
+    for field in FIELDS:
+        if field in CODED:
+            table = json.loads(bytes(section()))
+            columns.append(list(map(table.__getitem__, _array('I', section()))))
+        elif field in INTEGERS:
+            columns.append(_array('q', section()).tolist())
+        else:
+            columns.append(json.loads(bytes(section())))
+    if any(len(column) != count for column in columns):
+        raise SnapshotFormatError("Snapshot columns do not match its record count")
+    return dict(zip(columns[0], map(MonkeyRecord, *columns)))
+
+
+def main():
+    from storage import read_registry, write_binary_snapshot, write_json_atomic
+    from store import upgrade_records
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', type=Path, help='registry to convert: a .json or a .snap file')
+    parser.add_argument('--output', type=Path, help='file to write (default: the source with the other suffix)')
+    args = parser.parse_args()
+
+    binary = args.source.suffix == SUFFIX
+    # Any log next to the JSON file is folded in; it is replayed again
+    # harmlessly if left in place, as every entry carries whole records
+    json_path = args.source.with_suffix('.json') if binary else args.source
+    # Records from before versions and normalized checkup times are upgraded
+    # as the store does on load, since a binary column cannot hold gaps
+    data = compact_all(upgrade_records(read_registry(json_path, 'binary' if binary else 'json')))
+    output = args.output or args.source.with_suffix('.json' if binary else SUFFIX)
+    if output.suffix == SUFFIX:
+        write_binary_snapshot(output, data)
+    else:
+        write_json_atomic(output, data)
+    print(f"Wrote {len(data)} monkeys to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Registry-wide aggregates kept up to date by ``MonkeyStore``.
+
+``RegistryStats`` is told about every record (a ``MonkeyRecord``) that
+enters or leaves the store's indexes and keeps, per species, the count,
+the sum of ages and how many monkeys have each age, plus a histogram of
+ages over all species and a count per favourite fruit. Fruits are also kept in a
+``SortedIndex`` ordered by descending count, so the top fruits are its
+first entries. Reading any aggregate therefore never walks the records.
+"""
+from itertools import islice
+
+from search import SortedIndex
+
+
+# Width, in years, of the buckets of the age histogram
+AGE_BUCKET_YEARS = 5
+
+
+class RegistryStats:
+    """Incrementally maintained counts and age/fruit distributions"""
+
+    def __init__(self):
+        # species -> [count, age sum, {age: count}]
+        self._species = {}
+        self._age_buckets = {}
+        self._fruits = {}
+        self._fruit_order = SortedIndex()
+        self.never_checked = 0
+
+    def add(self, record):
+        self._update(record, 1)
+
+    def remove(self, record):
+        self._update(record, -1)
+
+    def _update(self, record, delta):
+        age = record.age_years
+        entry = self._species.get(record.species)
+        if entry is None:
+            entry = self._species[record.species] = [0, 0, {}]
+        entry[0] += delta
+        entry[1] += delta * age
+        _bump(entry[2], age, delta)
+        if not entry[0]:
+            del self._species[record.species]
+        _bump(self._age_buckets, age // AGE_BUCKET_YEARS, delta)
+
+        fruit = record.favourite_fruit
+        count = self._fruits.get(fruit, 0)
+        if count:
+            self._fruit_order.remove(-count, fruit)
+        count += delta
+        if count:
+            self._fruits[fruit] = count
+            self._fruit_order.add(-count, fruit)
+        else:
+            del self._fruits[fruit]
+
+        if not record.last_checkup_at:
+            self.never_checked += delta
+
+    def species(self):
+        """``{species: {count, mean_age, min_age, max_age}}`` for every species with monkeys"""
+        return {
+            species: {
+                'count': count,
+                'mean_age': age_sum / count,
+                'min_age': min(ages),
+                'max_age': max(ages),
+            }
+            for species, (count, age_sum, ages) in sorted(self._species.items())
+        }
+
+    def age_histogram(self):
+        """``[(min_age, max_age, count)]`` for each non-empty bucket, youngest first"""
+        return [
+            (bucket * AGE_BUCKET_YEARS, (bucket + 1) * AGE_BUCKET_YEARS - 1, count)
+            for bucket, count in sorted(self._age_buckets.items())
+        ]
+
+    def top_fruits(self, k):
+        """The ``k`` most common favourite fruits as ``(fruit, count)``, ties by name"""
+        return [(fruit, -negated) for negated, fruit in islice(self._fruit_order.walk(), k)]
+
+
+def _bump(counts, key, delta):
+    count = counts.get(key, 0) + delta
+    if count:
+        counts[key] = count
+    else:
+        del counts[key]
@@ -0,0 +1,714 @@
+"""Persistence engines behind the in-memory ``MonkeyStore``.
+
+Every engine implements ``StorageEngine``: ``load()`` returns the
+registry mapping, ``write(entries)`` records a group of mutations,
+``position()`` identifies how far the recorded changes go, and
+``sync(store)`` is called periodically to make them durable. Outside of
+``load()`` an engine is only used by the store's writer thread (see
+``writer.py``), or inline by a store without one or with a ``shared``
+engine. ``create_storage`` picks the engine named by the
+``STORAGE_BACKEND`` setting.
+
+Log entries are dicts: ``{'op': 'put', 'record': ...}``,
+``{'op': 'delete', 'monkey_id': ...}``, ``{'op': 'batch', 'puts': [...],
+'deletes': [...]}`` (deletes applied first) and ``{'op': 'replace',
+'records': {...}}``. The WAL log also holds ``{'op': 'clear'}`` records
+and, first in a log shared between processes, a ``{'op': 'generation'}``
+header; replaying ignores the header.
+
+The WAL engine keeps its snapshot either as JSON in the registry file
+itself or, with ``snapshot_format='binary'``, in the columnar format of
+``snapshot.py`` next to it (``monkeys_data.snap``), which loads faster.
+"""
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Protocol
+
+from snapshot import SUFFIX as BINARY_SUFFIX
+from snapshot import decode_snapshot, encode_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+
+def write_json_atomic(path, data, indent=None):
+    """Write ``data`` to ``path`` via a fsynced temp file and an atomic rename"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        # Records held in memory are mappings, but not necessarily dicts
+        json.dump(data, f, indent=indent, separators=(',', ':') if indent is None else None, default=dict)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path.parent)
+
+
+def write_binary_snapshot(path, data):
+    """Write ``data`` to ``path`` as a binary snapshot, like ``write_json_atomic``"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_snapshot(data))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path.parent)
+
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_json_snapshot(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading data: {e}")
+        return {}
+
+
+def snapshot_path(path, snapshot_format='json'):
+    """File holding the snapshot of the registry kept at ``path``"""
+    if snapshot_format == 'binary':
+        return Path(path).with_suffix(BINARY_SUFFIX)
+    if snapshot_format != 'json':
+        raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+    return Path(path)
+
+
+def read_snapshot(path, snapshot_format='json'):
+    """Read the snapshot of the registry kept at ``path``.
+
+    After ``SNAPSHOT_FORMAT`` has been switched both a JSON and a binary
+    snapshot may exist. Compaction trims the log to the snapshot it has
+    just written, so the one written last is read whatever the format
+    (on a tie, the configured one): the other is missing changes the log
+    no longer holds. A binary snapshot that cannot be read raises rather
+    than starting from an empty registry.
+    """
+    json_path = Path(path)
+    binary_path = snapshot_path(path, 'binary')
+    binary_time = binary_path.stat().st_mtime if binary_path.exists() else None
+    json_time = json_path.stat().st_mtime if json_path.exists() else None
+    if binary_time is not None and (
+        json_time is None or binary_time > json_time or (binary_time == json_time and snapshot_format == 'binary')
+    ):
+        if snapshot_format != 'binary':
+            logger.warning(f"Reading {binary_path}, which is newer than {json_path}")
+        with open(binary_path, 'rb') as f:
+            return decode_snapshot(f.read())
+    if snapshot_format == 'binary' and binary_time is not None:
+        logger.warning(f"Reading {json_path}, which is newer than {binary_path}")
+    return read_json_snapshot(json_path)
+
+
+def read_log(log_path, offset=0):
+    """Yield ``(entry, size)`` for each complete record of a mutation log from
+    byte ``offset`` on, stopping at a torn tail"""
+    with open(log_path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                return
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                return
+            yield entry, len(line)
+
+
+def read_registry(path, snapshot_format='json'):
+    """Read the registry kept at ``path`` by ``JsonFileStorage`` or ``WalStorage``
+    (snapshot plus any log) without modifying the files"""
+    data = read_snapshot(path, snapshot_format)
+    log_path = Path(path).with_name(Path(path).name + '.wal')
+    if log_path.exists():
+        for entry, _ in read_log(log_path):
+            apply_entry(data, entry)
+    return data
+
+
+def apply_entry(data, entry):
+    """Apply a log entry to a ``{monkey_id: record}`` mapping"""
+    op = entry['op']
+    if op == 'put':
+        record = entry['record']
+        previous = data.get(record['monkey_id'])
+        if previous is not None and previous['species'] != record['species']:
+            # Mirror the store, which files a re-speciated monkey last
+            del data[record['monkey_id']]
+        data[record['monkey_id']] = record
+    elif op == 'delete':
+        data.pop(entry['monkey_id'], None)
+    elif op == 'batch':
+        for monkey_id in entry['deletes']:
+            data.pop(monkey_id, None)
+        for record in entry['puts']:
+            apply_entry(data, {'op': 'put', 'record': record})
+    elif op == 'clear':
+        data.clear()
+    elif op == 'replace':
+        data.clear()
+        data.update(entry['records'])
+
+
+class StorageEngine(Protocol):
+    """Interface between ``MonkeyStore`` and a persistence engine"""
+
+    path: Path
+    # Whether other processes write the same files (see SharedWalStorage)
+    shared: bool
+
+    def load(self) -> dict:
+        """Return the stored ``{monkey_id: record}`` mapping, in registry order"""
+
+    def position(self):
+        """Opaque marker of how far the recorded mutations go"""
+
+    def write(self, entries: list) -> None:
+        """Record log entries in order; each batch or replace is all-or-nothing
+        and a put that changes a record's species moves it last"""
+
+    def sync(self, store) -> bool:
+        """Make every recorded mutation durable; False if there was nothing to do"""
+
+    def close(self, store) -> None:
+        ...
+
+
+class JsonFileStorage:
+    """Whole-file JSON snapshot, rewritten by the flusher when dirty"""
+
+    shared = False
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._changes = 0
+        self._written = 0
+
+    def load(self):
+        self._changes = self._written = 0
+        return read_snapshot(self.path)
+
+    def position(self):
+        return self._changes
+
+    def write(self, entries):
+        # The store's snapshot already holds the changes; count them so
+        # sync() knows the file is stale
+        self._changes += len(entries)
+
+    def sync(self, store):
+        data, position = store.snapshot()
+        if position == self._written:
+            return False
+        write_json_atomic(self.path, data, indent=2)
+        self._written = position
+        return True
+
+    def close(self, store):
+        self.sync(store)
+
+
+class WalStorage:
+    """Snapshot plus an append-only, newline-delimited mutation log.
+
+    Each group of mutations is appended to ``<path>.wal`` with a single
+    ``write()`` so it survives the process being killed; ``sync()`` fsyncs the appended
+    records as a group. Records carry whole monkeys, so replaying a log on
+    top of any newer snapshot converges to the same registry, which lets
+    compaction write the snapshot first and trim the log afterwards without
+    a window in which a crash loses data.
+    """
+
+    shared = False
+
+    def __init__(self, path, compact_min_bytes=1 << 20, snapshot_format='json'):
+        self.path = Path(path)
+        self.log_path = self.path.with_name(self.path.name + '.wal')
+        self.snapshot_format = snapshot_format
+        self.snapshot_path = snapshot_path(path, snapshot_format)
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.Lock()
+        self._fd = None
+        self._offset = 0
+        self._synced = 0
+        self._snapshot_bytes = 0
+        # Set while a failed append may have left part of a record behind
+        self._torn = False
+
+    def load(self):
+        data = read_snapshot(self.path, self.snapshot_format)
+        self._snapshot_bytes = self._snapshot_size()
+        valid_bytes = 0
+        replayed = 0
+        if self.log_path.exists():
+            for entry, size in read_log(self.log_path):
+                apply_entry(data, entry)
+                valid_bytes += size
+                replayed += 1
+            if valid_bytes != self.log_path.stat().st_size:
+                logger.warning(f"Discarding torn tail of {self.log_path}")
+                os.truncate(self.log_path, valid_bytes)
+        if replayed:
+            logger.info(f"Replayed {replayed} log records from {self.log_path}")
+        self._fd = os.open(self.log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._offset = self._synced = valid_bytes
+        return data
+
+    def position(self):
+        with self._lock:
+            return self._offset
+
+    def _snapshot_size(self):
+        return self.snapshot_path.stat().st_size if self.snapshot_path.exists() else 0
+
+    def _write_snapshot(self, data):
+        if self.snapshot_format == 'binary':
+            write_binary_snapshot(self.snapshot_path, data)
+        else:
+            write_json_atomic(self.path, data)
+        self._snapshot_bytes = self._snapshot_size()
+
+    def _append(self, payload):
+        """Append ``payload`` whole or not at all.
+
+        A write that fails partway (the disk filling up, say) is cut back
+        off the log: replay stops at the first incomplete line, so a
+        fragment left in place would hide every later append.
+        """
+        with self._lock:
+            if self._torn:
+                self._truncate_tail()
+            view = memoryview(payload)
+            written = 0
+            try:
+                while written < len(view):
+                    written += os.write(self._fd, view[written:])
+            except BaseException:
+                self._torn = True
+                self._truncate_tail()
+                raise
+            self._offset += written
+
+    def _truncate_tail(self):
+        # With the lock held; if this fails too, the next append retries it
+        try:
+            os.ftruncate(self._fd, self._offset)
+        except OSError as e:
+            logger.error(f"Error truncating {self.log_path} after a failed append: {e}")
+            return
+        self._torn = False
+
+    @staticmethod
+    def _encode(entry):
+        # Records held by the store are MonkeyRecord mappings
+        return json.dumps(entry, separators=(',', ':'), default=dict).encode() + b'\n'
+
+    def _lines(self, entry):
+        if entry['op'] == 'replace':
+            yield self._encode({'op': 'clear'})
+            for record in entry['records'].values():
+                yield self._encode({'op': 'put', 'record': record})
+        else:
+            # A batch is one line, so a torn write drops all of it rather than part
+            yield self._encode(entry)
+
+    def write(self, entries):
+        """Append ``entries`` to the log with a single ``write()``"""
+        self._append(b''.join(line for entry in entries for line in self._lines(entry)))
+
+    def sync(self, store):
+        """Group-fsync pending appends and compact once the log outgrows the snapshot"""
+        with self._lock:
+            fd, offset = self._fd, self._offset
+        if fd is None:
+            return False
+        appended = offset != self._synced
+        if appended:
+            os.fsync(fd)
+            self._synced = offset
+        if offset > max(self.compact_min_bytes, self._snapshot_bytes):
+            self.compact(store)
+            return True
+        return appended
+
+    def compact(self, store):
+        """Fold the log into a new snapshot and keep only the records appended meanwhile"""
+        data, cut = store.snapshot()
+        self._write_snapshot(data)
+        with self._lock:
+            with open(self.log_path, 'rb') as f:
+                f.seek(cut)
+                tail = f.read()
+            self._rewrite_log(tail)
+            os.close(self._fd)
+            self._fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND)
+            self._offset = self._synced = len(tail)
+        logger.info(f"Compacted {self.log_path} into {self.path}")
+
+    def _rewrite_log(self, content):
+        """Atomically replace the log file with ``content``"""
+        tmp_path = self.log_path.with_name(self.log_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        _fsync_dir(self.log_path.parent)
+
+    def close(self, store):
+        self.sync(store)
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class SharedWalStorage(WalStorage):
+    """``WalStorage`` whose files are written by several server processes.
+
+    Appends happen under an exclusive ``flock`` on ``<path>.lock``, and
+    only once the appending process has applied every record the others
+    logged before it, so the checks its store makes (unique names,
+    record versions) hold across processes. A process notices changes
+    from the log's inode and size without locking, then reads just the
+    records past its own offset (``changes()``).
+
+    Compaction runs under the same lock and starts the new log with a
+    ``generation`` header naming the offset the old log was cut at: a
+    process that had read that far carries on in the new log, any other
+    reloads the registry.
+    """
+
+    shared = True
+
+    def __init__(self, path, compact_min_bytes=1 << 20, snapshot_format='json'):
+        super().__init__(path, compact_min_bytes, snapshot_format)
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self._lock_fd = None
+        self._local = threading.RLock()
+        self._depth = 0
+        self._exclusive = False
+        self._inode = None
+        self._generation = 0
+        self._retired = []
+
+    def load(self):
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        # Exclusive, so that a torn tail cannot be another process's append in progress
+        with self.locked():
+            data = super().load()
+            self._generation = self._read_header()[0]
+            self._inode = os.fstat(self._fd).st_ino
+        return data
+
+    @contextmanager
+    def locked(self, shared=False, blocking=True):
+        """Hold the inter-process lock, shared or exclusive.
+
+        Yields False instead of waiting if ``blocking`` is off and the lock is
+        taken. A thread already holding it can take it again, in whatever
+        mode it first took it.
+        """
+        if not self._local.acquire(blocking):
+            yield False
+            return
+        if self._depth:
+            self._depth += 1
+            try:
+                yield True
+            finally:
+                self._depth -= 1
+                self._local.release()
+            return
+        try:
+            mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            try:
+                fcntl.flock(self._lock_fd, mode if blocking else mode | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            self._exclusive = not shared
+            self._depth = 1
+            try:
+                yield True
+            finally:
+                self._depth = 0
+                self._exclusive = False
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        finally:
+            self._local.release()
+
+    def changed(self):
+        """Whether the log was appended to or compacted since this process last read it"""
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return False
+        return stat.st_ino != self._inode or stat.st_size != self._offset
+
+    def changes(self):
+        """Return the log entries other processes appended since the last call.
+
+        Must be called under ``locked()``. If another process compacted the
+        log past what this one had read, the entries start with a 'replace'
+        of the whole registry. Under the exclusive lock a torn tail, left by
+        a process that died mid-append, is cut off.
+        """
+        entries = []
+        stat = os.stat(self.log_path)
+        if stat.st_ino != self._inode:
+            generation, cut, header = self._read_header()
+            if generation == self._generation + 1 and self._offset >= cut:
+                self._switch(generation, header + self._offset - cut)
+            else:
+                logger.info(f"Reloading {self.path} after a compaction by another process")
+                self._switch(generation, 0)
+                entries.append({'op': 'replace', 'records': read_snapshot(self.path, self.snapshot_format)})
+        valid = self._offset
+        for entry, size in read_log(self.log_path, valid):
+            entries.append(entry)
+            valid += size
+        with self._lock:
+            if self._synced == self._offset:
+                # Other processes sync their own appends
+                self._synced = valid
+            self._offset = valid
+        if valid != stat.st_size and self._exclusive:
+            logger.warning(f"Discarding torn tail of {self.log_path}")
+            os.truncate(self.log_path, valid)
+        return entries
+
+    def _read_header(self):
+        """``(generation, cut, size)`` of the log's generation header; zeros without one"""
+        with open(self.log_path, 'rb') as f:
+            line = f.readline(256)
+        try:
+            entry = json.loads(line) if line.endswith(b'\n') else None
+        except ValueError:
+            entry = None
+        if isinstance(entry, dict) and entry.get('op') == 'generation':
+            return entry['generation'], entry['cut'], len(line)
+        return 0, 0, 0
+
+    def _switch(self, generation, offset):
+        """Move on to the log file now at ``log_path``, positioned at ``offset``"""
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND)
+        with self._lock:
+            # Closed by the next sync(), which may be fsyncing the old one
+            self._retired.append(self._fd)
+            self._fd = fd
+            self._offset = self._synced = offset
+        self._generation = generation
+        self._inode = os.fstat(fd).st_ino
+        self._snapshot_bytes = self._snapshot_size()
+
+    def sync(self, store):
+        result = super().sync(store)
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for fd in retired:
+            os.close(fd)
+        return result
+
+    def compact(self, store):
+        """Fold the log into a new snapshot under the inter-process lock.
+
+        Records past the store's position, which other processes appended
+        and this one has not applied yet, are kept after the new header.
+        Skipped if another process has compacted since this one last
+        caught up.
+        """
+        with self.locked():
+            if os.stat(self.log_path).st_ino != self._inode:
+                return
+            data, cut = store.snapshot()
+            self._write_snapshot(data)
+            generation = self._generation + 1
+            header = self._encode({'op': 'generation', 'generation': generation, 'cut': cut})
+            with open(self.log_path, 'rb') as f:
+                f.seek(cut)
+                tail = f.read()
+            self._rewrite_log(header + tail)
+            self._switch(generation, len(header))
+        logger.info(f"Compacted {self.log_path} into {self.path} (generation {generation})")
+
+    def close(self, store):
+        super().close(store)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+class SqliteStorage:
+    """One row per monkey in an SQLite database in WAL journal mode.
+
+    Each ``write()`` is committed as one transaction with
+    ``synchronous=NORMAL``, so it survives the process being killed; ``sync()`` checkpoints the SQLite WAL, which fsyncs the commits
+    made since as a group. Rows keep the whole record as JSON next to
+    indexed ``species``, ``name`` and ``updated_at`` columns, so the
+    database can also be queried directly. Row order follows the store:
+    a re-speciated monkey is re-inserted last.
+
+    A new database is seeded from ``import_from``, a registry written by
+    the JSON engines, if that exists.
+    """
+
+    shared = False
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS monkeys (
+            seq INTEGER PRIMARY KEY,
+            monkey_id TEXT NOT NULL UNIQUE,
+            species TEXT NOT NULL,
+            name TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            record TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS monkeys_species_name ON monkeys (species, name COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS monkeys_updated_at ON monkeys (updated_at);
+    """
+
+    def __init__(self, path, import_from=None):
+        self.path = Path(path)
+        self.import_from = Path(import_from) if import_from is not None else None
+        self._lock = threading.Lock()
+        self._conn = None
+        self._changes = 0
+        self._synced = 0
+
+    def load(self):
+        created = not self.path.exists()
+        # Opened on the caller's thread, then used by the store's writer thread
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        self._changes = self._synced = 0
+        if created and self.import_from is not None and self.import_from.exists():
+            data = read_registry(self.import_from)
+            self.write([{'op': 'replace', 'records': data}])
+            self.sync(None)
+            logger.info(f"Imported {len(data)} monkeys from {self.import_from} into {self.path}")
+        rows = self._conn.execute('SELECT monkey_id, record FROM monkeys ORDER BY seq')
+        return {monkey_id: json.loads(record) for monkey_id, record in rows}
+
+    def position(self):
+        with self._lock:
+            return self._changes
+
+    def _put(self, record):
+        row = self._conn.execute(
+            'SELECT species FROM monkeys WHERE monkey_id = ?', (record['monkey_id'],)
+        ).fetchone()
+        values = (record['species'], record['name'], record['updated_at'],
+                  json.dumps(record, separators=(',', ':'), default=dict), record['monkey_id'])
+        if row is not None and row[0] == record['species']:
+            self._conn.execute(
+                'UPDATE monkeys SET species = ?, name = ?, updated_at = ?, record = ? WHERE monkey_id = ?',
+                values,
+            )
+            return
+        if row is not None:
+            self._delete(record['monkey_id'])
+        self._conn.execute(
+            'INSERT INTO monkeys (species, name, updated_at, record, monkey_id) VALUES (?, ?, ?, ?, ?)',
+            values,
+        )
+
+    def _delete(self, monkey_id):
+        self._conn.execute('DELETE FROM monkeys WHERE monkey_id = ?', (monkey_id,))
+
+    def _apply(self, entry):
+        op = entry['op']
+        if op == 'put':
+            self._put(entry['record'])
+        elif op == 'delete':
+            self._delete(entry['monkey_id'])
+        elif op == 'batch':
+            for monkey_id in entry['deletes']:
+                self._delete(monkey_id)
+            for record in entry['puts']:
+                self._put(record)
+        elif op == 'replace':
+            self._conn.execute('DELETE FROM monkeys')
+            for record in entry['records'].values():
+                self._put(record)
+
+    def write(self, entries):
+        """Apply ``entries`` in one transaction"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for entry in entries:
+                    self._apply(entry)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            self._changes += 1
+
+    def sync(self, store):
+        """Checkpoint the commits made since the last sync into the database file"""
+        with self._lock:
+            if self._conn is None or self._changes == self._synced:
+                return False
+            self._conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+            self._synced = self._changes
+            return True
+
+    def close(self, store):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                self._conn.close()
+                self._conn = None
+
+
+def create_storage(kind, path, shared=False, snapshot_format='json'):
+    """Build the persistence engine named by ``kind`` ('wal', 'json' or 'sqlite').
+
+    The SQLite engine keeps its database next to ``path`` with a ``.db``
+    suffix and imports the JSON registry at ``path`` when first created.
+    With ``shared`` the files may be written by several processes at once,
+    which only the WAL engine supports, as it does ``snapshot_format``
+    'binary'.
+    """
+    if snapshot_format not in ('json', 'binary'):
+        raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+    if snapshot_format == 'binary' and kind != 'wal':
+        raise ValueError(f"The '{kind}' storage backend only keeps JSON; binary snapshots need 'wal'")
+    if shared:
+        if kind != 'wal':
+            raise ValueError(f"The '{kind}' storage backend cannot be shared between processes; use 'wal'")
+        return SharedWalStorage(path, snapshot_format=snapshot_format)
+    if kind == 'wal':
+        return WalStorage(path, snapshot_format=snapshot_format)
+    if kind == 'json':
+        return JsonFileStorage(path)
+    if kind == 'sqlite':
+        db_path = Path(path).with_suffix('.db')
+        return SqliteStorage(db_path, import_from=path if db_path != Path(path) else None)
+    raise ValueError(f"Unknown storage backend: {kind}")
@@ -0,0 +1,762 @@
+"""Process-resident monkey registry store.
+
+The registry is loaded once when the store is opened. Every read is
+served from memory. Mutations are applied in memory and handed to a
+writer thread (see ``writer.py``), which records them with the
+persistence engine (see ``storage.py``) and makes them durable every
+``flush_interval`` seconds, so no file I/O happens on the caller's
+thread. ``close()`` performs a final flush on shutdown.
+
+With an engine shared between processes, such as one server worker per
+CPU, a mutation is appended under the engine's inter-process lock, after
+applying the records the other processes appended, and ``refresh()``
+applies those records between requests. The caller takes the lock and
+appends itself, unless it has the writer thread hold the lock for it
+(``hold_log()``) and reads the others' records off its own thread
+(``fetch_changes()``), as the server does to keep its event loop free.
+"""
+import json
+import logging
+import threading
+import uuid
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+
+from metrics import OPERATION_SECONDS, STORAGE_ENTRIES
+from records import MonkeyRecord, compact, compact_all
+from search import NameSearchIndex, SortedIndex
+from stats import RegistryStats
+from storage import JsonFileStorage, apply_entry
+from writer import StorageWriter, written
+
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateNameError(ValueError):
+    """Raised when a write would give two monkeys of one species the same name"""
+
+    def __init__(self, name, species):
+        super().__init__(f"A monkey named '{name}' already exists in species '{species}'")
+        self.name = name
+        self.species = species
+
+
+class VersionConflictError(ValueError):
+    """Raised when a record changed since the version a write was based on"""
+
+    def __init__(self, monkey_id, expected, current):
+        super().__init__(f"Monkey {monkey_id} is at version {current}, not {expected}")
+        self.monkey_id = monkey_id
+        self.expected = expected
+        self.current = current
+
+
+def name_index_key(species, name):
+    return (species, name.casefold())
+
+
+def encode_record(record):
+    """Wire form of a record: the bytes FastAPI's JSONResponse would produce for it"""
+    if isinstance(record, MonkeyRecord):
+        record = record.to_dict()
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def normalize_timestamp(value):
+    """Parse an ISO 8601 date or date-time into the form the store keeps.
+
+    Like ``created_at``, stored timestamps are naive UTC in
+    ``datetime.isoformat()`` form, so comparing them as strings compares
+    them in time. Aware values are converted to UTC; a blank value is
+    None. Raises ``ValueError`` for anything that does not parse.
+    """
+    if value is None or not value.strip():
+        return None
+    text = value.strip()
+    if text[-1] in 'Zz':
+        text = text[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def upgrade_records(data):
+    """Give records stored before they carried a version their first one, and
+    normalize checkup times stored before they were normalized on write.
+
+    Records needing either are replaced in ``data`` (records are never
+    mutated in place, and ``MonkeyRecord`` cannot be).
+    """
+    for monkey_id, record in data.items():
+        changes = {}
+        if 'version' not in record:
+            changes['version'] = 1
+        checkup = record.get('last_checkup_at')
+        if checkup is not None:
+            try:
+                normalized = normalize_timestamp(checkup)
+            except ValueError:
+                logger.warning(f"Unparseable last_checkup_at {checkup!r} of monkey {record['monkey_id']}")
+                normalized = checkup
+            if normalized != checkup:
+                changes['last_checkup_at'] = normalized
+        if changes:
+            data[monkey_id] = compact(dict(record, **changes), monkey_id)
+    return data
+
+
+# Fields the list endpoint can sort by; each has a maintained sort order
+SORT_FIELDS = ('name', 'age_years', 'created_at', 'updated_at', 'last_checkup_at')
+
+# Bound between the sort key of monkeys never checked ('') and every checkup time
+CHECKED = '\x00'
+
+
+def sort_key(field, record):
+    """Sort key of ``record`` for ``field``; names sort case-insensitively and
+    monkeys that never had a checkup sort first"""
+    value = record[field]
+    if field == 'name':
+        return value.lower()
+    if value is None:
+        return ''
+    return value
+
+
+class MonkeyStore:
+    """In-memory registry keyed by ``monkey_id`` with write-behind persistence.
+
+    Besides the primary mapping the store keeps, updated on every mutation,
+    a unique index from (species, casefolded name) to ``monkey_id`` and a
+    partition of the records per species, a trigram/prefix index over names,
+    a sort order per field in ``SORT_FIELDS`` and the aggregates in
+    ``stats`` (see ``stats.py``). Partitions and the name
+    index preserve the order of the primary mapping; a monkey whose species
+    changes is moved to the end of all of them.
+
+    Records are held as ``MonkeyRecord`` objects (see ``records.py``),
+    whatever form they were put in.
+
+    Every record carries its own ``version``, starting at 1 and raised by
+    each update; ``put`` can refuse a write based on an outdated version.
+    Every mutation also bumps the store's ``version``, and the store
+    remembers the version at which each species last changed, so readers
+    can tell whether a cached list is still current. ``epoch`` changes on
+    every ``open()`` because store versions restart from zero; they count
+    the changes applied by this process, whichever process made them.
+    """
+
+    def __init__(self, path=None, flush_interval=1.0, storage=None, max_pending=10000):
+        self.storage = storage if storage is not None else JsonFileStorage(path)
+        self.path = self.storage.path
+        self.shared = self.storage.shared
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._data = {}
+        self._names = {}
+        self._by_species = {}
+        self._search = NameSearchIndex()
+        self._orders = {field: SortedIndex() for field in SORT_FIELDS if field != 'name'}
+        self._encoded = {}
+        self.stats = RegistryStats()
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._version_floor = 0
+        self._species_versions = {}
+        self._lock = threading.Lock()
+        self._writer = None
+        # Log entries read from a shared engine but not applied yet, in log order
+        self._incoming = deque()
+        # (future, undo) of the mutations queued for the writer thread
+        self._unwritten = deque()
+        self._holding = False
+        self._held = ExitStack()
+        self._loop = None
+
+    # Lifecycle
+    def open(self):
+        """Load the registry and start the writer thread.
+
+        With a ``flush_interval`` of 0 there is no writer thread: mutations
+        are written by the calling thread and only ``flush()`` syncs them.
+        With a shared engine the thread only syncs.
+        """
+        with OPERATION_SECONDS.labels('storage_load').time():
+            self._data = compact_all(upgrade_records(self.storage.load()))
+        self._encoded = {}
+        self._incoming.clear()
+        self._unwritten.clear()
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._rebuild_indexes()
+        if self.flush_interval and self.flush_interval > 0:
+            self._writer = StorageWriter(self.storage, self, self.flush_interval, self.max_pending)
+            self._writer.start()
+        logger.info(f"Loaded {len(self._data)} monkeys from {self.path}")
+
+    def attach(self, loop):
+        """Make changes the writer thread has to make in memory (undoing
+        failed writes) on ``loop``'s thread, where readers iterate the registry"""
+        self._loop = loop
+
+    def defer(self, fn, *args):
+        """Run ``fn(*args)`` on the attached event loop, or at once without one"""
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(fn, *args)
+                return
+            except RuntimeError:
+                # The loop has been closed
+                pass
+        fn(*args)
+
+    def close(self):
+        """Stop the writer thread and write any pending changes"""
+        if self._writer is not None:
+            self._writer.stop()
+            self._writer = None
+        self.storage.close(self)
+
+    # Reads
+    def get(self, monkey_id):
+        return self._data.get(monkey_id)
+
+    def __contains__(self, monkey_id):
+        return monkey_id in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def values(self, species=None):
+        """Iterate all records, or only those of ``species`` via its partition"""
+        if species is None:
+            return self._data.values()
+        return self._by_species.get(species, {}).values()
+
+    def count(self, species=None):
+        if species is None:
+            return len(self._data)
+        return len(self._by_species.get(species, ()))
+
+    def items(self):
+        return self._data.items()
+
+    def all(self):
+        """Return the live registry mapping"""
+        return self._data
+
+    def encoded(self, record):
+        """Return the cached wire form of ``record``, encoding it on first use.
+
+        Records are validated before they are stored and never mutated, so
+        their encoding can be reused until the record is replaced.
+        """
+        blob = self._encoded.get(record['monkey_id'])
+        if blob is None:
+            blob = self._encoded[record['monkey_id']] = encode_record(record)
+        return blob
+
+    def species_version(self, species=None):
+        """Version at which the records of ``species`` (or any record) last changed"""
+        if species is None:
+            return self.version
+        return max(self._version_floor, self._species_versions.get(species, 0))
+
+    def refresh(self):
+        """Apply the mutations other processes recorded since the last refresh.
+
+        Returns the IDs of the monkeys they changed; only a store with a
+        shared engine ever has any. A refresh that would have to wait for
+        another process's write is skipped, to be picked up next time.
+        """
+        self.fetch_changes()
+        return self.apply_changes()
+
+    def fetch_changes(self):
+        """Read the records other processes appended since the last read,
+        for ``apply_changes()`` to apply; skipped if it would have to wait.
+
+        Does file I/O but leaves the registry alone, so it can run on any thread.
+        """
+        if not self.shared or not self.storage.changed():
+            return
+        with self.storage.locked(shared=True, blocking=False) as acquired:
+            if acquired:
+                self._incoming.extend(self.storage.changes())
+
+    def apply_changes(self):
+        """Apply the records ``fetch_changes()`` or ``hold_log()`` read, on
+        the thread readers run on; returns the IDs of the monkeys they changed"""
+        entries = []
+        while self._incoming:
+            entries.append(self._incoming.popleft())
+        if not entries:
+            return []
+        with self._lock:
+            return self._apply_entries(entries)
+
+    def checkups_before(self, cutoff):
+        """Number of monkeys whose last checkup was before ``cutoff``, an ISO
+        timestamp; monkeys never checked are counted in ``stats.never_checked``"""
+        return self._orders['last_checkup_at'].count_below(cutoff) - self.stats.never_checked
+
+    def find_by_name(self, species, name):
+        """Return the ``monkey_id`` holding ``name`` within ``species``, if any"""
+        return self._names.get(name_index_key(species, name))
+
+    def search(self, query, species=None):
+        """Return records whose name or species contains ``query`` (case-insensitive).
+
+        Name matches come from the trigram index, so only candidate records
+        are examined; results are in the same order as ``values(species)``.
+        """
+        query = query.lower()
+        species_hits = {name for name in self._by_species if query in name.lower()}
+        if species is not None:
+            species_hits &= {species}
+        name_hits = self._search.match(query)
+        if species_hits:
+            # Whole partitions match, so walk them in order rather than sort
+            name_hits = set(name_hits)
+            return [
+                record for record in self.values(species)
+                if record.species in species_hits or record.monkey_id in name_hits
+            ]
+        records = (self._data[monkey_id] for monkey_id in name_hits)
+        if species is None:
+            return list(records)
+        return [record for record in records if record.species == species]
+
+    def complete(self, prefix, limit=10):
+        """Return up to ``limit`` records whose name starts with ``prefix``, by name"""
+        return [self._data[monkey_id] for monkey_id in self._search.complete(prefix, limit)]
+
+    def page(self, sort, descending=False, limit=None, after=None, species=None, search=None,
+             low=None, high=None):
+        """Return up to ``limit`` (default: all) records in ``sort`` order and the position to resume from.
+
+        Positions are ``(sort key, monkey_id)`` pairs; ``after`` resumes
+        strictly past one. The returned position is None on the last page.
+        Unfiltered and species-filtered pages walk the maintained sort order
+        from ``after``, so any page costs about as much as the first; search
+        results are few enough to be ordered on the fly. ``low`` and
+        ``high`` restrict the walk to sort keys in ``[low, high)``, so a
+        range costs as much as the records in it.
+        """
+        if search:
+            positions = sorted(
+                (sort_key(sort, record), record.monkey_id) for record in self.search(search, species)
+            )
+            walk = SortedIndex.build(positions).walk(after, descending, low, high)
+        else:
+            order = self._search.order if sort == 'name' else self._orders[sort]
+            walk = order.walk(after, descending, low, high)
+        records = []
+        for position in walk:
+            record = self._data[position[1]]
+            if species is not None and record.species != species:
+                continue
+            if len(records) == limit:
+                return records, (sort_key(sort, records[-1]), records[-1].monkey_id)
+            records.append(record)
+        return records, None
+
+    def scan(self, species=None, search=None, batch_size=1000):
+        """Yield matching records in ``created_at`` order, ``batch_size`` at a time.
+
+        Each batch resumes from the position the previous one ended at, so
+        the store may change between batches and only one batch is ever
+        held. ``search`` is applied per record instead of materializing the
+        full hit list.
+        """
+        query = search.lower() if search else None
+        order = self._orders['created_at']
+        after = None
+        while True:
+            batch = []
+            for after in order.walk(after):
+                record = self._data[after[1]]
+                if species is not None and record.species != species:
+                    continue
+                if query is not None and query not in record.name.lower() \
+                        and query not in record.species.lower():
+                    continue
+                batch.append(record)
+                if len(batch) == batch_size:
+                    break
+            else:
+                if batch:
+                    yield batch
+                return
+            yield batch
+
+    def snapshot(self):
+        """Return a consistent copy of the registry as written so far and the
+        storage position it covers.
+
+        Mutations still queued for the writer thread, or whose failed write
+        is being undone, are left out, so they cannot reach a snapshot
+        without having been logged.
+        """
+        with self._lock:
+            data = dict(self._data)
+            for future, undo in reversed(self._unwritten):
+                if future.done():
+                    continue
+                for monkey_id, before, after in reversed(undo):
+                    if data.get(monkey_id) is not after:
+                        continue
+                    if before is None:
+                        del data[monkey_id]
+                    else:
+                        data[monkey_id] = before
+            return data, self.storage.position()
+
+    # Mutations
+    #
+    # Each mutation takes effect in memory at once and returns a
+    # concurrent.futures.Future that resolves when the engine has written
+    # it (already resolved without a writer thread); callers that report
+    # the mutation as saved wait for it. A mutation whose write fails is
+    # rolled back and its future raises ``writer.WriteError``.
+    def put(self, record, expected_version=None):
+        """Insert or replace a record; records are never mutated in place.
+
+        Raises ``DuplicateNameError`` if another monkey of the same species
+        already has the record's name, and ``VersionConflictError`` if
+        ``expected_version`` is given and the stored record is not at it.
+        """
+        monkey_id = record['monkey_id']
+        self.wait_for_room()
+        with self._exclusive():
+            if expected_version is not None:
+                current = self._data.get(monkey_id)
+                current_version = current['version'] if current is not None else None
+                if current_version != expected_version:
+                    raise VersionConflictError(monkey_id, expected_version, current_version)
+            owner = self._names.get(name_index_key(record['species'], record['name']))
+            if owner is not None and owner != monkey_id:
+                raise DuplicateNameError(record['name'], record['species'])
+            previous = self._data.get(monkey_id)
+            undo = []
+            future = self._log({'op': 'put', 'record': record}, undo)
+            self.version += 1
+            self._apply_put(record)
+            undo.append((monkey_id, previous, self._data[monkey_id]))
+            return future
+
+    def delete(self, monkey_id):
+        self.wait_for_room()
+        with self._exclusive():
+            if monkey_id not in self._data:
+                return written()
+            undo = []
+            future = self._log({'op': 'delete', 'monkey_id': monkey_id}, undo)
+            self.version += 1
+            undo.append((monkey_id, self._apply_delete(monkey_id), None))
+            return future
+
+    def apply_batch(self, puts=(), deletes=(), expected_versions=None):
+        """Apply many puts and deletes as one all-or-nothing persistence operation.
+
+        Name uniqueness is checked against the registry as it will be after
+        the whole batch, so swapping names within a batch is allowed. Raises
+        ``DuplicateNameError`` (and changes nothing) if the batch would
+        violate it; deletes of unknown IDs are ignored. ``expected_versions``
+        maps monkey IDs to the versions their changes are based on, and
+        raises ``VersionConflictError`` like ``put`` does.
+        """
+        self.wait_for_room()
+        with self._exclusive():
+            for monkey_id, expected in (expected_versions or {}).items():
+                current = self._data.get(monkey_id)
+                current_version = current['version'] if current is not None else None
+                if current_version != expected:
+                    raise VersionConflictError(monkey_id, expected, current_version)
+            deletes = [monkey_id for monkey_id in deletes if monkey_id in self._data]
+            self._check_batch_names(puts, deletes)
+            if not puts and not deletes:
+                return written()
+            previous = {monkey_id: self._data.get(monkey_id)
+                        for monkey_id in deletes + [record['monkey_id'] for record in puts]}
+            undo = []
+            future = self._log({'op': 'batch', 'puts': list(puts), 'deletes': deletes}, undo)
+            self.version += 1
+            for monkey_id in deletes:
+                self._apply_delete(monkey_id)
+            for record in puts:
+                self._apply_put(record)
+            undo.extend((monkey_id, before, self._data.get(monkey_id)) for monkey_id, before in previous.items())
+            return future
+
+    def replace(self, data):
+        """Swap in a whole registry mapping (used by ``save_monkeys_data``)"""
+        data = upgrade_records(data)
+        self.wait_for_room()
+        with self._exclusive():
+            previous = self._data
+            undo = []
+            future = self._log({'op': 'replace', 'records': dict(data)}, undo)
+            self._data = compact_all(data)
+            self._encoded = {}
+            self.version += 1
+            self._rebuild_indexes()
+            undo.extend((monkey_id, previous.get(monkey_id), self._data.get(monkey_id))
+                        for monkey_id in previous.keys() | self._data.keys())
+            return future
+
+    def roll_back(self, undo):
+        """Restore the records a write that failed had changed, except those
+        changed again since; returns the IDs of the restored monkeys.
+
+        ``undo`` holds ``(monkey_id, before, after)`` triples, ``None``
+        standing for an absent monkey. Called for the writer thread, on the
+        attached event loop if there is one (see ``defer()``).
+        """
+        reverted = []
+        with self._lock:
+            for monkey_id, before, after in reversed(undo):
+                if self._data.get(monkey_id) is not after:
+                    continue
+                self.version += 1
+                if before is None:
+                    self._apply_delete(monkey_id)
+                else:
+                    self._apply_put(before)
+                reverted.append(monkey_id)
+        if reverted:
+            logger.warning(f"Rolled back {len(reverted)} monkeys whose write failed")
+        return reverted
+
+    def has_room(self):
+        """Whether a mutation can be queued for the writer thread without waiting"""
+        return self._writer is None or self._writer.has_room()
+
+    def wait_for_room(self):
+        """Block until the writer thread's queue has room for a mutation.
+
+        Every mutation calls it first, outside the store lock, which the
+        writer thread needs for snapshots. Async callers should wait for
+        ``has_room()`` off the event loop thread before mutating, so that
+        this returns at once instead of blocking the loop.
+        """
+        if self._writer is not None:
+            self._writer.wait_for_room()
+
+    def hold_log(self):
+        """Have the writer thread take a shared engine's inter-process lock
+        and read what other processes appended, for the mutations that follow.
+
+        Returns a future that resolves once it has; apply what was read
+        with ``apply_changes()`` before mutating. The mutations are then
+        queued for the writer thread like an unshared store's, and written
+        before the lock is released by ``release_log()``, which must follow
+        even if the future fails. Without a shared engine or a writer
+        thread, mutations take the lock themselves and this does nothing.
+        """
+        if not self.shared or self._writer is None:
+            return written()
+        self._holding = True
+        return self._writer.call(self._hold)
+
+    def release_log(self):
+        """Release the lock taken by ``hold_log()`` once the writer thread has
+        written the mutations made meanwhile"""
+        if self._holding:
+            self._holding = False
+            self._writer.call(self._held.close)
+
+    def _hold(self):
+        self._held.enter_context(self.storage.locked())
+        self._incoming.extend(self.storage.changes())
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the store lock for a mutation; with a shared engine, first take
+        the inter-process lock and apply what other processes wrote, unless
+        the writer thread holds it (``hold_log()``)"""
+        if not self.shared or self._holding:
+            with self._lock:
+                yield
+            return
+        # The writer thread takes the engine's lock before the store's
+        with self.storage.locked():
+            self._catch_up()
+            with self._lock:
+                yield
+
+    def _catch_up(self):
+        self._incoming.extend(self.storage.changes())
+        return self.apply_changes()
+
+    def _log(self, entry, undo=None):
+        """Queue ``entry`` for the writer thread, or write it now if there is
+        none or other processes must see it before the engine's lock is
+        released, which the caller then holds itself.
+
+        A queued entry is applied in memory before it is written; the caller
+        fills ``undo`` (see ``roll_back``) while still holding the store lock,
+        which rolling it back needs, and registers it as unwritten for
+        ``snapshot()``. An entry written now raises before anything is applied.
+        """
+        if self._writer is not None and (not self.shared or self._holding):
+            future = self._writer.submit(entry, undo)
+            while self._unwritten and self._unwritten[0][0].done():
+                self._unwritten.popleft()
+            self._unwritten.append((future, undo))
+            return future
+        with OPERATION_SECONDS.labels('storage_write').time():
+            self.storage.write([entry])
+        STORAGE_ENTRIES.inc()
+        return written()
+
+    def _apply_entries(self, entries):
+        """Apply log entries written by another process; returns the IDs of
+        the monkeys they changed, in the order they were first changed"""
+        if any(entry['op'] in ('clear', 'replace') for entry in entries):
+            previous = self._data
+            data = dict(previous)
+            for entry in entries:
+                apply_entry(data, entry)
+            self._data = compact_all(upgrade_records(data))
+            self._encoded = {}
+            self.version += 1
+            self._rebuild_indexes()
+            return [monkey_id for monkey_id in {**previous, **self._data}
+                    if previous.get(monkey_id) != self._data.get(monkey_id)]
+        changed = {}
+        for entry in entries:
+            op = entry['op']
+            if op == 'put':
+                self.version += 1
+                self._apply_put(entry['record'])
+                changed[entry['record']['monkey_id']] = True
+            elif op == 'delete' and entry['monkey_id'] in self._data:
+                self.version += 1
+                self._apply_delete(entry['monkey_id'])
+                changed[entry['monkey_id']] = True
+            elif op == 'batch':
+                self.version += 1
+                for monkey_id in entry['deletes']:
+                    if monkey_id in self._data:
+                        self._apply_delete(monkey_id)
+                        changed[monkey_id] = True
+                for record in entry['puts']:
+                    self._apply_put(record)
+                    changed[record['monkey_id']] = True
+        return list(changed)
+
+    def _apply_put(self, record):
+        monkey_id = record['monkey_id']
+        self._encoded.pop(monkey_id, None)
+        previous = self._data.get(monkey_id)
+        # A replaced record shares the ID string the registry is keyed by
+        record = compact(record, previous.monkey_id if previous is not None else None)
+        self._species_versions[record.species] = self.version
+        if previous is None:
+            self._data[monkey_id] = record
+            self._index(record)
+            return
+        # Re-assigning an existing key keeps its position, so only a
+        # species change needs the record moved between partitions
+        moved = previous.species != record.species
+        self._species_versions[previous.species] = self.version
+        self._unindex(previous, partition=moved, orders=False)
+        if moved:
+            del self._data[monkey_id]
+        self._data[record.monkey_id] = record
+        self._index(record, orders=False)
+        self._reorder(previous, record)
+
+    def _apply_delete(self, monkey_id):
+        self._encoded.pop(monkey_id, None)
+        record = self._data.pop(monkey_id)
+        self._species_versions[record.species] = self.version
+        self._unindex(record)
+        return record
+
+    def _check_batch_names(self, puts, deletes):
+        # Name slots held by records the batch deletes or rewrites are free
+        released = set(deletes)
+        released.update(record['monkey_id'] for record in puts if record['monkey_id'] in self._data)
+        claimed = {}
+        for record in puts:
+            key = name_index_key(record['species'], record['name'])
+            owner = claimed.get(key, self._names.get(key))
+            if owner is not None and owner != record['monkey_id'] and \
+                    (key in claimed or owner not in released):
+                raise DuplicateNameError(record['name'], record['species'])
+            claimed[key] = record['monkey_id']
+
+    # Indexes
+    def _index(self, record, search=True, orders=True):
+        monkey_id = record.monkey_id
+        if orders:
+            for field, order in self._orders.items():
+                order.add(sort_key(field, record), monkey_id)
+        self._names[name_index_key(record.species, record.name)] = monkey_id
+        self.stats.add(record)
+        partition = self._by_species.get(record.species)
+        if partition is None:
+            partition = self._by_species[record.species] = {}
+        partition[monkey_id] = record
+        if search:
+            self._search.add(monkey_id, record.name)
+
+    def _unindex(self, record, partition=True, orders=True):
+        monkey_id = record.monkey_id
+        if orders:
+            for field, order in self._orders.items():
+                order.remove(sort_key(field, record), monkey_id)
+        key = name_index_key(record.species, record.name)
+        if self._names.get(key) == monkey_id:
+            del self._names[key]
+        self.stats.remove(record)
+        if partition:
+            self._by_species[record.species].pop(monkey_id, None)
+            self._search.remove(monkey_id)
+
+    def _reorder(self, previous, record):
+        """Move a replaced record within the sort orders whose key changed"""
+        monkey_id = record.monkey_id
+        for field, order in self._orders.items():
+            old_key, new_key = sort_key(field, previous), sort_key(field, record)
+            if old_key != new_key:
+                order.remove(old_key, monkey_id)
+                order.add(new_key, monkey_id)
+
+    def _rebuild_indexes(self):
+        # Everything counts as changed at the current version
+        self._version_floor = self.version
+        self._species_versions = {}
+        self._names = {}
+        self._by_species = {}
+        self.stats = RegistryStats()
+        self._search = NameSearchIndex.build(
+            (monkey_id, record.name) for monkey_id, record in self._data.items()
+        )
+        for record in self._data.values():
+            key = name_index_key(record.species, record.name)
+            owner = self._names.get(key)
+            self._index(record, search=False, orders=False)
+            if owner is not None:
+                logger.warning(f"Duplicate name '{record.name}' in species '{record.species}'")
+                self._names[key] = owner
+        # The name order is the search index's prefix list
+        self._orders = {
+            field: SortedIndex.build(
+                (sort_key(field, record), monkey_id) for monkey_id, record in self._data.items()
+            )
+            for field in SORT_FIELDS if field != 'name'
+        }
+
+    # Persistence
+    def flush(self):
+        """Write and make durable every mutation so far"""
+        if self._writer is not None:
+            return self._writer.flush()
+        with OPERATION_SECONDS.labels('storage_sync').time():
+            return self.storage.sync(self)
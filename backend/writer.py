@@ -0,0 +1,203 @@
+"""Dedicated I/O thread that performs every write of a persistence engine.
+
+``MonkeyStore`` applies a mutation in memory and submits its log entry
+here, so request handlers never block on the disk; a handler that needs
+the write to have happened awaits the returned future. The thread takes
+everything pending at once and hands it to the engine as a single
+``write()``, so concurrent mutations collapse into one write, and calls
+the engine's ``sync()`` every ``interval`` seconds or on request.
+
+If a coalesced write fails, its entries are retried one at a time, so
+only the entries that fail on their own fail their futures. The store
+then undoes those mutations in memory (``MonkeyStore.roll_back``, on the
+thread the store's readers run on), so a change that never reached the
+disk does not stay visible until a restart drops it.
+
+Other work that has to happen between writes, in order with them, is
+queued as a call (``call()``); a shared store takes and releases the
+inter-process lock that way.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import OPERATION_SECONDS, STORAGE_ENTRIES
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriteError(Exception):
+    """A log entry could not be written and its mutation was undone in memory;
+    ``reverted`` lists the monkeys whose previous records were restored"""
+
+    def __init__(self, error, reverted=()):
+        super().__init__(str(error))
+        self.reverted = list(reverted)
+
+
+def written():
+    """A future for a mutation that needed no write or was written inline"""
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+class StorageWriter:
+    """Write-behind queue drained by one thread.
+
+    At most ``max_pending`` entries wait; ``wait_for_room()`` blocks until
+    the thread catches up, so a stalled disk slows writers down instead of
+    growing the queue. The store calls it before taking its own lock,
+    which the thread needs for snapshots; ``has_room()`` lets callers on an
+    event loop wait elsewhere instead.
+    """
+
+    def __init__(self, storage, store, interval=1.0, max_pending=10000):
+        self.storage = storage
+        self.store = store
+        self.interval = interval
+        self.max_pending = max_pending
+        self.writes = 0
+        self.entries = 0
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="monkey-store-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write and sync everything submitted so far, then end the thread"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def has_room(self):
+        with self._cond:
+            return len(self._pending) < self.max_pending or self._stopping
+
+    def wait_for_room(self):
+        with self._cond:
+            while len(self._pending) >= self.max_pending and not self._stopping:
+                self._cond.wait()
+
+    def submit(self, entry, undo=None):
+        """Queue a log entry; the returned future resolves once it is written.
+
+        ``undo`` lists the ``(monkey_id, before, after)`` records the entry
+        changed, for the store to restore should the entry fail to write.
+        """
+        future = Future()
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("Storage writer is stopped")
+            self._pending.append((entry, future, undo))
+            self._cond.notify_all()
+        return future
+
+    def flush(self):
+        """Write and sync everything submitted so far; return the engine's ``sync()`` result"""
+        return self.submit(None).result()
+
+    def call(self, fn):
+        """Run ``fn()`` on the thread once everything submitted before it is
+        written; the returned future resolves to its result"""
+        return self.submit(fn)
+
+    def _run(self):
+        next_sync = time.monotonic() + self.interval
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    timeout = next_sync - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                group, self._pending = self._pending, []
+                stopping = self._stopping
+                self._cond.notify_all()
+
+            # Entries are written in runs between calls, which run in order
+            entries = []
+            for item in group:
+                if isinstance(item[0], dict):
+                    entries.append(item)
+                    continue
+                if entries:
+                    self._write(entries)
+                    entries = []
+                if item[0] is not None:
+                    self._call(item)
+            if entries:
+                self._write(entries)
+            syncs = [future for entry, future, _ in group if entry is None]
+            if syncs or stopping or time.monotonic() >= next_sync:
+                self._sync(syncs)
+                next_sync = time.monotonic() + self.interval
+            if stopping:
+                with self._cond:
+                    if not self._pending:
+                        return
+
+    def _write(self, entries):
+        try:
+            with OPERATION_SECONDS.labels('storage_write').time():
+                self.storage.write([entry for entry, _, _ in entries])
+        except Exception as e:
+            if len(entries) == 1:
+                self._fail(entries[0], e)
+                return
+            # Find out which entries fail; the engine cuts a partial write
+            # back off, so retried entries are not logged twice
+            logger.warning(f"Error writing {len(entries)} entries ({e}); retrying them one at a time")
+            for item in entries:
+                self._write([item])
+            return
+        self.writes += 1
+        self.entries += len(entries)
+        STORAGE_ENTRIES.inc(len(entries))
+        for _, future, _ in entries:
+            future.set_result(None)
+
+    def _call(self, item):
+        fn, future, _ = item
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+            return
+        future.set_result(result)
+
+    def _fail(self, item, e):
+        entry, future, undo = item
+        logger.error(f"Error writing data: {e}")
+        if undo and self.store is not None:
+            # Readers iterate the registry on the store's owner thread, so
+            # the mutation is undone there; its future fails after that
+            self.store.defer(self._revert, future, undo, e)
+            return
+        self._revert(future, (), e)
+
+    def _revert(self, future, undo, e):
+        error = WriteError(e, self.store.roll_back(undo) if undo else [])
+        error.__cause__ = e
+        future.set_exception(error)
+
+    def _sync(self, futures):
+        try:
+            with OPERATION_SECONDS.labels('storage_sync').time():
+                result = self.storage.sync(self.store)
+        except Exception as e:
+            logger.error(f"Error flushing data: {e}")
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future in futures:
+            future.set_result(result)
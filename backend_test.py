@@ -1,11 +1,12 @@
 import requests
+import os
 import sys
 import json
 from datetime import datetime
 import uuid
 
 class MonkeyRegistryAPITester:
-    def __init__(self, base_url="https://simian-tracker.preview.emergentagent.com"):
+    def __init__(self, base_url="http://localhost:8001"):
         self.base_url = base_url
         self.api_url = f"{base_url}/api"
         self.tests_run = 0
@@ -269,7 +270,10 @@ def main():
     print("🐒 Starting Monkey Registry API Tests...")
     print("=" * 50)
     
-    tester = MonkeyRegistryAPITester()
+    # Smoke-test a running server: the URL given on the command line or in
+    # BACKEND_URL, by default a local one
+    base_url = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('BACKEND_URL', 'http://localhost:8001')
+    tester = MonkeyRegistryAPITester(base_url.rstrip('/'))
     
     # Run all tests
     test_methods = [
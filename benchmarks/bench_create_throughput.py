@@ -0,0 +1,73 @@
+"""POST /api/monkeys throughput as the registry grows.
+
+Seeds the store with each registry size and times ``create_monkey`` for a
+batch of new monkeys. With ``--legacy`` the duplicate check is swapped for
+the former linear scan over every record to show the difference.
+
+    python benchmarks/bench_create_throughput.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from common import make_registry
+
+import server
+from storage import WalStorage
+from store import MonkeyStore
+
+
+async def linear_check_name_duplicate(name, species, exclude_monkey_id=None):
+    for monkey_id, monkey in server.store.items():
+        if (monkey['name'].lower() == name.lower() and
+                monkey['species'] == species and
+                (exclude_monkey_id is None or monkey_id != exclude_monkey_id)):
+            return True
+    return False
+
+
+def bench(size, creates, tmp, legacy):
+    server.store = MonkeyStore(storage=WalStorage(Path(tmp) / f'monkeys_{size}.json'), flush_interval=0)
+    server.store.open()
+    server.store.replace(make_registry(size))
+    server.store.storage.compact(server.store)
+    indexed_check = server.check_name_duplicate
+    if legacy:
+        server.check_name_duplicate = linear_check_name_duplicate
+    payloads = [
+        server.MonkeyCreate(name=f'Bench{size}x{i}', species='howler', age_years=4, favourite_fruit='fig')
+        for i in range(creates)
+    ]
+
+    async def run():
+        for payload in payloads:
+            await server.create_monkey(payload)
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    server.check_name_duplicate = indexed_check
+    server.store.close()
+    return creates / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--creates', type=int, default=2000)
+    parser.add_argument('--legacy', action='store_true', help='also time the linear duplicate scan')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            line = f"{size:>9} monkeys  indexed {bench(size, args.creates, tmp, False):>9,.0f} creates/s"
+            if args.legacy:
+                legacy_creates = max(10, args.creates // 100)
+                line += f"  | linear scan {bench(size, legacy_creates, tmp, True):>9,.0f} creates/s"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Peak memory of a full registry dump: streaming export vs the list endpoint.
+
+Serves each registry size from memory and measures the extra memory
+(tracemalloc peak) needed to produce the whole response body, consuming
+the export stream chunk by chunk like a client would.
+
+    python benchmarks/bench_export.py --sizes 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from common import make_registry
+
+from fastapi import Request, Response
+
+import server
+from store import MonkeyStore
+
+
+async def dump_via_list():
+    request = Request({'type': 'http', 'method': 'GET', 'headers': []})
+    result = await server.list_monkeys(request, Response(), limit=None, cursor=None, sort=None, fields=None)
+    if isinstance(result, Response):
+        # TRUSTED_OUTPUT: the body is already encoded
+        return len(result.body)
+    return len(json.dumps([monkey.model_dump() for monkey in result]).encode())
+
+
+async def dump_via_export(fmt):
+    stream = server.export_csv(None, None) if fmt == 'csv' else server.export_ndjson(None, None)
+    size = 0
+    async for chunk in stream:
+        size += len(chunk.encode())
+    return size
+
+
+def measure(coro):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = asyncio.run(coro)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            server.store = MonkeyStore(Path(tmp) / 'monkeys.json', flush_interval=0)
+            server.store.open()
+            server.store.replace(make_registry(size))
+            print(f"{size:>9} monkeys")
+            for label, coro in (
+                ('list  ', dump_via_list()),
+                ('ndjson', dump_via_export('ndjson')),
+                ('csv   ', dump_via_export('csv')),
+            ):
+                body, peak, elapsed = measure(coro)
+                print(f"    {label} body {body / 2**20:8.1f} MiB  peak {peak / 2**20:8.1f} MiB  {elapsed:6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""GET /api/monkeys/{id} latency as the registry grows.
+
+Seeds a registry file of each size, opens the in-memory store from it once
+and times ``get_monkey`` for random IDs. With ``--legacy`` the same lookups
+are also timed against a full ``json.load`` of the file per request, which
+is what every handler did before the store existed.
+
+    python benchmarks/bench_get_latency.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from common import make_registry, percentiles
+from fastapi import Request, Response
+
+import server
+from store import MonkeyStore
+
+
+def bench_store(path, ids, lookups):
+    server.store = MonkeyStore(path, flush_interval=0)
+    server.store.open()
+    loop = asyncio.new_event_loop()
+    # A request without conditional headers, as the handler is called directly
+    request = Request({'type': 'http', 'method': 'GET', 'headers': []})
+    samples = []
+    for monkey_id in random.choices(ids, k=lookups):
+        start = time.perf_counter()
+        loop.run_until_complete(server.get_monkey(monkey_id, request, Response()))
+        samples.append(time.perf_counter() - start)
+    loop.close()
+    server.store.close()
+    return samples
+
+
+def bench_legacy(path, ids, lookups):
+    samples = []
+    for monkey_id in random.choices(ids, k=lookups):
+        start = time.perf_counter()
+        with open(path) as f:
+            server.Monkey(**json.load(f)[monkey_id])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--legacy', action='store_true', help='also time the per-request json.load path')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = Path(tmp) / f'monkeys_{size}.json'
+            data = make_registry(size)
+            with open(path, 'w') as f:
+                json.dump(data, f)
+            ids = list(data)
+            del data
+
+            stats = {k: round(v * 1e6, 1) for k, v in percentiles(bench_store(path, ids, args.lookups)).items()}
+            line = f"{size:>9} monkeys  store  p50={stats['p50']}us p95={stats['p95']}us p99={stats['p99']}us"
+            if args.legacy:
+                legacy = percentiles(bench_legacy(path, ids, max(1, args.lookups // 100)))
+                line += f"  | legacy p50={legacy['p50'] * 1e3:.1f}ms"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Memory per record and list-filter speed of dict vs compact records.
+
+Writes a synthetic registry of each size to JSON and loads it back the
+way the store does, once keeping every record as a dict (the former
+layout) and once converting them to ``MonkeyRecord`` objects, and
+reports the bytes each record costs in both, plus what the whole opened
+store (records and every index) costs per record.
+
+It then times the per-record checks behind the filters of
+``GET /api/monkeys`` on both layouts: a species filter walking the
+created_at order to fill a page (with the filtered species rare, so most
+records are skipped) and a search scanning names as the export does.
+
+    python benchmarks/bench_memory.py --sizes 100000 1000000
+"""
+import argparse
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from common import make_registry
+
+from records import compact_all
+from storage import WalStorage
+from store import MonkeyStore, sort_key
+
+# The filtered species makes up 1% of the registry
+SPECIES_MIX = {'capuchin': 33, 'macaque': 33, 'marmoset': 33, 'howler': 1}
+
+
+def traced(fn):
+    """Return ``fn()`` and the bytes it left allocated"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def species_page_dicts(order, data, species, limit):
+    page = []
+    for _, monkey_id in order:
+        record = data[monkey_id]
+        if record['species'] != species:
+            continue
+        page.append(record)
+        if len(page) == limit:
+            break
+    return page
+
+
+def species_page_records(order, data, species, limit):
+    page = []
+    for _, monkey_id in order:
+        record = data[monkey_id]
+        if record.species != species:
+            continue
+        page.append(record)
+        if len(page) == limit:
+            break
+    return page
+
+
+def search_dicts(data, query):
+    return [r for r in data.values() if query in r['name'].lower() or query in r['species'].lower()]
+
+
+def search_records(data, query):
+    return [r for r in data.values() if query in r.name.lower() or query in r.species.lower()]
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--page-size', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = Path(tmp) / f'monkeys_{size}.json'
+            with open(path, 'w') as f:
+                json.dump(make_registry(size, species_mix=SPECIES_MIX), f)
+
+            dicts, dict_bytes = traced(lambda: load_json(path))
+            records, record_bytes = traced(lambda: compact_all(load_json(path)))
+            store = MonkeyStore(storage=WalStorage(path), flush_interval=0)
+            _, store_bytes = traced(store.open)
+            print(f"{size:>9} monkeys")
+            print(f"    dict records     {dict_bytes / size:8.0f} bytes/record")
+            print(f"    compact records  {record_bytes / size:8.0f} bytes/record "
+                  f"({dict_bytes / record_bytes:.1f}x smaller)")
+            print(f"    opened store     {store_bytes / size:8.0f} bytes/record (records and indexes)")
+
+            order = sorted((sort_key('created_at', r), monkey_id) for monkey_id, r in dicts.items())
+            checks = [
+                ('species page', lambda: species_page_dicts(order, dicts, 'howler', args.page_size),
+                 lambda: species_page_records(order, records, 'howler', args.page_size)),
+                ('name search', lambda: search_dicts(dicts, 'kom'), lambda: search_records(records, 'kom')),
+            ]
+            for name, on_dicts, on_records in checks:
+                assert [r['monkey_id'] for r in on_dicts()] == [r['monkey_id'] for r in on_records()]
+                dict_time, record_time = best_of(on_dicts, args.repeat), best_of(on_records, args.repeat)
+                print(f"    {name:<16} dicts {dict_time * 1e3:8.2f} ms  compact {record_time * 1e3:8.2f} ms  "
+                      f"({dict_time / record_time:.2f}x)")
+            store.close()
+            del dicts, records, store, order
+
+
+if __name__ == '__main__':
+    main()
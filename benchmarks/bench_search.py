@@ -0,0 +1,66 @@
+"""Indexed vs linear ``search`` filtering on large registries.
+
+Builds a store of each size and times ``MonkeyStore.search`` against the
+former loop that lowercases and scans every record, for a mix of queries a
+user typing into the search box would send.
+
+    python benchmarks/bench_search.py --sizes 100000 1000000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from common import make_registry
+
+from store import MonkeyStore
+
+QUERIES = ['ba', 'bak', 'bako', 'mizu', 'shura', 'zute4', 'nigo12', 'how', 'xyz']
+
+
+def linear_search(store, query):
+    matches = []
+    for record in store.values():
+        search_lower = query.lower()
+        if (search_lower not in record['name'].lower() and
+                search_lower not in record['species'].lower()):
+            continue
+        matches.append(record)
+    return matches
+
+
+def time_query(fn, store, query, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(store, query)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            store = MonkeyStore(Path(tmp) / 'monkeys.json', flush_interval=0)
+            store.open()
+            start = time.perf_counter()
+            store.replace(make_registry(size))
+            build = time.perf_counter() - start
+            for query in QUERIES:
+                assert [r['monkey_id'] for r in store.search(query)] == \
+                    [r['monkey_id'] for r in linear_search(store, query)], query
+            print(f"{size:>9} monkeys  (index build {build:.1f}s)")
+            for query in QUERIES:
+                indexed = time_query(lambda s, q: s.search(q), store, query, args.repeat)
+                linear = time_query(linear_search, store, query, args.repeat)
+                print(
+                    f"    {query!r:>10}  indexed {indexed * 1e3:8.2f} ms  "
+                    f"linear {linear * 1e3:8.2f} ms  ({linear / indexed:.1f}x)"
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""CPU per listed row for GET /api/monkeys, trusted output vs model validation.
+
+Serves each registry size in process through the ASGI app and times full
+list responses with TRUSTED_OUTPUT on and off (the second request onwards,
+so the per-record encoding cache is warm). ``--profile`` prints the top
+functions of a cProfile run for each mode.
+
+    python benchmarks/bench_serialization.py --sizes 10000 100000 --profile
+"""
+import argparse
+import asyncio
+import cProfile
+import pstats
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from common import make_registry
+
+import server
+from store import MonkeyStore
+
+
+async def fetch_list(repeat):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        await client.get('/api/monkeys')
+        start = time.process_time()
+        for _ in range(repeat):
+            response = await client.get('/api/monkeys')
+            response.raise_for_status()
+        return (time.process_time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            server.store = MonkeyStore(Path(tmp) / 'monkeys.json', flush_interval=0)
+            server.store.open()
+            server.store.replace(make_registry(size))
+            print(f"{size:>9} monkeys")
+            for trusted in (False, True):
+                server.TRUSTED_OUTPUT = trusted
+                label = 'trusted  ' if trusted else 'validated'
+                cpu = asyncio.run(fetch_list(args.repeat))
+                print(f"    {label} {cpu * 1e3:9.1f} ms CPU/list  {cpu / size * 1e6:6.2f} us/row")
+                if args.profile:
+                    profiler = cProfile.Profile()
+                    profiler.enable()
+                    asyncio.run(fetch_list(1))
+                    profiler.disable()
+                    pstats.Stats(profiler).sort_stats('tottime').print_stats(8)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Time to first request and peak memory of a server starting from a JSON
+or a binary snapshot.
+
+Writes a synthetic registry of each size as the pretty-printed JSON the
+``json`` engine keeps, as the compact JSON the ``wal`` engine compacts
+to, and as a binary ``.snap``, then starts ``uvicorn server:app`` on
+each and times from spawning the process until
+``GET /api/monkeys?limit=1`` first answers. Peak resident memory is the
+server process's high-water mark once it answers. Also reports how long
+reading each snapshot into records takes on its own, which is the part
+of startup the format changes; the rest is building the store's indexes.
+
+    python benchmarks/bench_startup.py --sizes 100000 1000000
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import BACKEND_DIR, free_port, make_registry
+
+from storage import read_snapshot, write_binary_snapshot
+
+FORMATS = {
+    # name: (SNAPSHOT_FORMAT, file the server starts from)
+    'json (indented)': ('json', 'indented/monkeys_data.json'),
+    'json (compact)': ('json', 'compact/monkeys_data.json'),
+    'binary': ('binary', 'binary/monkeys_data.json'),
+}
+
+
+def peak_rss(pid):
+    """High-water mark of the resident memory of ``pid``, in bytes"""
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def time_to_first_request(data_file, snapshot_format, timeout):
+    port = free_port()
+    env = dict(os.environ, DATA_FILE=str(data_file), SNAPSHOT_FORMAT=snapshot_format)
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'server:app', '--port', str(port),
+         '--log-level', 'warning', '--no-access-log'],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+                conn.request('GET', '/api/monkeys?limit=1')
+                if conn.getresponse().status == 200:
+                    elapsed = time.perf_counter() - start
+                    conn.close()
+                    return elapsed, peak_rss(proc.pid)
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"server on {data_file} did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            registry = make_registry(size)
+            root = Path(tmp) / str(size)
+            for _, relative in FORMATS.values():
+                (root / relative).parent.mkdir(parents=True)
+            with open(root / FORMATS['json (indented)'][1], 'w') as f:
+                json.dump(registry, f, indent=2)
+            with open(root / FORMATS['json (compact)'][1], 'w') as f:
+                json.dump(registry, f, separators=(',', ':'))
+            binary_json = root / FORMATS['binary'][1]
+            write_binary_snapshot(binary_json.with_suffix('.snap'), registry)
+            del registry
+
+            print(f"{size:>9} monkeys")
+            for name, (snapshot_format, relative) in FORMATS.items():
+                data_file = root / relative
+                snapshot = data_file.with_suffix('.snap') if snapshot_format == 'binary' else data_file
+                read_times, startups = [], []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    read_snapshot(data_file, snapshot_format)
+                    read_times.append(time.perf_counter() - start)
+                    startups.append(time_to_first_request(data_file, snapshot_format, args.timeout))
+                startup, rss = min(startups)
+                print(f"    {name:<16} {snapshot.stat().st_size / 1e6:8.1f} MB  read {min(read_times):6.2f} s  "
+                      f"first request {startup:6.2f} s  peak RSS {rss / 1e6:7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
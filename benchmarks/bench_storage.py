@@ -0,0 +1,106 @@
+"""Compare the persistence engines: startup, writes, reads and filtered lists.
+
+For each registry size and each ``STORAGE_BACKEND`` ('json', 'wal',
+'sqlite') the registry is written once, then the benchmark times opening
+the store (load plus index build), a run of updates through
+``MonkeyStore.put`` followed by a flush, ``get`` by ID, and a species
+filtered list page. Reads are served from memory whatever the engine, so
+they should match across engines; for SQLite the same filtered list is
+also timed as a query against its ``(species, name)`` index.
+
+    python benchmarks/bench_storage.py --sizes 1000 10000 100000
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from common import Timer, make_registry, percentiles
+
+from storage import create_storage
+from store import MonkeyStore
+
+BACKENDS = ['json', 'wal', 'sqlite']
+
+
+def open_store(backend, path):
+    store = MonkeyStore(storage=create_storage(backend, path), flush_interval=0)
+    store.open()
+    return store
+
+
+def bench(backend, size, writes, reads, tmp):
+    path = Path(tmp) / f'{backend}_{size}.json'
+    store = open_store(backend, path)
+    store.replace(make_registry(size))
+    store.close()
+
+    with Timer() as startup:
+        store = open_store(backend, path)
+
+    rng = random.Random(1)
+    ids = list(store.all())
+    targets = [store.get(rng.choice(ids)) for _ in range(writes)]
+    with Timer() as write:
+        for record in targets:
+            current = store.get(record['monkey_id'])
+            store.put(dict(current, age_years=rng.randint(0, 20), version=current['version'] + 1))
+        store.flush()
+
+    samples = []
+    for _ in range(reads):
+        monkey_id = rng.choice(ids)
+        with Timer() as read:
+            store.get(monkey_id)
+        samples.append(read.elapsed)
+
+    with Timer() as listing:
+        for _ in range(100):
+            store.page('name', limit=50, species='howler')
+
+    row = {
+        'startup_s': startup.elapsed,
+        'writes_per_s': writes / write.elapsed,
+        'get_p99_us': percentiles(samples)['p99'] * 1e6,
+        'list_ms': listing.elapsed / 100 * 1e3,
+    }
+    store.close()
+
+    if backend == 'sqlite':
+        conn = sqlite3.connect(path.with_suffix('.db'))
+        with Timer() as query:
+            for _ in range(100):
+                conn.execute(
+                    "SELECT record FROM monkeys WHERE species = 'howler' "
+                    "ORDER BY name COLLATE NOCASE LIMIT 50"
+                ).fetchall()
+        conn.close()
+        row['sql_list_ms'] = query.elapsed / 100 * 1e3
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--reads', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            for backend in args.backends:
+                row = bench(backend, size, args.writes, args.reads, tmp)
+                line = (
+                    f"{size:>8} monkeys  {backend:<6}  startup {row['startup_s']:7.3f}s  "
+                    f"writes {row['writes_per_s']:>9,.0f}/s  get p99 {row['get_p99_us']:6.1f}us  "
+                    f"species page {row['list_ms']:6.3f}ms"
+                )
+                if 'sql_list_ms' in row:
+                    line += f"  (SQL {row['sql_list_ms']:6.3f}ms)"
+                print(line)
+
+
+if __name__ == '__main__':
+    main()
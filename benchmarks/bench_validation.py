@@ -0,0 +1,76 @@
+"""Validations per second of write payloads, one at a time and in batches.
+
+Validates the create payloads of a synthetic registry through
+``MonkeyCreate``, once per item as a single create does and in batches
+through the ``CREATE_BATCH`` adapter as the bulk endpoints do, and the
+same for the former model built on the deprecated ``@validator``
+(kept here for comparison only).
+
+    python benchmarks/bench_validation.py --count 100000 --batch-sizes 100 1000 10000
+"""
+import argparse
+import time
+import warnings
+from typing import List, Optional
+
+from common import make_registry
+from pydantic import BaseModel, Field, TypeAdapter
+
+import server
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore')
+    from pydantic import validator
+
+    class LegacyMonkeyCreate(BaseModel):
+        name: str = Field(..., min_length=2, max_length=40)
+        species: server.Species
+        age_years: int = Field(..., ge=0, le=45)
+        favourite_fruit: str
+        last_checkup_at: Optional[str] = None
+
+        @validator('age_years')
+        def validate_marmoset_age(cls, v, values):
+            if values.get('species') == server.Species.MARMOSET and v > 22:
+                raise ValueError('Marmoset age cannot exceed 22 years')
+            return v
+
+        @validator('last_checkup_at')
+        def normalize_checkup(cls, v):
+            return server.normalize_checkup_time(v)
+
+
+PAYLOAD_FIELDS = ('name', 'species', 'age_years', 'favourite_fruit', 'last_checkup_at')
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    items = [{field: record[field] for field in PAYLOAD_FIELDS} for record in make_registry(args.count).values()]
+    models = [('current', server.MonkeyCreate, server.CREATE_BATCH),
+              ('former', LegacyMonkeyCreate, TypeAdapter(List[LegacyMonkeyCreate]))]
+    for name, model, batch in models:
+        single = best_of(lambda: [model.model_validate(item) for item in items], args.repeat)
+        print(f"{name:<11} one at a time  {args.count / single:10.0f} validations/s")
+        for size in args.batch_sizes:
+            chunks = [items[i:i + size] for i in range(0, len(items), size)]
+            batched = best_of(lambda: [batch.validate_python(chunk) for chunk in chunks], args.repeat)
+            print(f"{name:<11} batches of {size:<6} {args.count / batched:8.0f} validations/s "
+                  f"({single / batched:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
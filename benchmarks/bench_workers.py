@@ -0,0 +1,100 @@
+"""HTTP throughput as the number of uvicorn worker processes grows.
+
+Seeds a registry file, then for each worker count starts
+``uvicorn server:app --workers N`` on it with ``SHARED_STORE=true`` and
+drives it from ``--clients`` load-generating processes for
+``--duration`` seconds. Each request opens its own connection, so the
+kernel spreads them over the workers as it accepts them (a keep-alive
+connection stays with one worker). Every request is a
+``GET /api/monkeys/{id}`` of a random monkey, except a ``--write-ratio``
+fraction of ``PUT`` updates, which take the inter-process write lock and
+make every other worker apply them. Run it on a machine with at least as
+many cores as the largest worker count plus the clients.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --size 100000
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from common import free_port, make_registry, start_uvicorn
+
+
+def client(port, ids, duration, write_ratio, seed, results):
+    rng = random.Random(seed)
+    requests = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        monkey_id = rng.choice(ids)
+        if rng.random() < write_ratio:
+            body = json.dumps({'age_years': rng.randint(0, 20)})
+            conn.request('PUT', f'/api/monkeys/{monkey_id}', body, {'Content-Type': 'application/json'})
+        else:
+            conn.request('GET', f'/api/monkeys/{monkey_id}')
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        requests += 1
+        errors += response.status != 200
+    results.put((requests, errors))
+
+
+def bench(workers, data_file, ids, args):
+    port = free_port()
+    server = start_uvicorn(port, data_file, workers, SHARED_STORE='true', STORAGE_BACKEND='wal')
+    try:
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(
+                target=client, args=(port, ids, args.duration, args.write_ratio, seed, results)
+            )
+            for seed in range(args.clients)
+        ]
+        for proc in clients:
+            proc.start()
+        counts = [results.get() for _ in clients]
+        for proc in clients:
+            proc.join()
+    finally:
+        server.terminate()
+        server.wait()
+    requests = sum(count for count, _ in counts)
+    errors = sum(count for _, count in counts)
+    return requests / args.duration, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = Path(tmp) / 'monkeys_data.json'
+        registry = make_registry(args.size)
+        with open(data_file, 'w') as f:
+            json.dump(registry, f)
+        ids = list(registry)
+        del registry
+
+        baseline = None
+        for workers in args.workers:
+            throughput, errors = bench(workers, data_file, ids, args)
+            baseline = baseline or throughput
+            print(
+                f"{workers:>3} workers  {throughput:>9,.0f} req/s  "
+                f"x{throughput / baseline:4.2f}  ({errors} errors)"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Shared helpers for the benchmark scripts"""
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+SPECIES = ['capuchin', 'macaque', 'marmoset', 'howler']
+FRUITS = ['banana', 'mango', 'apple', 'grape', 'papaya', 'orange', 'coconut', 'fig']
+SYLLABLES = ['ba', 'ko', 'mi', 'ra', 'zu', 'te', 'lo', 'ni', 'shu', 'pe', 'go', 'ya']
+
+
+def make_name(rng, i):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize() + f"{i}"
+
+
+def make_record(rng, i, species_weights=None):
+    species = rng.choices(SPECIES, species_weights)[0] if species_weights else rng.choice(SPECIES)
+    now = f"2025-01-01T00:00:{i % 60:02d}.{i % 1000000:06d}"
+    return {
+        'monkey_id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        'name': make_name(rng, i),
+        'species': species,
+        'age_years': rng.randint(0, 22 if species == 'marmoset' else 45),
+        'favourite_fruit': rng.choice(FRUITS),
+        'last_checkup_at': None if rng.random() < 0.2 else f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00",
+        'created_at': now,
+        'updated_at': now,
+        'version': 1,
+    }
+
+
+def make_registry(n, seed=0, species_mix=None):
+    """Return a ``{monkey_id: record}`` mapping of ``n`` synthetic monkeys.
+
+    ``species_mix`` maps species to relative weights; by default every
+    species is equally likely.
+    """
+    rng = random.Random(seed)
+    weights = [species_mix.get(species, 0) for species in SPECIES] if species_mix else None
+    records = (make_record(rng, i, weights) for i in range(n))
+    return {record['monkey_id']: record for record in records}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(port, data_file, workers=1, **env):
+    """Start ``uvicorn server:app`` on ``port`` serving ``data_file`` and wait until it answers"""
+    env = dict(os.environ, DATA_FILE=str(data_file), **{key: str(value) for key, value in env.items()})
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'server:app', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"uvicorn with {workers} workers did not come up on port {port}")
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    ordered = sorted(samples)
+    return {
+        f"p{p}": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+        for p in points
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
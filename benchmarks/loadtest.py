@@ -0,0 +1,250 @@
+"""Mixed read/write load test of the API with a JSON report and regression check.
+
+Seeds a synthetic registry of ``--size`` monkeys (``--species-mix`` sets
+the share of each species), serves it either in process through the ASGI
+app or from ``uvicorn`` (``--server uvicorn``, optionally with
+``--workers``), and runs ``--concurrency`` clients for ``--duration``
+seconds. Each request is drawn from ``--mix``, relative weights of:
+
+    get            GET /api/monkeys/{id} of a random monkey
+    list           GET /api/monkeys?limit=PAGE
+    filtered_list  GET /api/monkeys?species=S&limit=PAGE
+    search         GET /api/monkeys?search=Q&limit=PAGE
+    create         POST /api/monkeys
+    update         PUT /api/monkeys/{id}
+    delete         DELETE /api/monkeys/{id}
+
+The report gives throughput and p50/p95/p99 latency overall and per
+operation. With ``--baseline`` the run is compared against an earlier
+report and the script exits with status 1 if throughput fell or p95/p99
+latency rose by more than ``--threshold`` (a fraction) anywhere.
+
+    python benchmarks/loadtest.py --size 100000 --concurrency 32 --output run.json
+    python benchmarks/loadtest.py --size 100000 --concurrency 32 --baseline run.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from common import FRUITS, SPECIES, SYLLABLES, free_port, make_name, make_registry, percentiles, start_uvicorn
+
+OPERATIONS = ('get', 'list', 'filtered_list', 'search', 'create', 'update', 'delete')
+DEFAULT_MIX = 'get=50,list=10,filtered_list=10,search=10,create=10,update=8,delete=2'
+
+
+def parse_weights(text, names):
+    """Parse ``name=weight,...`` into a dict, rejecting unknown names"""
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in names:
+            raise argparse.ArgumentTypeError(f"Unknown name '{name.strip()}'; choose from {', '.join(names)}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+class Workload:
+    """Issues the requests of the mix and records their latencies"""
+
+    def __init__(self, client, ids, mix, page_size, seed):
+        self.client = client
+        self.ids = ids
+        self.operations = list(mix)
+        self.weights = [mix[op] for op in self.operations]
+        self.page_size = page_size
+        self.rng = random.Random(seed)
+        self.created = 0
+        self.latencies = {op: [] for op in self.operations}
+        self.errors = {op: 0 for op in self.operations}
+
+    def request(self, op):
+        """Method, URL and body of one ``op`` request"""
+        rng = self.rng
+        if op == 'get':
+            return 'GET', f'/api/monkeys/{rng.choice(self.ids)}', None
+        if op == 'list':
+            return 'GET', f'/api/monkeys?limit={self.page_size}', None
+        if op == 'filtered_list':
+            return 'GET', f'/api/monkeys?species={rng.choice(SPECIES)}&limit={self.page_size}', None
+        if op == 'search':
+            return 'GET', f'/api/monkeys?search={rng.choice(SYLLABLES)}&limit={self.page_size}', None
+        if op == 'create':
+            self.created += 1
+            species = rng.choice(SPECIES)
+            return 'POST', '/api/monkeys', {
+                'name': f"Load{make_name(rng, self.created)}"[:40],
+                'species': species,
+                'age_years': rng.randint(0, 22),
+                'favourite_fruit': rng.choice(FRUITS),
+            }
+        if op == 'update':
+            return 'PUT', f'/api/monkeys/{rng.choice(self.ids)}', {'age_years': rng.randint(0, 22)}
+        if op == 'delete':
+            # Deleted monkeys leave the pool so later requests keep hitting live ones
+            monkey_id = self.ids.pop(rng.randrange(len(self.ids)))
+            return 'DELETE', f'/api/monkeys/{monkey_id}', None
+        raise ValueError(op)
+
+    async def run(self, deadline):
+        while time.perf_counter() < deadline:
+            op = self.rng.choices(self.operations, self.weights)[0]
+            if op in ('get', 'update', 'delete') and len(self.ids) < 2:
+                op = 'create'
+            method, url, body = self.request(op)
+            start = time.perf_counter()
+            response = await self.client.request(method, url, json=body)
+            self.latencies[op].append(time.perf_counter() - start)
+            if response.status_code == 201 and op == 'create':
+                self.ids.append(response.json()['monkey_id'])
+            # A duplicate generated name is a 400 and counts as an error
+            elif response.status_code >= 400:
+                self.errors[op] += 1
+            # In process, a request that never waits on I/O completes without
+            # yielding to the event loop, so give the other clients a turn
+            await asyncio.sleep(0)
+
+
+def summarize(latencies, errors, elapsed):
+    if not latencies:
+        return {'requests': 0, 'errors': errors, 'throughput': 0.0}
+    stats = percentiles(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed,
+        **{f'{name}_ms': value * 1e3 for name, value in stats.items()},
+    }
+
+
+async def drive(client, ids, args):
+    shared_ids = list(ids)
+    workloads = [
+        Workload(client, shared_ids, args.mix, args.page_size, args.seed + i) for i in range(args.concurrency)
+    ]
+    # Warm up connections and caches
+    for _ in range(10):
+        await client.get(f'/api/monkeys?limit={args.page_size}')
+    start = time.perf_counter()
+    await asyncio.gather(*(workload.run(start + args.duration) for workload in workloads))
+    elapsed = time.perf_counter() - start
+
+    report = {'operations': {}}
+    everything, errors = [], 0
+    for op in args.mix:
+        latencies = [value for workload in workloads for value in workload.latencies[op]]
+        op_errors = sum(workload.errors[op] for workload in workloads)
+        report['operations'][op] = summarize(latencies, op_errors, elapsed)
+        everything += latencies
+        errors += op_errors
+    report['total'] = summarize(everything, errors, elapsed)
+    return report
+
+
+async def run_in_process(data_file, ids, args):
+    import server
+    from storage import create_storage
+    from store import MonkeyStore
+
+    server.store = MonkeyStore(
+        storage=create_storage(args.backend, data_file), flush_interval=server.STORE_FLUSH_INTERVAL,
+    )
+    server.store.open()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://loadtest') as client:
+            return await drive(client, ids, args)
+    finally:
+        server.store.close()
+
+
+async def run_uvicorn(data_file, ids, args):
+    port = free_port()
+    proc = start_uvicorn(
+        port, data_file, args.workers, STORAGE_BACKEND=args.backend,
+        SHARED_STORE='true' if args.workers > 1 else 'false',
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=60) as client:
+            return await drive(client, ids, args)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def regressions(report, baseline, threshold):
+    """Describe every figure of ``report`` worse than ``baseline`` by more than ``threshold``"""
+    found = []
+    sections = [('total', report['total'], baseline.get('total', {}))] + [
+        (op, stats, baseline.get('operations', {}).get(op, {}))
+        for op, stats in report['operations'].items()
+    ]
+    for name, current, previous in sections:
+        if not previous.get('requests') or not current.get('requests'):
+            continue
+        if current['throughput'] < previous['throughput'] * (1 - threshold):
+            found.append(
+                f"{name}: throughput {current['throughput']:,.0f}/s vs {previous['throughput']:,.0f}/s"
+            )
+        for key in ('p95_ms', 'p99_ms'):
+            if current[key] > previous[key] * (1 + threshold):
+                found.append(f"{name}: {key} {current[key]:.2f} vs {previous[key]:.2f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=['inprocess', 'uvicorn'], default='inprocess')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--backend', choices=['wal', 'json', 'sqlite'], default='wal')
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--species-mix', type=lambda text: parse_weights(text, SPECIES), default=None,
+                        help='relative species weights, e.g. capuchin=4,macaque=3,marmoset=2,howler=1')
+    parser.add_argument('--mix', type=lambda text: parse_weights(text, OPERATIONS),
+                        default=parse_weights(DEFAULT_MIX, OPERATIONS))
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help='write the JSON report here as well as to stdout')
+    parser.add_argument('--baseline', type=Path, help='JSON report of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args()
+    args.mix = {op: weight for op, weight in args.mix.items() if weight > 0}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = Path(tmp) / 'monkeys_data.json'
+        registry = make_registry(args.size, args.seed, args.species_mix)
+        with open(data_file, 'w') as f:
+            json.dump(registry, f)
+        ids = list(registry)
+        del registry
+        runner = run_uvicorn if args.server == 'uvicorn' else run_in_process
+        report = asyncio.run(runner(data_file, ids, args))
+
+    report['config'] = {
+        'server': args.server, 'workers': args.workers, 'backend': args.backend, 'size': args.size,
+        'species_mix': args.species_mix, 'mix': args.mix, 'concurrency': args.concurrency,
+        'duration': args.duration, 'page_size': args.page_size, 'seed': args.seed,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text + '\n')
+
+    if args.baseline:
+        found = regressions(report, json.loads(args.baseline.read_text()), args.threshold)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,7 @@ const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
 const SPECIES_OPTIONS = ['capuchin', 'macaque', 'marmoset', 'howler'];
+const PAGE_SIZE = 60;
 
 const MonkeyForm = ({ monkey, onSave, onCancel, isEdit = false }) => {
   const [formData, setFormData] = useState({
@@ -33,25 +34,30 @@ const MonkeyForm = ({ monkey, onSave, onCancel, isEdit = false }) => {
     setLoading(true);
 
     try {
+      let saved;
       const payload = {
         ...formData,
         age_years: parseInt(formData.age_years) || 0
       };
 
       if (isEdit) {
-        await axios.put(`${API}/monkeys/${monkey.monkey_id}`, payload);
+        // Refused with 409 if someone else saved this monkey in the meantime
+        saved = await axios.put(`${API}/monkeys/${monkey.monkey_id}`, {
+          ...payload,
+          expected_version: monkey.version
+        });
         toast({
           title: "Success",
           description: "Monkey updated successfully!"
         });
       } else {
-        await axios.post(`${API}/monkeys`, payload);
+        saved = await axios.post(`${API}/monkeys`, payload);
         toast({
           title: "Success", 
           description: "Monkey created successfully!"
         });
       }
-      onSave();
+      onSave(saved.data, isEdit ? 'update' : 'create');
     } catch (error) {
       console.error('Error submitting form:', error);
       const errorMessage = error.response?.data?.detail || 
@@ -203,22 +209,32 @@ const MonkeyCard = ({ monkey, onEdit, onDelete }) => {
 
 function App() {
   const [monkeys, setMonkeys] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [speciesFilter, setSpeciesFilter] = useState('');
   const [isCreateDialogOpen, setIsCreateDialogOpen] = useState(false);
   const [editingMonkey, setEditingMonkey] = useState(null);
   const { toast } = useToast();
 
+  const fetchPage = async (cursor) => {
+    const params = new URLSearchParams();
+    if (speciesFilter && speciesFilter !== 'all') params.append('species', speciesFilter);
+    if (searchTerm) params.append('search', searchTerm);
+    params.append('limit', PAGE_SIZE);
+    if (cursor) params.append('cursor', cursor);
+
+    const response = await axios.get(`${API}/monkeys?${params}`);
+    return { items: response.data, cursor: response.headers['x-next-cursor'] || null };
+  };
+
   const fetchMonkeys = async () => {
     try {
       setLoading(true);
-      const params = new URLSearchParams();
-      if (speciesFilter && speciesFilter !== 'all') params.append('species', speciesFilter);
-      if (searchTerm) params.append('search', searchTerm);
-      
-      const response = await axios.get(`${API}/monkeys?${params}`);
-      setMonkeys(response.data);
+      const page = await fetchPage(null);
+      setMonkeys(page.items);
+      setNextCursor(page.cursor);
     } catch (error) {
       toast({
         variant: "destructive",
@@ -230,16 +246,58 @@ function App() {
     }
   };
 
+  const fetchMoreMonkeys = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage(nextCursor);
+      // Monkeys created since the first page may already have been appended
+      setMonkeys((current) => {
+        const loaded = new Set(current.map((m) => m.monkey_id));
+        return [...current, ...page.items.filter((m) => !loaded.has(m.monkey_id))];
+      });
+      setNextCursor(page.cursor);
+    } catch (error) {
+      toast({
+        variant: "destructive",
+        title: "Error",
+        description: "Failed to fetch more monkeys"
+      });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const matchesFilters = (monkey) => {
+    const query = searchTerm.toLowerCase();
+    return (!speciesFilter || speciesFilter === 'all' || monkey.species === speciesFilter) &&
+      (!query || monkey.name.toLowerCase().includes(query) || monkey.species.includes(query));
+  };
+
+  // Applies one event of the change feed to the loaded list
+  const applyChange = (change) => {
+    setMonkeys((current) => {
+      const rest = current.filter((m) => m.monkey_id !== change.monkey_id);
+      if (!change.monkey || change.op === 'delete' || !matchesFilters(change.monkey)) return rest;
+      const index = current.findIndex((m) => m.monkey_id === change.monkey_id);
+      // A revert restores the stored record after a change failed to save
+      if (index === -1) return change.op === 'update' ? current : [...current, change.monkey];
+      // Replayed events can be older than what the list already shows
+      if (change.op !== 'revert' && current[index].version > change.monkey.version) return current;
+      return current.map((m, i) => (i === index ? change.monkey : m));
+    });
+  };
+
   const handleDelete = async (monkeyId) => {
     if (!window.confirm('Are you sure you want to delete this monkey?')) return;
     
     try {
       await axios.delete(`${API}/monkeys/${monkeyId}`);
+      applyChange({ op: 'delete', monkey_id: monkeyId });
       toast({
         title: "Success",
         description: "Monkey deleted successfully!"
       });
-      fetchMonkeys();
     } catch (error) {
       toast({
         variant: "destructive",
@@ -249,10 +307,13 @@ function App() {
     }
   };
 
-  const handleFormSave = () => {
+  // The user's own changes are applied from the response rather than
+  // waiting for the change feed, which may be unavailable or, with several
+  // workers, only cover the one serving the stream
+  const handleFormSave = (monkey, op) => {
+    applyChange({ op, monkey_id: monkey.monkey_id, monkey });
     setIsCreateDialogOpen(false);
     setEditingMonkey(null);
-    fetchMonkeys();
   };
 
   const handleCreateDialogClose = (open) => {
@@ -266,8 +327,29 @@ function App() {
     }
   };
 
+  // Load the list, then keep it current from the change feed instead of
+  // refetching it after every change
   useEffect(() => {
-    fetchMonkeys();
+    let source = null;
+    let cancelled = false;
+    const subscribe = async () => {
+      let sequence = null;
+      try {
+        sequence = (await axios.get(`${API}/monkeys/changes`)).data.sequence;
+      } catch (error) {
+        // Without the feed the list is still shown, just not kept current
+      }
+      await fetchMonkeys();
+      if (cancelled || sequence === null) return;
+      source = new EventSource(`${API}/monkeys/changes?since=${sequence}`);
+      source.onmessage = (message) => applyChange(JSON.parse(message.data));
+      source.addEventListener('reset', () => fetchMonkeys());
+    };
+    subscribe();
+    return () => {
+      cancelled = true;
+      if (source) source.close();
+    };
   }, [searchTerm, speciesFilter]);
 
   return (
@@ -335,7 +417,7 @@ function App() {
           <>
             {/* Stats */}
             <div className="mb-6 text-center text-gray-600">
-              <p>Total monkeys: {monkeys.length}</p>
+              <p>{nextCursor ? `Showing ${monkeys.length} monkeys` : `Total monkeys: ${monkeys.length}`}</p>
             </div>
 
             {/* Monkey Grid */}
@@ -365,6 +447,14 @@ function App() {
                 ))}
               </div>
             )}
+
+            {nextCursor && (
+              <div className="text-center mt-6">
+                <Button variant="outline" onClick={fetchMoreMonkeys} disabled={loadingMore}>
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </Button>
+              </div>
+            )}
           </>
         )}
 
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    return tmp_path / 'monkeys_data.json'
+
+
+@pytest.fixture
+def client(data_file, monkeypatch):
+    """TestClient bound to a fresh registry file"""
+    from fastapi.testclient import TestClient
+    import server
+    from storage import WalStorage
+    from store import MonkeyStore
+
+    monkeypatch.setattr(server, 'store', MonkeyStore(storage=WalStorage(data_file), flush_interval=0))
+    with TestClient(server.app) as test_client:
+        yield test_client
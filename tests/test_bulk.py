@@ -0,0 +1,107 @@
+import json
+
+import server
+
+
+def monkey(name, species='capuchin', age=5):
+    return {'name': name, 'species': species, 'age_years': age, 'favourite_fruit': 'banana'}
+
+
+def log_lines(data_file):
+    return (data_file.parent / 'monkeys_data.json.wal').read_bytes().splitlines()
+
+
+def test_bulk_create_commits_in_one_log_record(client, data_file):
+    response = client.post('/api/monkeys/bulk', json=[monkey(f'Monkey{i}') for i in range(50)])
+    assert response.status_code == 200
+    body = response.json()
+    assert body['committed'] is True
+    assert [r['status'] for r in body['results']] == [201] * 50
+    assert len(client.get('/api/monkeys').json()) == 50
+    assert [json.loads(line)['op'] for line in log_lines(data_file)] == ['batch']
+
+
+def test_bulk_create_accepts_ndjson(client):
+    body = '\n'.join(json.dumps(monkey(f'Monkey{i}')) for i in range(3)) + '\n'
+    response = client.post('/api/monkeys/bulk', content=body, headers={'content-type': 'application/x-ndjson'})
+    assert [r['status'] for r in response.json()['results']] == [201] * 3
+
+
+def test_atomic_bulk_create_rejects_whole_batch(client):
+    client.post('/api/monkeys', json=monkey('Existing'))
+    batch = [monkey('Fresh'), monkey('A'), monkey('twin'), monkey('Twin'), monkey('EXISTING'), monkey('Old', 'marmoset', 30)]
+    response = client.post('/api/monkeys/bulk', json=batch)
+    assert response.status_code == 400
+    body = response.json()
+    assert body['committed'] is False
+    assert [r['status'] for r in body['results']] == [424, 422, 424, 400, 400, 422]
+    assert [m['name'] for m in client.get('/api/monkeys').json()] == ['Existing']
+
+
+def test_best_effort_bulk_create_commits_valid_items(client):
+    batch = [monkey('Fresh'), monkey('A'), monkey('twin'), monkey('Twin')]
+    response = client.post('/api/monkeys/bulk', params={'mode': 'best_effort'}, json=batch)
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json()['results']] == [201, 422, 201, 400]
+    assert sorted(m['name'] for m in client.get('/api/monkeys').json()) == ['Fresh', 'twin']
+
+
+def test_bulk_update_allows_name_swaps(client):
+    ids = [r['monkey_id'] for r in client.post('/api/monkeys/bulk', json=[monkey('Abu'), monkey('Momo')]).json()['results']]
+    response = client.put('/api/monkeys/bulk', json=[
+        {'monkey_id': ids[0], 'name': 'Momo'},
+        {'monkey_id': ids[1], 'name': 'Abu', 'age_years': 9},
+    ])
+    assert response.status_code == 200, response.text
+    assert client.get(f'/api/monkeys/{ids[0]}').json()['name'] == 'Momo'
+    assert client.get(f'/api/monkeys/{ids[1]}').json()['age_years'] == 9
+
+
+def test_bulk_update_reports_per_item_failures(client):
+    ids = [r['monkey_id'] for r in client.post('/api/monkeys/bulk', json=[monkey('Abu'), monkey('Momo')]).json()['results']]
+    batch = [
+        {'monkey_id': ids[0], 'age_years': 7},
+        {'monkey_id': ids[1], 'name': 'abu'},
+        {'monkey_id': 'missing', 'age_years': 3},
+        {'monkey_id': ids[0], 'age_years': 8},
+        {'monkey_id': ids[1], 'age_years': 99},
+    ]
+    atomic = client.put('/api/monkeys/bulk', json=batch)
+    assert atomic.status_code == 400
+    assert client.get(f'/api/monkeys/{ids[0]}').json()['age_years'] == 5
+
+    response = client.put('/api/monkeys/bulk', params={'mode': 'best_effort'}, json=batch)
+    assert [r['status'] for r in response.json()['results']] == [200, 400, 404, 400, 422]
+    assert client.get(f'/api/monkeys/{ids[0]}').json()['age_years'] == 7
+
+
+def test_bulk_delete(client):
+    ids = [r['monkey_id'] for r in client.post('/api/monkeys/bulk', json=[monkey('Abu'), monkey('Momo')]).json()['results']]
+    response = client.request('DELETE', '/api/monkeys/bulk', json=[ids[0], 'missing'])
+    assert response.status_code == 400
+    response = client.request('DELETE', '/api/monkeys/bulk', params={'mode': 'best_effort'}, json=[ids[0], {'monkey_id': 'missing'}])
+    assert [r['status'] for r in response.json()['results']] == [200, 404]
+    assert [m['monkey_id'] for m in client.get('/api/monkeys').json()] == [ids[1]]
+    assert server.store.find_by_name('capuchin', 'Abu') is None
+
+
+def test_bulk_request_limits(client, monkeypatch):
+    monkeypatch.setattr(server, 'BULK_MAX_ITEMS', 2)
+    assert client.post('/api/monkeys/bulk', json=[monkey('A1'), monkey('A2'), monkey('A3')]).status_code == 413
+    assert client.post('/api/monkeys/bulk', json={'name': 'Abu'}).status_code == 400
+
+
+def test_torn_batch_is_dropped_entirely(client, data_file):
+    from storage import WalStorage
+    from store import MonkeyStore
+
+    client.post('/api/monkeys', json=monkey('Keeper'))
+    client.post('/api/monkeys/bulk', json=[monkey(f'Monkey{i}') for i in range(5)])
+    server.store.close()
+    log_path = data_file.parent / 'monkeys_data.json.wal'
+    log_path.write_bytes(log_path.read_bytes()[:-40])
+
+    reopened = MonkeyStore(storage=WalStorage(data_file), flush_interval=0)
+    reopened.open()
+    assert [r['name'] for r in reopened.values()] == ['Keeper']
+    reopened.close()
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import re
+import time
+import tracemalloc
+
+import server
+from changes import ChangeFeed
+
+
+def test_since_returns_missed_events_or_none_once_evicted():
+    feed = ChangeFeed(size=3, start=100)
+    assert feed.since(100) == []
+    for i in range(5):
+        feed.publish('create', f'm{i}', b'{"name": "x"}')
+    assert [sequence for sequence, _ in feed.since(102)] == [103, 104, 105]
+    assert json.loads(feed.since(104)[0][1]) == {
+        'sequence': 105, 'op': 'create', 'monkey_id': 'm4', 'monkey': {'name': 'x'},
+    }
+    assert feed.since(101) is None
+    assert feed.since(106) is None
+    assert len(feed) == 3
+
+
+def parse_stream(chunks):
+    """The ``(id, event, data)`` of each server-sent event in ``chunks``"""
+    events = []
+    for block in b''.join(chunks).decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'data' in fields:
+            events.append((int(fields['id']), fields.get('event', 'message'), json.loads(fields['data'])))
+    return events
+
+
+async def subscribe(since, count, received):
+    """Read ``count`` events from a change stream starting after ``since``"""
+    chunks = []
+    stream = server.change_stream(since)
+    async for chunk in stream:
+        chunks.append(chunk)
+        if len(parse_stream(chunks)) == count:
+            break
+    await stream.aclose()
+    received.append(parse_stream(chunks))
+
+
+async def follow(stream, count, delivered):
+    """Consume ``count`` events, checking their sequences follow on, without keeping them"""
+    expected = None
+    async for chunk in stream:
+        for sequence in re.findall(rb'^id: (\d+)$', chunk, re.MULTILINE):
+            assert expected is None or int(sequence) == expected
+            expected = int(sequence) + 1
+            delivered[0] += 1
+            count -= 1
+        if not count:
+            break
+    await stream.aclose()
+
+
+def test_hundreds_of_subscribers_share_one_bounded_buffer(monkeypatch):
+    feed = ChangeFeed(size=64)
+    monkeypatch.setattr(server, 'change_feed', feed)
+    subscribers, timed, checkpoint, events = 300, 100, 150, 250
+
+    async def run():
+        delivered = [0]
+        tasks = [
+            asyncio.create_task(follow(server.change_stream(0), events, delivered))
+            for _ in range(subscribers)
+        ]
+        await asyncio.sleep(0)
+
+        fan_out, held = [], []
+        for i in range(events):
+            if i == timed:
+                tracemalloc.start()
+            start = time.perf_counter()
+            feed.publish('update', f'm{i % 10}', b'{"age_years": 3}')
+            # Let every subscriber take the event before the next publish
+            while delivered[0] < subscribers * (i + 1):
+                await asyncio.sleep(0)
+            if i < timed:
+                fan_out.append(time.perf_counter() - start)
+            if i + 1 in (checkpoint, events):
+                held.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+
+        await asyncio.gather(*tasks)
+        return sorted(fan_out), held
+
+    fan_out, (after_checkpoint, after_all) = asyncio.run(run())
+    assert len(feed) == 64
+    per_subscriber = fan_out[len(fan_out) // 2] / subscribers
+    growth = after_all - after_checkpoint
+    print(f"fan-out: {per_subscriber * 1e6:.1f} us per subscriber per event; "
+          f"{growth} bytes grown over {events - checkpoint} more events")
+    # Subscribers hold no per-event state, so once the ring buffer is full
+    # memory stays flat however many more events reach all of them
+    assert growth < 64 * 1024
+    assert per_subscriber < 0.002
+
+
+def test_slow_subscriber_is_told_to_reset(monkeypatch):
+    feed = ChangeFeed(size=4)
+    monkeypatch.setattr(server, 'change_feed', feed)
+
+    async def run():
+        for i in range(10):
+            feed.publish('delete', f'm{i}')
+        received = []
+        await subscribe(2, 1, received)
+        return received[0]
+
+    (sequence, event, data), = asyncio.run(run())
+    assert event == 'reset'
+    assert data == {'sequence': 10}
+    assert sequence == 10
+
+
+def test_handlers_publish_changes(client):
+    start = client.get('/api/monkeys/changes').json()['sequence']
+    created = client.post('/api/monkeys', json={
+        'name': 'George', 'species': 'capuchin', 'age_years': 3, 'favourite_fruit': 'fig',
+    }).json()
+    monkey_id = created['monkey_id']
+    client.put(f'/api/monkeys/{monkey_id}', json={'age_years': 4})
+    bulk = client.post('/api/monkeys/bulk', json=[
+        {'name': 'Abu', 'species': 'macaque', 'age_years': 1, 'favourite_fruit': 'fig'},
+    ]).json()
+    client.delete(f'/api/monkeys/{monkey_id}')
+
+    response = client.get('/api/monkeys/changes', params={'since': start})
+    assert response.status_code == 200
+    body = response.json()
+    assert body['sequence'] == start + 4
+    assert [(e['op'], e['monkey_id']) for e in body['events']] == [
+        ('create', monkey_id), ('update', monkey_id),
+        ('create', bulk['results'][0]['monkey_id']), ('delete', monkey_id),
+    ]
+    assert [e['sequence'] for e in body['events']] == list(range(start + 1, start + 5))
+    assert body['events'][1]['monkey']['age_years'] == 4
+    assert body['events'][3]['monkey'] is None
+
+    assert client.get('/api/monkeys/changes', params={'since': start - 5000}).status_code == 410
+    assert client.get('/api/monkeys/changes', params={'since': start + 4}).json()['events'] == []
+
+
+def test_failed_write_is_reverted_in_the_feed(data_file, monkeypatch):
+    from fastapi.testclient import TestClient
+    from storage import WalStorage
+    from store import MonkeyStore
+
+    store = MonkeyStore(storage=WalStorage(data_file), flush_interval=3600)
+    monkeypatch.setattr(server, 'store', store)
+    with TestClient(server.app) as client:
+        sequence = client.get('/api/monkeys/changes').json()['sequence']
+
+        def failing_write(entries):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(store.storage, 'write', failing_write)
+        response = client.post('/api/monkeys', json={
+            'name': 'George', 'species': 'capuchin', 'age_years': 3, 'favourite_fruit': 'fig',
+        })
+        assert response.status_code == 500
+        assert client.get('/api/monkeys').json() == []
+        events = client.get('/api/monkeys/changes', params={'since': sequence}).json()['events']
+        assert [event['op'] for event in events] == ['create', 'revert']
+        assert events[1]['monkey_id'] == events[0]['monkey_id']
+        assert events[1]['monkey'] is None
+
+
+def test_other_workers_changes_reach_the_feed(data_file, monkeypatch):
+    from storage import SharedWalStorage
+    from store import MonkeyStore
+
+    from .test_store import make_record
+
+    other = MonkeyStore(storage=SharedWalStorage(data_file), flush_interval=0)
+    other.open()
+    store = MonkeyStore(storage=SharedWalStorage(data_file), flush_interval=0)
+    store.open()
+    monkeypatch.setattr(server, 'store', store)
+    monkeypatch.setattr(server, 'change_feed', ChangeFeed(size=10))
+    monkeypatch.setattr(server, 'CHANGE_STREAM_POLL', 0.01)
+
+    async def run():
+        received = []
+        subscriber = asyncio.create_task(subscribe(0, 2, received))
+        await asyncio.sleep(0.05)
+        other.put(make_record('x'))
+        other.put(make_record('y', name='Abu'))
+        await asyncio.wait_for(subscriber, 5)
+        return received[0]
+
+    events = asyncio.run(run())
+    assert [(event, data['op'], data['monkey_id']) for _, event, data in events] == [
+        ('message', 'create', 'x'), ('message', 'create', 'y'),
+    ]
+    other.close()
+    store.close()
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from store import normalize_timestamp
+
+from .test_pagination import SPECIES, walk_pages
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-01-15T10:30:00', '2024-01-15T10:30:00'),
+    ('2024-01-15T10:30:00Z', '2024-01-15T10:30:00'),
+    ('2024-01-15T12:30:00+02:00', '2024-01-15T10:30:00'),
+    ('2024-01-15T10:30', '2024-01-15T10:30:00'),
+    ('2024-01-15', '2024-01-15T00:00:00'),
+    ('', None),
+    (None, None),
+])
+def test_normalize_timestamp(value, expected):
+    assert normalize_timestamp(value) == expected
+
+
+def test_checkup_times_are_normalized_on_write(client):
+    created = client.post('/api/monkeys', json={
+        'name': 'George', 'species': 'capuchin', 'age_years': 3, 'favourite_fruit': 'fig',
+        'last_checkup_at': '2024-01-15T12:30:00+02:00',
+    })
+    assert created.status_code == 201
+    assert created.json()['last_checkup_at'] == '2024-01-15T10:30:00'
+    monkey_id = created.json()['monkey_id']
+
+    updated = client.put(f'/api/monkeys/{monkey_id}', json={'last_checkup_at': '2024-02-01'})
+    assert updated.json()['last_checkup_at'] == '2024-02-01T00:00:00'
+
+    invalid = client.post('/api/monkeys', json={
+        'name': 'Abu', 'species': 'capuchin', 'age_years': 3, 'favourite_fruit': 'fig',
+        'last_checkup_at': 'last tuesday',
+    })
+    assert invalid.status_code == 422
+    assert 'ISO 8601' in invalid.text
+
+
+def seed_checkups(client, count, rng):
+    checkups = [None] + [f'202{year}-{month:02d}-15T{hour:02d}:00:00'
+                         for year in range(2, 5) for month in (1, 6, 11) for hour in (8, 16)]
+    for i in range(count):
+        assert client.post('/api/monkeys', json={
+            'name': f'Monkey{i}', 'species': rng.choice(SPECIES), 'age_years': rng.randint(0, 20),
+            'favourite_fruit': 'fig', 'last_checkup_at': rng.choice(checkups),
+        }).status_code == 201
+
+
+def brute_force(records, after=None, before=None, never=None):
+    found = []
+    for record in records:
+        checked = record['last_checkup_at']
+        if never is True:
+            keep = checked is None
+        else:
+            keep = (checked is not None and (after is None or checked >= after)
+                    and (before is None or checked < before))
+        if keep:
+            found.append(record)
+    return sorted(found, key=lambda record: (record['last_checkup_at'] or '', record['monkey_id']))
+
+
+@pytest.mark.parametrize('params, bounds', [
+    ({'checkup_before': '2023-06-15T08:00:00'}, {'before': '2023-06-15T08:00:00'}),
+    ({'checkup_after': '2023-06-15T08:00:00'}, {'after': '2023-06-15T08:00:00'}),
+    ({'checkup_after': '2022-06-01', 'checkup_before': '2024-01-15T16:00:00Z'},
+     {'after': '2022-06-01T00:00:00', 'before': '2024-01-15T16:00:00'}),
+    ({'never_checked': 'true'}, {'never': True}),
+    ({'never_checked': 'false'}, {}),
+])
+@pytest.mark.parametrize('species', [None, 'howler'])
+def test_checkup_ranges_match_a_full_scan(client, params, bounds, species):
+    seed_checkups(client, 80, random.Random(5))
+    records = client.get('/api/monkeys', params={'species': species} if species else {}).json()
+    expected = [m['monkey_id'] for m in brute_force(records, **bounds)]
+    if species:
+        params = dict(params, species=species)
+
+    whole = client.get('/api/monkeys', params=params)
+    assert whole.status_code == 200
+    assert [m['monkey_id'] for m in whole.json()] == expected
+
+    pages = walk_pages(client, limit=7, **params)
+    assert [m['monkey_id'] for page in pages for m in page] == expected
+    pages = walk_pages(client, limit=7, sort='-last_checkup_at', **params)
+    assert [m['monkey_id'] for page in pages for m in page] == expected[::-1]
+
+
+def test_checkup_filter_errors(client):
+    assert client.get('/api/monkeys', params={'checkup_before': 'soon'}).status_code == 400
+    assert client.get('/api/monkeys', params={
+        'never_checked': 'true', 'checkup_after': '2024-01-01',
+    }).status_code == 400
+    assert client.get('/api/monkeys', params={
+        'checkup_after': '2024-01-01', 'sort': 'name',
+    }).status_code == 400
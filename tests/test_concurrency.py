@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+import pytest
+
+import server
+from locks import KeyedLocks
+from storage import WalStorage
+from store import MonkeyStore
+
+
+@pytest.fixture
+def registry(data_file, monkeypatch):
+    store = MonkeyStore(storage=WalStorage(data_file), flush_interval=0)
+    store.open()
+    monkeypatch.setattr(server, 'store', store)
+    monkeypatch.setattr(server, 'mutation_locks', KeyedLocks())
+
+    # Yield to the event loop between the duplicate check and the write, as
+    # any real I/O there would, so unserialized handlers would interleave.
+    check_name_duplicate = server.check_name_duplicate
+
+    async def yielding_check(*args, **kwargs):
+        await asyncio.sleep(0)
+        result = await check_name_duplicate(*args, **kwargs)
+        await asyncio.sleep(0)
+        return result
+
+    monkeypatch.setattr(server, 'check_name_duplicate', yielding_check)
+    yield store
+    store.close()
+
+
+async def run_clients(concurrency, requests):
+    """Send ``(method, url, json)`` requests from ``concurrency`` clients; return responses"""
+    transport = httpx.ASGITransport(app=server.app)
+    queue = list(reversed(requests))
+    responses = []
+
+    async def client():
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+            while queue:
+                method, url, body = queue.pop()
+                responses.append(await http.request(method, url, json=body))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return responses
+
+
+def assert_unique_names(store):
+    counts = Counter((m['species'], m['name'].casefold()) for m in store.values())
+    assert max(counts.values()) == 1
+
+
+@pytest.mark.parametrize('clients', [1, 8, 64])
+def test_concurrent_creates_and_updates(registry, clients):
+    creates = [
+        ('POST', '/api/monkeys', {
+            'name': f'Monkey{i % 400}', 'species': ['capuchin', 'howler'][i % 2],
+            'age_years': 3, 'favourite_fruit': 'banana',
+        })
+        for i in range(2000)
+    ]
+    start = time.perf_counter()
+    responses = asyncio.run(run_clients(clients, creates))
+    create_elapsed = time.perf_counter() - start
+
+    created = [r.json() for r in responses if r.status_code == 201]
+    assert Counter(r.status_code for r in responses) == {201: 400, 400: 1600}
+    assert len(registry) == 400
+    assert_unique_names(registry)
+
+    # Several clients edit different fields of the same monkey at once while
+    # others race renames into a small pool of names.
+    updates = []
+    for i, monkey in enumerate(created):
+        url = f"/api/monkeys/{monkey['monkey_id']}"
+        updates.append(('PUT', url, {'age_years': 7}))
+        updates.append(('PUT', url, {'favourite_fruit': f'fruit{i}'}))
+        updates.append(('PUT', url, {'last_checkup_at': f'2024-01-{i % 28 + 1:02d}T10:00:00'}))
+        updates.append(('PUT', url, {'name': f'Renamed{i % 40}'}))
+    start = time.perf_counter()
+    responses = asyncio.run(run_clients(clients, updates))
+    update_elapsed = time.perf_counter() - start
+
+    assert {r.status_code for r in responses} <= {200, 400}
+    for i, monkey in enumerate(created):
+        record = registry.get(monkey['monkey_id'])
+        assert record['age_years'] == 7
+        assert record['favourite_fruit'] == f'fruit{i}'
+        assert record['last_checkup_at'] == f'2024-01-{i % 28 + 1:02d}T10:00:00'
+    assert_unique_names(registry)
+    assert len(server.mutation_locks) == 0
+
+    print(
+        f"\n{clients:>3} clients: {len(creates) / create_elapsed:,.0f} creates/s, "
+        f"{len(updates) / update_elapsed:,.0f} updates/s"
+    )
+
+
+def test_name_index_backstops_unlocked_handlers(registry, monkeypatch):
+    """Racing creates that all pass the handler check are still rejected by the store"""
+    class NoLocks(KeyedLocks):
+        def hold(self, *keys):
+            return super().hold()
+
+    monkeypatch.setattr(server, 'mutation_locks', NoLocks())
+    creates = [
+        ('POST', '/api/monkeys', {'name': 'Twin', 'species': 'macaque', 'age_years': 3, 'favourite_fruit': 'fig'})
+        for _ in range(16)
+    ]
+    responses = asyncio.run(run_clients(16, creates))
+    assert Counter(r.status_code for r in responses) == {201: 1, 400: 15}
+    assert_unique_names(registry)
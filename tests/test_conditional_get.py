@@ -0,0 +1,98 @@
+import server
+from cache import ResponseCache
+
+
+def create(client, name, species='capuchin'):
+    return client.post('/api/monkeys', json={
+        'name': name, 'species': species, 'age_years': 5, 'favourite_fruit': 'banana',
+    }).json()
+
+
+def test_list_etag_and_304(client):
+    create(client, 'George')
+    first = client.get('/api/monkeys')
+    etag = first.headers['etag']
+    again = client.get('/api/monkeys', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.content == b''
+    assert again.headers['etag'] == etag
+
+    create(client, 'Abu')
+    changed = client.get('/api/monkeys', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+    assert len(changed.json()) == 2
+
+
+def test_list_etags_differ_per_query(client):
+    create(client, 'George')
+    etag = client.get('/api/monkeys').headers['etag']
+    for params in ({'search': 'zzz'}, {'limit': 1}, {'fields': 'name'}):
+        response = client.get('/api/monkeys', params=params, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['etag'] != etag
+
+
+def test_species_etags_only_change_for_affected_species(client):
+    create(client, 'George')
+    create(client, 'Howie', 'howler')
+    howler = client.get('/api/monkeys', params={'species': 'howler'}).headers['etag']
+    capuchin = client.get('/api/monkeys', params={'species': 'capuchin'}).headers['etag']
+
+    create(client, 'Abu')
+    assert client.get('/api/monkeys', params={'species': 'howler'}, headers={'If-None-Match': howler}).status_code == 304
+    assert client.get('/api/monkeys', params={'species': 'capuchin'}, headers={'If-None-Match': capuchin}).status_code == 200
+
+    # Moving a monkey between species changes both
+    george = client.get('/api/monkeys', params={'search': 'george'}).json()[0]
+    client.put(f"/api/monkeys/{george['monkey_id']}", json={'species': 'howler'})
+    assert client.get('/api/monkeys', params={'species': 'howler'}, headers={'If-None-Match': howler}).status_code == 200
+
+
+def test_record_etag(client):
+    monkey = create(client, 'George')
+    other = create(client, 'Abu')
+    url = f"/api/monkeys/{monkey['monkey_id']}"
+    etag = client.get(url).headers['etag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(url, headers={'If-None-Match': f'W/{etag}, "other"'}).status_code == 304
+
+    client.put(f"/api/monkeys/{other['monkey_id']}", json={'age_years': 1})
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    client.put(url, json={'age_years': 9})
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()['age_years'] == 9
+
+
+def test_response_cache_serves_repeat_reads_and_drops_stale_entries(client, monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(server, 'response_cache', cache)
+    create(client, 'George')
+    create(client, 'Howie', 'howler')
+    for _ in range(3):
+        assert len(client.get('/api/monkeys', params={'species': 'howler'}).json()) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    create(client, 'Abu')
+    assert len(client.get('/api/monkeys', params={'species': 'howler'}).json()) == 1
+    assert cache.hits == 3
+    assert len(client.get('/api/monkeys', params={'species': 'capuchin'}).json()) == 2
+    assert len(client.get('/api/monkeys').json()) == 3
+
+    server.save_monkeys_data({})
+    assert client.get('/api/monkeys', params={'species': 'howler'}).json() == []
+
+
+def test_response_cache_is_bounded():
+    cache = ResponseCache(max_entries=2, max_bytes=100)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    cache.get('a')
+    cache.put('c', b'x' * 10)
+    assert cache.get('b') is None and cache.get('a') is not None
+    cache.put('d', b'x' * 24)
+    cache.put('e', b'x' * 24)
+    assert len(cache) == 2
+    cache.put('huge', b'x' * 60)
+    assert cache.get('huge') is None
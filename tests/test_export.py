@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+import random
+
+import server
+
+from .test_pagination import seed
+
+
+def test_ndjson_export_matches_list(client, monkeypatch):
+    monkeypatch.setattr(server, 'EXPORT_BATCH_SIZE', 7)
+    seed(client, 40, random.Random(8))
+    response = client.get('/api/monkeys/export')
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    listed = client.get('/api/monkeys', params={'sort': 'created_at'}).json()
+    assert exported == listed
+
+
+def test_export_applies_filters(client, monkeypatch):
+    monkeypatch.setattr(server, 'EXPORT_BATCH_SIZE', 3)
+    seed(client, 40, random.Random(9))
+    for params in ({'species': 'howler'}, {'search': 'mo'}, {'species': 'capuchin', 'search': 'GEO'}):
+        exported = [json.loads(line) for line in client.get('/api/monkeys/export', params=params).text.splitlines()]
+        listed = client.get('/api/monkeys', params=dict(params, sort='created_at')).json()
+        assert exported == listed
+
+
+def test_csv_export(client):
+    client.post('/api/monkeys', json={'name': 'George', 'species': 'capuchin', 'age_years': 5, 'favourite_fruit': 'banana'})
+    response = client.get('/api/monkeys/export', params={'format': 'csv'})
+    assert response.headers['content-type'].startswith('text/csv')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row['name'], row['age_years'], row['last_checkup_at']) for row in rows] == [('George', '5', '')]
+    assert client.get('/api/monkeys/export', params={'format': 'xml'}).status_code == 422
+
+
+def test_scan_tolerates_writes_between_batches(client):
+    seed(client, 30, random.Random(10))
+    batches = server.store.scan(batch_size=4)
+    first = next(batches)
+    server.store.delete(first[0]['monkey_id'])
+    later = [server.store.get(m['monkey_id']) for m in client.get('/api/monkeys', params={'sort': 'created_at'}).json()[10:]]
+    for record in later[:3]:
+        server.store.delete(record['monkey_id'])
+    rest = [record for batch in batches for record in batch]
+    assert len(first) + len(rest) == 30 - 3
+    assert len({r['monkey_id'] for r in first + rest}) == 27
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import server
+from metrics import Registry
+from profiler import SamplingProfiler
+
+
+def test_render_counters_and_histograms():
+    registry = Registry()
+    hits = registry.counter('hits_total', 'Hits', ('path',))
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    hits.labels('/a"b').inc()
+    hits.labels('/a"b').inc(2)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(3)
+    registry.callback('size', 'Size', 'gauge', lambda: 7)
+    assert registry.render().splitlines() == [
+        '# HELP hits_total Hits',
+        '# TYPE hits_total counter',
+        'hits_total{path="/a\\"b"} 3',
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        'latency_seconds_sum 3.55',
+        'latency_seconds_count 3',
+        '# HELP size Size',
+        '# TYPE size gauge',
+        'size 7',
+    ]
+
+
+def series(text, prefix):
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+
+def test_metrics_endpoint_reports_routes_and_operations(client):
+    created = client.post('/api/monkeys', json={
+        'name': 'George', 'species': 'capuchin', 'age_years': 3, 'favourite_fruit': 'fig',
+    }).json()
+    client.get(f"/api/monkeys/{created['monkey_id']}")
+    client.get('/api/monkeys?species=capuchin')
+    client.get('/api/nowhere')
+
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    text = response.text
+    assert series(text, 'http_request_duration_seconds_count{method="GET",route="/api/monkeys/{monkey_id}",status="200"}')
+    assert series(text, 'http_request_duration_seconds_count{method="POST",route="/api/monkeys",status="201"}')
+    assert series(text, 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}')
+    for operation in ('storage_load', 'storage_write', 'duplicate_check', 'filter', 'serialize'):
+        assert series(text, f'monkey_operation_seconds_count{{operation="{operation}"}}'), operation
+    assert series(text, 'monkey_duplicate_checks_total{result="unique"}')
+    assert 'monkey_registry_records 1' in text
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_samples_only_while_requests_are_in_flight():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy, args=(stop,))
+    worker.start()
+    profiler = SamplingProfiler()
+    profiler.start(worker.ident, requests=1, interval=0.001)
+    time.sleep(0.05)
+    assert profiler.samples == 0
+    profiler.request_started()
+    time.sleep(0.05)
+    profiler.request_finished()
+    profiler.stop()
+    stop.set()
+    worker.join()
+    assert not profiler.running
+    stacks = [line.rsplit(' ', 1) for line in profiler.result.splitlines()]
+    assert sum(int(count) for _, count in stacks) == profiler.samples > 0
+    assert all('test_metrics:busy' in stack.split(';') for stack, _ in stacks)
+
+
+def test_profile_endpoints(client):
+    assert client.get('/api/metrics/profile').status_code == 404
+    assert client.post('/api/metrics/profile?requests=3&interval_ms=1').status_code == 202
+    assert client.post('/api/metrics/profile').status_code == 409
+    assert client.get('/api/metrics/profile').status_code == 409
+    client.get('/api/monkeys')
+    server.profiler.stop()
+    response = client.get('/api/metrics/profile')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
@@ -0,0 +1,100 @@
+import base64
+import json
+import random
+
+import pytest
+
+from store import MonkeyStore, sort_key
+
+from .test_store import make_record
+
+
+SPECIES = ['capuchin', 'macaque', 'marmoset', 'howler']
+
+
+def seed(client, count, rng):
+    for i in range(count):
+        client.post('/api/monkeys', json={
+            'name': f"{rng.choice(['Abu', 'momo', 'George', 'zed'])}{i}",
+            'species': rng.choice(SPECIES),
+            'age_years': rng.randint(0, 20),
+            'favourite_fruit': 'fig',
+            'last_checkup_at': rng.choice([None, '2024-01-02T00:00:00', '2023-05-06T00:00:00']),
+        })
+
+
+def walk_pages(client, **params):
+    pages = []
+    cursor = None
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        response = client.get('/api/monkeys', params=query)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get('x-next-cursor')
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('sort', ['name', '-name', 'age_years', '-created_at', 'updated_at', 'last_checkup_at'])
+@pytest.mark.parametrize('filters', [{}, {'species': 'howler'}, {'search': 'mo'}])
+def test_pages_cover_the_sorted_list_exactly_once(client, sort, filters):
+    seed(client, 57, random.Random(3))
+    field = sort.lstrip('-')
+    expected = sorted(
+        client.get('/api/monkeys', params=filters).json(),
+        key=lambda record: (sort_key(field, record), record['monkey_id']),
+        reverse=sort.startswith('-'),
+    )
+    pages = walk_pages(client, limit=10, sort=sort, **filters)
+    assert all(len(page) == 10 for page in pages[:-1])
+    assert [m['monkey_id'] for page in pages for m in page] == [m['monkey_id'] for m in expected]
+
+
+def test_cursor_resumes_after_concurrent_writes(client):
+    seed(client, 20, random.Random(4))
+    first = client.get('/api/monkeys', params={'limit': 5, 'sort': 'name'})
+    seen = {m['monkey_id'] for m in first.json()}
+    client.post('/api/monkeys', json={'name': 'Aaron', 'species': 'howler', 'age_years': 1, 'favourite_fruit': 'fig'})
+    rest = walk_pages(client, limit=5, sort='name', cursor=first.headers['x-next-cursor'])
+    rest_ids = [m['monkey_id'] for page in rest for m in page]
+    assert not seen & set(rest_ids)
+    assert len(seen) + len(rest_ids) == 20
+
+
+def test_field_projection(client):
+    seed(client, 3, random.Random(5))
+    records = client.get('/api/monkeys', params={'fields': 'name,age_years', 'limit': 2}).json()
+    assert [sorted(r) for r in records] == [['age_years', 'monkey_id', 'name']] * 2
+    assert sorted(client.get('/api/monkeys', params={'fields': 'species'}).json()[0]) == ['monkey_id', 'species']
+
+
+@pytest.mark.parametrize('params', [
+    {'sort': 'favourite_fruit'},
+    {'fields': 'name,weight'},
+    {'cursor': 'not-a-cursor'},
+    # ["age_years", false, [1], "a"]: a key of the wrong type for the sort
+    {'sort': 'age_years', 'limit': 2, 'cursor': 'WyJhZ2VfeWVhcnMiLGZhbHNlLFsxXSwiYSJd'},
+    {'sort': 'name', 'cursor': base64.urlsafe_b64encode(json.dumps(['name', False, 'abu', 7]).encode()).decode()},
+])
+def test_invalid_pagination_parameters(client, params):
+    assert client.get('/api/monkeys', params=params).status_code == 400
+
+
+def test_cursor_is_bound_to_its_sort(client):
+    seed(client, 5, random.Random(6))
+    cursor = client.get('/api/monkeys', params={'limit': 2, 'sort': 'name'}).headers['x-next-cursor']
+    assert client.get('/api/monkeys', params={'cursor': cursor, 'sort': 'age_years'}).status_code == 400
+
+
+def test_sort_orders_track_updates(data_file):
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    store.put(make_record('a', name='Abu'))
+    store.put(make_record('b', name='Momo'))
+    store.put(dict(make_record('a', name='Zed'), age_years=1))
+    assert [r['monkey_id'] for r in store.page('name')[0]] == ['b', 'a']
+    assert [r['monkey_id'] for r in store.page('age_years')[0]] == ['a', 'b']
+    store.delete('b')
+    assert [r['monkey_id'] for r in store.page('name', descending=True)[0]] == ['a']
+    store.close()
@@ -0,0 +1,39 @@
+import json
+
+import server
+from records import MonkeyRecord, compact
+from store import MonkeyStore, encode_record
+
+from .test_store import make_record
+
+
+def test_compact_record_reads_like_the_dict():
+    record = make_record('a', name='George')
+    compacted = compact(record)
+    assert isinstance(compacted, MonkeyRecord)
+    assert compacted == record
+    assert dict(compacted) == record
+    assert compacted['name'] == 'George'
+    assert compacted.get('nothing', 'x') == 'x'
+    assert 'version' in compacted
+    assert encode_record(compacted) == encode_record(record)
+    assert server.Monkey(**compacted).name == 'George'
+    assert compact(compacted) is compacted
+
+
+def test_compact_records_share_strings():
+    first = compact(json.loads(json.dumps(make_record('a', name='George'))))
+    second = compact(json.loads(json.dumps(make_record('b', name='Abu'))))
+    assert first.species is second.species
+    assert first.favourite_fruit is second.favourite_fruit
+    assert first.updated_at is first.created_at
+
+
+def test_store_keeps_compact_records_and_persists_dicts(data_file):
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    store.put(make_record('a', name='George'))
+    assert isinstance(store.get('a'), MonkeyRecord)
+    store.flush()
+    store.close()
+    assert json.loads(data_file.read_text()) == {'a': make_record('a', name='George')}
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from store import MonkeyStore
+
+from .test_store import make_record
+
+
+SPECIES = ['capuchin', 'macaque', 'marmoset', 'howler']
+QUERIES = ['a', 'ge', 'GEO', 'org', 'george', 'cap', 'mac', 'o', 'rge j', 'zzz', 'howl', 'e', 'in']
+
+
+def linear_search(store, query, species=None):
+    """The list endpoint's original filter loop"""
+    matches = []
+    for record in store.values():
+        if species and record['species'] != species:
+            continue
+        search_lower = query.lower()
+        if (search_lower not in record['name'].lower() and
+                search_lower not in record['species'].lower()):
+            continue
+        matches.append(record['monkey_id'])
+    return matches
+
+
+@pytest.fixture
+def populated(data_file):
+    rng = random.Random(7)
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    words = ['George', 'Curious', 'Abu', 'Momo', 'Jorge', 'Ginger', 'Caplan', 'Mac', 'Howie']
+    for i in range(300):
+        name = f"{rng.choice(words)} {rng.choice(words)}{i}"
+        store.put(make_record(str(i), name=name, species=rng.choice(SPECIES)))
+    for i in rng.sample(range(300), 60):
+        record = dict(store.get(str(i)))
+        if i % 3 == 0:
+            record['name'] = f"Renamed George {i}"
+        elif i % 3 == 1:
+            record['species'] = rng.choice(SPECIES)
+        else:
+            store.delete(str(i))
+            continue
+        store.put(record)
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize('query', QUERIES)
+@pytest.mark.parametrize('species', [None, 'capuchin', 'howler'])
+def test_indexed_search_matches_linear_scan(populated, query, species):
+    assert [r['monkey_id'] for r in populated.search(query, species)] == linear_search(populated, query, species)
+
+
+def test_search_index_survives_replace(populated):
+    populated.replace(dict(populated.all()))
+    for query in QUERIES:
+        assert [r['monkey_id'] for r in populated.search(query)] == linear_search(populated, query)
+
+
+def test_complete_returns_name_ordered_prefix_matches(populated):
+    names = [r['name'] for r in populated.complete('geo', limit=5)]
+    assert len(names) == 5
+    assert all(name.lower().startswith('geo') for name in names)
+    assert names == sorted(names, key=str.lower)
+
+
+def test_list_and_suggest_endpoints(client):
+    for name, species in [('George', 'capuchin'), ('Georgina', 'howler'), ('Abu', 'capuchin')]:
+        client.post('/api/monkeys', json={
+            'name': name, 'species': species, 'age_years': 4, 'favourite_fruit': 'fig',
+        })
+    assert [m['name'] for m in client.get('/api/monkeys', params={'search': 'GEOR'}).json()] == ['George', 'Georgina']
+    assert [m['name'] for m in client.get('/api/monkeys', params={'search': 'cap'}).json()] == ['George', 'Abu']
+    assert [m['name'] for m in client.get('/api/monkeys/suggest', params={'prefix': 'ge'}).json()] == ['George', 'Georgina']
@@ -0,0 +1,38 @@
+import server
+
+
+def seed(client):
+    client.post('/api/monkeys', json={'name': 'George', 'species': 'capuchin', 'age_years': 5, 'favourite_fruit': 'banana'})
+    client.post('/api/monkeys', json={
+        'name': 'Zoë', 'species': 'marmoset', 'age_years': 2, 'favourite_fruit': 'fig',
+        'last_checkup_at': '2024-01-15T10:30:00',
+    })
+
+
+def test_trusted_output_is_byte_identical_to_model_output(client, monkeypatch):
+    seed(client)
+    monkey_id = client.get('/api/monkeys').json()[0]['monkey_id']
+    paths = ['/api/monkeys', '/api/monkeys?species=marmoset', f'/api/monkeys/{monkey_id}', '/api/monkeys/suggest?prefix=g']
+    trusted = [client.get(path) for path in paths]
+    monkeypatch.setattr(server, 'TRUSTED_OUTPUT', False)
+    validated = [client.get(path) for path in paths]
+    for fast, slow in zip(trusted, validated):
+        assert fast.content == slow.content
+        assert fast.headers['content-type'] == slow.headers['content-type']
+
+
+def test_cached_encoding_follows_updates(client):
+    seed(client)
+    monkey_id = client.get('/api/monkeys').json()[0]['monkey_id']
+    assert client.get(f'/api/monkeys/{monkey_id}').json()['age_years'] == 5
+    client.put(f'/api/monkeys/{monkey_id}', json={'age_years': 6})
+    assert client.get(f'/api/monkeys/{monkey_id}').json()['age_years'] == 6
+    assert client.get('/api/monkeys').json()[0]['age_years'] == 6
+
+
+def test_openapi_still_documents_monkey_models(client):
+    paths = client.get('/openapi.json').json()['paths']
+    list_schema = paths['/api/monkeys']['get']['responses']['200']['content']['application/json']['schema']
+    assert list_schema['items'] == {'$ref': '#/components/schemas/Monkey'}
+    get_schema = paths['/api/monkeys/{monkey_id}']['get']['responses']['200']['content']['application/json']['schema']
+    assert get_schema == {'$ref': '#/components/schemas/Monkey'}
@@ -0,0 +1,208 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from storage import SharedWalStorage, create_storage
+from store import DuplicateNameError, MonkeyStore, VersionConflictError
+
+from .test_store import make_record
+
+
+def open_store(data_file, flush_interval=0, **kwargs):
+    store = MonkeyStore(storage=SharedWalStorage(data_file, **kwargs), flush_interval=flush_interval)
+    store.open()
+    return store
+
+
+def test_refresh_applies_other_processes_writes(data_file):
+    a, b = open_store(data_file), open_store(data_file)
+    a.put(make_record('x'))
+    a.put(make_record('y', name='Abu'))
+    a.apply_batch(puts=[make_record('z', name='Momo', species='howler')], deletes=['x'])
+    a.put(dict(make_record('y', name='Abu'), age_years=7, version=2))
+    assert b.get('y') is None
+    version = b.version
+    assert b.refresh() == ['x', 'y', 'z']
+    assert b.all() == a.all()
+    assert b.find_by_name('howler', 'momo') == 'z'
+    assert [r['monkey_id'] for r in b.search('abu')] == ['y']
+    assert b.version > version
+    assert b.refresh() == []
+    a.close()
+    b.close()
+
+
+def test_writes_check_against_other_processes_writes(data_file):
+    a, b = open_store(data_file), open_store(data_file)
+    a.put(make_record('x'))
+    with pytest.raises(DuplicateNameError):
+        b.put(make_record('y'))
+    a.put(dict(make_record('x'), age_years=9, version=2), expected_version=1)
+    with pytest.raises(VersionConflictError):
+        b.put(dict(make_record('x'), age_years=3, version=2), expected_version=1)
+    assert b.get('x')['age_years'] == 9
+    a.close()
+    b.close()
+
+
+def test_batches_check_against_other_processes_writes(data_file):
+    a, b = open_store(data_file), open_store(data_file)
+    a.put(make_record('x'))
+    a.put(make_record('y', name='Abu'))
+    b.refresh()
+    a.put(dict(make_record('x'), age_years=9, version=2), expected_version=1)
+    with pytest.raises(VersionConflictError):
+        b.apply_batch(
+            puts=[dict(make_record('x'), age_years=3, version=2), dict(make_record('y', name='Abu'), version=2)],
+            expected_versions={'x': 1, 'y': 1},
+        )
+    assert b.get('x')['age_years'] == 9
+    assert b.get('y')['version'] == 1
+    b.apply_batch(puts=[dict(make_record('x'), age_years=3, version=3)], expected_versions={'x': 2})
+    a.refresh()
+    assert a.get('x')['age_years'] == 3
+    a.close()
+    b.close()
+
+
+def test_replace_is_seen_by_other_processes(data_file):
+    a, b = open_store(data_file), open_store(data_file)
+    a.put(make_record('x'))
+    b.refresh()
+    a.replace({'z': make_record('z', name='Zed')})
+    b.refresh()
+    assert list(b.all()) == ['z']
+    assert b.find_by_name('capuchin', 'zed') == 'z'
+    a.close()
+    b.close()
+
+
+def test_reader_past_the_cut_follows_a_compaction(data_file):
+    a, b = open_store(data_file), open_store(data_file)
+    a.put(make_record('x'))
+    b.refresh()
+    b.put(make_record('y', name='Abu'))
+    a.storage.compact(a)
+    b.put(make_record('z', name='Momo'))
+    assert a.refresh() == ['y', 'z']
+    assert a.all() == b.all()
+    assert b.refresh() == []
+    reopened = open_store(data_file)
+    assert list(reopened.all()) == ['x', 'y', 'z']
+    for store in (a, b, reopened):
+        store.close()
+
+
+def test_reader_behind_the_cut_reloads_after_a_compaction(data_file):
+    a, b = open_store(data_file), open_store(data_file)
+    a.put(make_record('x'))
+    a.put(make_record('y', name='Abu'))
+    a.storage.compact(a)
+    a.delete('x')
+    assert b.refresh() == ['y']
+    assert list(b.all()) == ['y']
+    # b is current again, so its own compaction goes ahead
+    b.storage.compact(b)
+    assert a.refresh() == []
+    a.put(make_record('z', name='Momo'))
+    assert b.refresh() == ['z']
+    assert b.all() == a.all()
+    a.close()
+    b.close()
+
+
+def test_only_the_wal_backend_can_be_shared(data_file):
+    assert isinstance(create_storage('wal', data_file, shared=True), SharedWalStorage)
+    with pytest.raises(ValueError):
+        create_storage('sqlite', data_file, shared=True)
+
+
+def test_requests_see_other_workers_writes(data_file, monkeypatch):
+    other = open_store(data_file)
+    monkeypatch.setattr(server, 'store', MonkeyStore(storage=SharedWalStorage(data_file), flush_interval=0))
+    with TestClient(server.app) as client:
+        other.put(make_record('x'))
+        assert client.get('/api/monkeys/x').status_code == 200
+        assert client.post('/api/monkeys', json={
+            'name': 'George', 'species': 'capuchin', 'age_years': 3, 'favourite_fruit': 'fig',
+        }).status_code == 400
+    other.close()
+
+
+def test_requests_leave_the_shared_log_to_other_threads(data_file, monkeypatch):
+    other = open_store(data_file)
+    store = MonkeyStore(storage=SharedWalStorage(data_file), flush_interval=60)
+    threads = []
+    for name in ('write', 'changes'):
+        def spy(*args, method=getattr(store.storage, name), **kwargs):
+            threads.append(threading.current_thread().name)
+            return method(*args, **kwargs)
+        monkeypatch.setattr(store.storage, name, spy)
+    monkeypatch.setattr(server, 'store', store)
+    with TestClient(server.app) as client:
+        other.put(make_record('x'))
+        assert client.get('/api/monkeys/x').status_code == 200
+        assert client.post('/api/monkeys', json={
+            'name': 'George', 'species': 'capuchin', 'age_years': 3, 'favourite_fruit': 'fig',
+        }).status_code == 400
+        created = client.post('/api/monkeys', json={
+            'name': 'Abu', 'species': 'capuchin', 'age_years': 3, 'favourite_fruit': 'fig',
+        })
+        assert created.status_code == 201
+        monkey_id = created.json()['monkey_id']
+        assert client.put(f'/api/monkeys/{monkey_id}', json={'age_years': 4}).status_code == 200
+        other.refresh()
+        assert other.get(monkey_id)['age_years'] == 4
+    assert threads
+    assert all(name == 'monkey-store-writer' or name.startswith('asyncio_') for name in threads)
+    other.close()
+
+
+WORKER = textwrap.dedent('''
+    import sys
+    sys.path.insert(0, {backend_dir!r})
+    from storage import SharedWalStorage
+    from store import DuplicateNameError, MonkeyStore
+
+    store = MonkeyStore(storage=SharedWalStorage({path!r}, compact_min_bytes=4096), flush_interval=0.01)
+    store.open()
+    created = 0
+    for i in range(200):
+        record = {{'monkey_id': '{worker}-%d' % i, 'name': 'Monkey%d' % i, 'species': 'howler',
+                  'age_years': 3, 'favourite_fruit': 'fig', 'last_checkup_at': None,
+                  'created_at': 'x', 'updated_at': 'x', 'version': 1}}
+        try:
+            store.put(record).result()
+            created += 1
+        except DuplicateNameError:
+            pass
+        store.refresh()
+    store.close()
+    print(created)
+''')
+
+
+def test_concurrent_processes_share_one_registry(data_file):
+    backend_dir = os.path.dirname(sys.modules['storage'].__file__)
+    procs = [
+        subprocess.Popen(
+            [sys.executable, '-c', WORKER.format(backend_dir=backend_dir, path=str(data_file), worker=worker)],
+            stdout=subprocess.PIPE, text=True,
+        )
+        for worker in range(4)
+    ]
+    created = sum(int(proc.communicate(timeout=60)[0]) for proc in procs)
+    assert all(proc.returncode == 0 for proc in procs)
+
+    # Every name was claimed exactly once, across several compactions
+    store = open_store(data_file)
+    assert created == len(store) == 200
+    assert sorted(int(r['name'][6:]) for r in store.values()) == list(range(200))
+    assert store.storage._generation > 0
+    store.close()
@@ -0,0 +1,128 @@
+import json
+import struct
+import subprocess
+import sys
+
+import pytest
+
+from records import MonkeyRecord
+from snapshot import SnapshotFormatError, decode_snapshot, encode_snapshot
+from storage import WalStorage, create_storage
+from store import MonkeyStore
+
+from .test_store import make_record
+
+
+def registry():
+    return {
+        'a': make_record('a', name='Zoë'),
+        'b': dict(make_record('b', name='Abu', species='howler'), last_checkup_at='2024-02-01T00:00:00',
+                  updated_at='2024-03-01T00:00:00', version=4, age_years=31),
+    }
+
+
+def test_round_trip():
+    decoded = decode_snapshot(encode_snapshot(registry()))
+    assert list(decoded) == ['a', 'b']
+    assert all(isinstance(record, MonkeyRecord) for record in decoded.values())
+    assert decoded == registry()
+    assert decode_snapshot(encode_snapshot(decoded)) == registry()
+    assert decode_snapshot(encode_snapshot({})) == {}
+
+
+def test_rejects_other_files_and_newer_formats():
+    blob = encode_snapshot(registry())
+    with pytest.raises(SnapshotFormatError):
+        decode_snapshot(b'{"a": 1}')
+    with pytest.raises(SnapshotFormatError):
+        decode_snapshot(blob[:-3])
+    newer = blob[:8] + struct.pack('<H', 99) + blob[10:]
+    with pytest.raises(SnapshotFormatError, match='newer'):
+        decode_snapshot(newer)
+
+
+def open_store(data_file, **kwargs):
+    store = MonkeyStore(storage=WalStorage(data_file, snapshot_format='binary', **kwargs), flush_interval=0)
+    store.open()
+    return store
+
+
+def test_binary_engine_starts_from_json_and_compacts_to_binary(data_file):
+    data_file.write_text(json.dumps(registry()))
+    store = open_store(data_file, compact_min_bytes=0)
+    assert store.all() == registry()
+    store.put(make_record('c', name='Momo'))
+    store.flush()
+    store.close()
+
+    snap = data_file.with_suffix('.snap')
+    assert set(decode_snapshot(snap.read_bytes())) == {'a', 'b', 'c'}
+    # The JSON file is left as it was
+    assert set(json.loads(data_file.read_text())) == {'a', 'b'}
+    reopened = open_store(data_file)
+    assert reopened.all() == dict(registry(), c=make_record('c', name='Momo'))
+    reopened.close()
+
+
+def test_only_the_wal_engine_keeps_binary_snapshots(data_file):
+    with pytest.raises(ValueError):
+        create_storage('json', data_file, snapshot_format='binary')
+    with pytest.raises(ValueError):
+        create_storage('wal', data_file, snapshot_format='yaml')
+
+
+def test_migration_tool_converts_both_ways(data_file):
+    data_file.write_text(json.dumps({'a': registry()['a']}))
+    (data_file.parent / 'monkeys_data.json.wal').write_text(
+        json.dumps({'op': 'put', 'record': registry()['b']}) + '\n'
+    )
+    tool = sys.modules['snapshot'].__file__
+    subprocess.run([sys.executable, tool, str(data_file)], check=True, capture_output=True)
+    snap = data_file.with_suffix('.snap')
+    assert decode_snapshot(snap.read_bytes()) == registry()
+
+    back = data_file.parent / 'back.json'
+    subprocess.run([sys.executable, tool, str(snap), '--output', str(back)], check=True, capture_output=True)
+    assert json.loads(back.read_text()) == registry()
+
+
+def test_migration_tool_upgrades_records_from_before_versions(data_file):
+    legacy = {key: value for key, value in make_record('a', name='Abu').items() if key != 'version'}
+    data_file.write_text(json.dumps({'a': dict(legacy, last_checkup_at='2024-01-01')}))
+    subprocess.run([sys.executable, sys.modules['snapshot'].__file__, str(data_file)],
+                   check=True, capture_output=True)
+    record = decode_snapshot(data_file.with_suffix('.snap').read_bytes())['a']
+    assert record['version'] == 1
+    assert record['last_checkup_at'] == '2024-01-01T00:00:00'
+
+
+def test_store_upgrades_binary_records(data_file):
+    record = dict(make_record('a', name='Abu'), last_checkup_at='2024-01-01')
+    data_file.with_suffix('.snap').write_bytes(encode_snapshot({'a': record}))
+    store = open_store(data_file)
+    assert store.get('a')['last_checkup_at'] == '2024-01-01T00:00:00'
+    store.close()
+
+
+def test_the_newer_snapshot_is_read_whatever_the_format(data_file):
+    data_file.write_text(json.dumps(registry()))
+    store = open_store(data_file, compact_min_bytes=0)
+    store.put(make_record('c', name='Momo'))
+    store.flush()
+    store.close()
+    for engine in ('wal', 'json'):
+        store = MonkeyStore(storage=create_storage(engine, data_file), flush_interval=0)
+        store.open()
+        assert set(store.all()) == {'a', 'b', 'c'}
+        store.close()
+
+    # Back in JSON mode, a compaction folds the log into the JSON file only
+    store = MonkeyStore(storage=WalStorage(data_file, compact_min_bytes=0), flush_interval=0)
+    store.open()
+    store.put(make_record('d', name='Zed'))
+    store.storage.compact(store)
+    store.close()
+    assert set(json.loads(data_file.read_text())) == {'a', 'b', 'c', 'd'}
+    reopened = open_store(data_file)
+    assert set(reopened.all()) == {'a', 'b', 'c', 'd'}
+    reopened.close()
@@ -0,0 +1,66 @@
+import json
+import sqlite3
+
+from storage import SqliteStorage
+from store import MonkeyStore
+
+from .test_store import make_record
+
+
+def open_store(path, **kwargs):
+    store = MonkeyStore(storage=SqliteStorage(path, **kwargs), flush_interval=0)
+    store.open()
+    return store
+
+
+def test_database_uses_wal_mode_and_indexes(tmp_path):
+    db_path = tmp_path / 'monkeys.db'
+    store = open_store(db_path)
+    store.put(make_record('a'))
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list('monkeys')")}
+    assert {'monkeys_species_name', 'monkeys_updated_at'} <= indexes
+    plan = ' '.join(row[-1] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT record FROM monkeys WHERE species = 'capuchin' AND name = 'GEORGE' COLLATE NOCASE"
+    ))
+    assert 'monkeys_species_name' in plan
+    assert conn.execute(
+        "SELECT monkey_id FROM monkeys WHERE species = 'capuchin' AND name = 'GEORGE' COLLATE NOCASE"
+    ).fetchall() == [('a',)]
+    conn.close()
+    store.close()
+
+
+def test_new_database_imports_the_json_registry(data_file):
+    data_file.write_text(json.dumps({'a': make_record('a')}))
+    log_path = data_file.with_name(data_file.name + '.wal')
+    log_path.write_text(json.dumps({'op': 'put', 'record': make_record('b', name='Abu')}) + '\n')
+
+    db_path = data_file.with_suffix('.db')
+    store = open_store(db_path, import_from=data_file)
+    assert list(store.all()) == ['a', 'b']
+    store.delete('a')
+    store.close()
+
+    # Only a new database imports; the JSON files are left alone
+    store = open_store(db_path, import_from=data_file)
+    assert list(store.all()) == ['b']
+    store.close()
+    assert set(json.loads(data_file.read_text())) == {'a'}
+    assert log_path.exists()
+
+
+def test_failed_write_leaves_the_database_unchanged(tmp_path):
+    db_path = tmp_path / 'monkeys.db'
+    store = open_store(db_path)
+    store.put(make_record('a'))
+    try:
+        store.storage.write([
+            {'op': 'delete', 'monkey_id': 'a'},
+            {'op': 'batch', 'puts': [make_record('b', name='Abu'), {'monkey_id': 'broken'}], 'deletes': []},
+        ])
+    except KeyError:
+        pass
+    store.close()
+    assert list(open_store(db_path).all()) == ['a']
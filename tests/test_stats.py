@@ -0,0 +1,107 @@
+import random
+from collections import Counter
+
+from store import MonkeyStore
+
+from .test_store import make_record
+
+
+SPECIES = ['capuchin', 'macaque', 'marmoset', 'howler']
+FRUITS = ['banana', 'mango', 'fig', 'apple', 'grape']
+
+
+def random_record(rng, monkey_id):
+    record = make_record(monkey_id, name=f'Monkey{monkey_id}', species=rng.choice(SPECIES))
+    record['age_years'] = rng.randint(0, 22)
+    record['favourite_fruit'] = rng.choice(FRUITS)
+    record['last_checkup_at'] = rng.choice([None, '2020-05-01T10:00:00', '2024-03-01T10:00:00'])
+    return record
+
+
+def scanned_stats(store, cutoff):
+    """The aggregates recomputed from every record"""
+    records = list(store.values())
+    species = {}
+    for name in sorted({r['species'] for r in records}):
+        ages = [r['age_years'] for r in records if r['species'] == name]
+        species[name] = {'count': len(ages), 'mean_age': sum(ages) / len(ages),
+                         'min_age': min(ages), 'max_age': max(ages)}
+    buckets = Counter(r['age_years'] // 5 for r in records)
+    fruits = Counter(r['favourite_fruit'] for r in records)
+    return {
+        'species': species,
+        'age_histogram': [(b * 5, b * 5 + 4, n) for b, n in sorted(buckets.items())],
+        'top_fruits': sorted(fruits.items(), key=lambda item: (-item[1], item[0]))[:3],
+        'never': sum(r['last_checkup_at'] is None for r in records),
+        'overdue': sum(r['last_checkup_at'] is not None and r['last_checkup_at'] < cutoff for r in records),
+    }
+
+
+def maintained_stats(store, cutoff):
+    return {
+        'species': store.stats.species(),
+        'age_histogram': store.stats.age_histogram(),
+        'top_fruits': store.stats.top_fruits(3),
+        'never': store.stats.never_checked,
+        'overdue': store.checkups_before(cutoff),
+    }
+
+
+def test_stats_follow_every_mutation(data_file):
+    rng = random.Random(3)
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    cutoff = '2023-01-01T00:00:00'
+    for i in range(400):
+        monkey_id = str(rng.randrange(150))
+        action = rng.random()
+        if action < 0.15 and monkey_id in store:
+            store.delete(monkey_id)
+        elif action < 0.2:
+            store.apply_batch(
+                puts=[random_record(rng, str(rng.randrange(150, 200)))],
+                deletes=[str(rng.randrange(150))],
+            )
+        else:
+            current = store.get(monkey_id)
+            record = random_record(rng, monkey_id)
+            if current is not None:
+                record['name'] = current['name']
+            store.put(record)
+        if i % 50 == 0:
+            assert maintained_stats(store, cutoff) == scanned_stats(store, cutoff)
+    assert maintained_stats(store, cutoff) == scanned_stats(store, cutoff)
+
+    store.replace({monkey_id: record for monkey_id, record in list(store.items())[:20]})
+    assert maintained_stats(store, cutoff) == scanned_stats(store, cutoff)
+    store.close()
+    store.open()
+    assert maintained_stats(store, cutoff) == scanned_stats(store, cutoff)
+    store.close()
+
+
+def test_stats_endpoint(client):
+    for name, species, age, fruit, checkup in [
+        ('George', 'capuchin', 4, 'banana', '2020-01-01T10:00:00'),
+        ('Abu', 'capuchin', 10, 'banana', None),
+        ('Momo', 'marmoset', 2, 'fig', '2999-01-01T10:00:00'),
+    ]:
+        assert client.post('/api/monkeys', json={
+            'name': name, 'species': species, 'age_years': age,
+            'favourite_fruit': fruit, 'last_checkup_at': checkup,
+        }).status_code == 201
+
+    stats = client.get('/api/monkeys/stats', params={'top_fruits': 1}).json()
+    assert stats['total'] == 3
+    assert stats['species'] == {
+        'capuchin': {'count': 2, 'mean_age': 7.0, 'min_age': 4, 'max_age': 10},
+        'marmoset': {'count': 1, 'mean_age': 2.0, 'min_age': 2, 'max_age': 2},
+    }
+    assert stats['age_histogram'] == [
+        {'min_age': 0, 'max_age': 4, 'count': 2},
+        {'min_age': 10, 'max_age': 14, 'count': 1},
+    ]
+    assert stats['top_fruits'] == [{'fruit': 'banana', 'count': 2}]
+    assert stats['checkups']['overdue'] == 1
+    assert stats['checkups']['never_checked'] == 1
+    assert stats['checkups']['overdue_days'] == 365
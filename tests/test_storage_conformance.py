@@ -0,0 +1,157 @@
+"""Behaviour every persistence engine must share, run against each of them"""
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from storage import create_storage
+from store import MonkeyStore
+
+from .test_store import make_record
+
+BACKENDS = ['json', 'wal', 'sqlite']
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    return request.param
+
+
+def open_store(backend, data_file):
+    store = MonkeyStore(storage=create_storage(backend, data_file), flush_interval=0)
+    store.open()
+    return store
+
+
+def reopen(store, backend, data_file):
+    store.close()
+    return open_store(backend, data_file)
+
+
+def test_empty_registry(backend, data_file):
+    store = open_store(backend, data_file)
+    assert store.all() == {}
+    assert not store.flush()
+    store.close()
+
+
+def test_puts_and_deletes_survive_reopen(backend, data_file):
+    store = open_store(backend, data_file)
+    store.put(make_record('a'))
+    store.put(make_record('b', name='Abu'))
+    store.put(dict(make_record('a'), age_years=9, version=2))
+    store.delete('b')
+    store.delete('missing')
+    store = reopen(store, backend, data_file)
+    assert store.all() == {'a': dict(make_record('a'), age_years=9, version=2)}
+    store.close()
+
+
+def test_replacing_with_held_records_survives_reopen(backend, data_file):
+    # What save_monkeys_data(load_monkeys_data()) does: the records passed
+    # back are the store's own compact ones, not dicts
+    store = open_store(backend, data_file)
+    store.put(make_record('a'))
+    store.put(make_record('b', name='Abu'))
+    store.replace(store.all())
+    store.put(dict(make_record('a'), age_years=9, version=2))
+    store = reopen(store, backend, data_file)
+    assert store.all() == {'a': dict(make_record('a'), age_years=9, version=2), 'b': make_record('b', name='Abu')}
+    store.close()
+
+
+def test_order_survives_reopen(backend, data_file):
+    store = open_store(backend, data_file)
+    for monkey_id, name in [('a', 'George'), ('b', 'Abu'), ('c', 'Momo')]:
+        store.put(make_record(monkey_id, name=name))
+    store.put(dict(make_record('b', name='Abu'), age_years=1))
+    store.put(make_record('a', species='howler'))
+    order = list(store.all())
+    assert order == ['b', 'c', 'a']
+    store = reopen(store, backend, data_file)
+    assert list(store.all()) == order
+    assert [r['monkey_id'] for r in store.values('capuchin')] == ['b', 'c']
+    store.close()
+
+
+def test_batches_survive_reopen(backend, data_file):
+    store = open_store(backend, data_file)
+    store.apply_batch(puts=[make_record('a'), make_record('b', name='Abu')])
+    store.apply_batch(
+        puts=[make_record('c', name='Abu'), dict(make_record('a'), name='Georgina')],
+        deletes=['b'],
+    )
+    expected = dict(store.all())
+    store = reopen(store, backend, data_file)
+    assert store.all() == expected
+    assert store.find_by_name('capuchin', 'abu') == 'c'
+    store.close()
+
+
+def test_replace_survives_reopen(backend, data_file):
+    store = open_store(backend, data_file)
+    store.put(make_record('a'))
+    store.replace({'z': make_record('z', name='Zed')})
+    store.put(make_record('y', name='Why'))
+    store = reopen(store, backend, data_file)
+    assert list(store.all()) == ['z', 'y']
+    store.close()
+
+
+def test_flush_makes_changes_visible_to_a_new_reader(backend, data_file):
+    store = open_store(backend, data_file)
+    store.put(make_record('a'))
+    assert store.flush()
+    reader = open_store(backend, data_file)
+    assert set(reader.all()) == {'a'}
+    reader.close()
+    store.close()
+
+
+WRITER = textwrap.dedent('''
+    import sys
+    sys.path.insert(0, {backend_dir!r})
+    from storage import create_storage
+    from store import MonkeyStore
+
+    store = MonkeyStore(storage=create_storage({backend!r}, {path!r}), flush_interval=0.001)
+    store.open()
+    i = 0
+    while True:
+        store.put({{'monkey_id': str(i), 'name': 'Monkey%d' % i, 'species': 'howler',
+                   'age_years': 3, 'favourite_fruit': 'fig', 'last_checkup_at': None,
+                   'created_at': 'x', 'updated_at': 'x', 'version': 1}}).result()
+        if i % 3 == 0:
+            store.delete(str(i - 1)).result()
+        print(i, flush=True)
+        i += 1
+''')
+
+
+@pytest.mark.parametrize('durable_backend', ['wal', 'sqlite'])
+def test_kill_9_never_loses_acknowledged_writes(durable_backend, data_file):
+    backend_dir = os.path.dirname(sys.modules['storage'].__file__)
+    script = WRITER.format(backend_dir=backend_dir, backend=durable_backend, path=str(data_file))
+    for delay in (0.3, 0.8):
+        proc = subprocess.Popen(
+            [sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        time.sleep(delay)
+        os.kill(proc.pid, signal.SIGKILL)
+        acknowledged = [int(line) for line in proc.stdout.read().split()]
+        proc.wait()
+        if not acknowledged:
+            continue
+
+        store = open_store(durable_backend, data_file)
+        data = store.all()
+        for i in range(acknowledged[-1]):
+            deleted = (i + 1) % 3 == 0
+            assert (str(i) in data) != deleted, i
+        store.close()
+        for path in data_file.parent.iterdir():
+            path.unlink()
@@ -0,0 +1,145 @@
+import json
+import time
+
+import pytest
+
+from store import DuplicateNameError, MonkeyStore
+
+
+def make_record(monkey_id, name='George', species='capuchin'):
+    return {
+        'monkey_id': monkey_id,
+        'name': name,
+        'species': species,
+        'age_years': 5,
+        'favourite_fruit': 'banana',
+        'last_checkup_at': None,
+        'created_at': '2024-01-15T10:30:00',
+        'updated_at': '2024-01-15T10:30:00',
+        'version': 1,
+    }
+
+
+def test_store_reads_file_once(data_file):
+    data_file.write_text(json.dumps({'a': make_record('a')}))
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    data_file.write_text('{}')
+    assert store.get('a')['name'] == 'George'
+    assert len(store) == 1
+    store.close()
+
+
+def test_write_behind_flush_interval(data_file):
+    store = MonkeyStore(data_file, flush_interval=0.05)
+    store.open()
+    store.put(make_record('a'))
+    deadline = time.time() + 2
+    while not data_file.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    assert json.loads(data_file.read_text())['a']['name'] == 'George'
+    store.close()
+
+
+def test_close_flushes_pending_changes(data_file):
+    store = MonkeyStore(data_file, flush_interval=3600)
+    store.open()
+    store.put(make_record('a'))
+    store.put(make_record('b', name='Abu'))
+    store.delete('a')
+    assert not data_file.exists()
+    store.close()
+    assert set(json.loads(data_file.read_text())) == {'b'}
+
+
+def test_api_round_trip_persists_on_shutdown(data_file, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+
+    monkeypatch.setattr(server, 'store', MonkeyStore(data_file, flush_interval=3600))
+    with TestClient(server.app) as client:
+        response = client.post('/api/monkeys', json={
+            'name': 'George', 'species': 'capuchin', 'age_years': 5, 'favourite_fruit': 'banana',
+        })
+        assert response.status_code == 201
+        monkey_id = response.json()['monkey_id']
+        assert client.get(f'/api/monkeys/{monkey_id}').json()['name'] == 'George'
+        assert client.put(f'/api/monkeys/{monkey_id}', json={'age_years': 6}).json()['age_years'] == 6
+        assert client.post('/api/monkeys', json={
+            'name': 'george', 'species': 'capuchin', 'age_years': 5, 'favourite_fruit': 'banana',
+        }).status_code == 400
+    assert json.loads(data_file.read_text())[monkey_id]['age_years'] == 6
+
+
+def test_name_index_tracks_renames_species_changes_and_deletes(data_file):
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    store.put(make_record('a', name='George'))
+    assert store.find_by_name('capuchin', 'GEORGE') == 'a'
+
+    store.put(make_record('a', name='Curious George'))
+    assert store.find_by_name('capuchin', 'george') is None
+    assert store.find_by_name('capuchin', 'curious george') == 'a'
+
+    store.put(make_record('a', name='Curious George', species='howler'))
+    assert store.find_by_name('capuchin', 'Curious George') is None
+    assert store.find_by_name('howler', 'Curious George') == 'a'
+
+    store.delete('a')
+    assert store.find_by_name('howler', 'Curious George') is None
+    store.close()
+
+
+def test_name_index_enforces_uniqueness(data_file):
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    store.put(make_record('a', name='George'))
+    store.put(make_record('b', name='george', species='howler'))
+    with pytest.raises(DuplicateNameError):
+        store.put(make_record('c', name='GeOrGe'))
+    with pytest.raises(DuplicateNameError):
+        store.put(make_record('b', name='George'))
+    assert store.get('c') is None
+    assert store.get('b')['species'] == 'howler'
+    store.close()
+
+
+def test_species_partitions_follow_mutations(data_file):
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    store.put(make_record('a', name='George'))
+    store.put(make_record('b', name='Abu', species='howler'))
+    store.put(make_record('c', name='Momo'))
+    assert [r['monkey_id'] for r in store.values('capuchin')] == ['a', 'c']
+    assert store.count('howler') == 1
+    assert list(store.values('marmoset')) == []
+
+    store.put(dict(make_record('a', name='George'), age_years=9))
+    assert [r['monkey_id'] for r in store.values('capuchin')] == ['a', 'c']
+    assert store.get('a')['age_years'] == 9
+
+    store.put(make_record('a', name='George', species='howler'))
+    assert [r['monkey_id'] for r in store.values('capuchin')] == ['c']
+    assert [r['monkey_id'] for r in store.values('howler')] == ['b', 'a']
+    assert [r['monkey_id'] for r in store.values()] == ['b', 'c', 'a']
+
+    store.delete('b')
+    assert [r['monkey_id'] for r in store.values('howler')] == ['a']
+    store.close()
+
+
+def test_partition_order_survives_wal_replay(data_file):
+    from storage import WalStorage
+
+    store = MonkeyStore(storage=WalStorage(data_file), flush_interval=0)
+    store.open()
+    store.put(make_record('a', name='George'))
+    store.put(make_record('b', name='Abu'))
+    store.put(make_record('a', name='George', species='macaque'))
+    store.close()
+
+    reopened = MonkeyStore(storage=WalStorage(data_file), flush_interval=0)
+    reopened.open()
+    assert [r['monkey_id'] for r in reopened.values()] == ['b', 'a']
+    assert [r['monkey_id'] for r in reopened.values('macaque')] == ['a']
+    reopened.close()
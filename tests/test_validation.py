@@ -0,0 +1,44 @@
+import server
+
+
+def monkey(name, species='marmoset', age=5):
+    return {'name': name, 'species': species, 'age_years': age, 'favourite_fruit': 'banana'}
+
+
+def test_age_only_update_is_checked_against_the_stored_species(client):
+    monkey_id = client.post('/api/monkeys', json=monkey('Momo')).json()['monkey_id']
+    response = client.put(f'/api/monkeys/{monkey_id}', json={'age_years': 30})
+    assert response.status_code == 422
+    assert 'Marmoset age cannot exceed 22 years' in response.text
+    assert client.get(f'/api/monkeys/{monkey_id}').json()['age_years'] == 5
+
+    # Moving it to another species at the same time is fine
+    moved = client.put(f'/api/monkeys/{monkey_id}', json={'age_years': 30, 'species': 'howler'})
+    assert moved.status_code == 200
+    assert client.put(f'/api/monkeys/{monkey_id}', json={'species': 'marmoset'}).status_code == 422
+
+
+def test_bulk_updates_are_checked_as_whole_records(client):
+    created = client.post('/api/monkeys/bulk', json=[monkey('Momo'), monkey('Abu', 'howler', 30)]).json()
+    ids = [result['monkey_id'] for result in created['results']]
+    response = client.put('/api/monkeys/bulk', params={'mode': 'best_effort'}, json=[
+        {'monkey_id': ids[0], 'age_years': 30},
+        {'monkey_id': ids[1], 'species': 'marmoset'},
+        {'monkey_id': ids[1], 'age_years': 31},
+    ])
+    results = response.json()['results']
+    assert [r['status'] for r in results] == [422, 422, 400]
+    assert results[0]['monkey_id'] == ids[0]
+    assert 'Marmoset age' in results[0]['error'][0]['msg']
+
+
+def test_batch_validation_reports_errors_per_item():
+    results = [None] * 4
+    valid = server.validate_bulk_items(server.CREATE_BATCH, [
+        monkey('Momo'), monkey('A'), 'not a monkey', monkey('Old', age=23),
+    ], results)
+    assert list(valid) == [0]
+    assert valid[0].name == 'Momo'
+    assert [result.status for result in results[1:]] == [422] * 3
+    assert results[1].error[0]['loc'] == ('name',)
+    assert results[3].error[0]['loc'] == ()
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+
+from store import MonkeyStore, VersionConflictError
+from .test_concurrency import registry, run_clients  # noqa: F401
+from .test_store import make_record
+
+
+def create(client, name='George'):
+    return client.post('/api/monkeys', json={
+        'name': name, 'species': 'capuchin', 'age_years': 5, 'favourite_fruit': 'banana',
+    }).json()
+
+
+def test_updates_raise_the_record_version(client):
+    monkey = create(client)
+    assert monkey['version'] == 1
+    url = f"/api/monkeys/{monkey['monkey_id']}"
+    response = client.put(url, json={'age_years': 6})
+    assert response.json()['version'] == 2
+    assert response.headers['etag'] == '"2"'
+    assert client.get(url).headers['etag'] == '"2"'
+    assert client.get(url).json()['version'] == 2
+
+
+def test_expected_version_mismatch_is_rejected(client):
+    monkey = create(client)
+    url = f"/api/monkeys/{monkey['monkey_id']}"
+    assert client.put(url, json={'age_years': 6, 'expected_version': 1}).status_code == 200
+
+    stale = client.put(url, json={'age_years': 7, 'expected_version': 1})
+    assert stale.status_code == 409
+    assert stale.headers['etag'] == '"2"'
+    assert client.get(url).json()['age_years'] == 6
+
+
+def test_if_match(client):
+    monkey = create(client)
+    url = f"/api/monkeys/{monkey['monkey_id']}"
+    etag = client.get(url).headers['etag']
+    assert client.put(url, json={'age_years': 6}, headers={'If-Match': etag}).status_code == 200
+    assert client.put(url, json={'age_years': 7}, headers={'If-Match': etag}).status_code == 409
+    assert client.put(url, json={'age_years': 8}, headers={'If-Match': '*'}).status_code == 200
+    assert client.put(url, json={'age_years': 9}, headers={'If-Match': '"1", "3"'}).status_code == 200
+    assert client.put('/api/monkeys/missing', json={'age_years': 9}, headers={'If-Match': '*'}).status_code == 404
+
+
+def test_bulk_update_checks_expected_versions(client):
+    george, abu = create(client), create(client, 'Abu')
+    client.put(f"/api/monkeys/{abu['monkey_id']}", json={'age_years': 6})
+    response = client.put('/api/monkeys/bulk?mode=best_effort', json=[
+        {'monkey_id': george['monkey_id'], 'age_years': 9, 'expected_version': 1},
+        {'monkey_id': abu['monkey_id'], 'age_years': 9, 'expected_version': 1},
+    ])
+    statuses = [result['status'] for result in response.json()['results']]
+    assert statuses == [200, 409]
+    assert response.json()['results'][0]['monkey']['version'] == 2
+
+
+def test_concurrent_editors_of_one_version_conflict(registry):  # noqa: F811
+    record = make_record('a')
+    registry.put(record)
+    requests = [('PUT', '/api/monkeys/a', {'age_years': age, 'expected_version': 1}) for age in range(20)]
+    responses = asyncio.run(run_clients(20, requests))
+    assert sorted(response.status_code for response in responses) == [200] + [409] * 19
+    assert registry.get('a')['version'] == 2
+
+
+def test_store_put_checks_expected_version(data_file):
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    store.put(make_record('a'))
+    with pytest.raises(VersionConflictError):
+        store.put(dict(make_record('a'), version=2), expected_version=2)
+    with pytest.raises(VersionConflictError):
+        store.put(make_record('b'), expected_version=1)
+    store.put(dict(make_record('a'), version=2), expected_version=1)
+    assert store.get('a')['version'] == 2
+    store.close()
+
+
+def test_records_without_a_version_load_as_version_one(data_file):
+    legacy = make_record('a')
+    del legacy['version']
+    data_file.write_text(json.dumps({'a': legacy}))
+    store = MonkeyStore(data_file, flush_interval=0)
+    store.open()
+    assert store.get('a')['version'] == 1
+    store.close()
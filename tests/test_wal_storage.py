@@ -0,0 +1,168 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from storage import WalStorage
+from store import MonkeyStore
+
+from .test_store import make_record
+
+
+def open_store(data_file, **kwargs):
+    store = MonkeyStore(storage=WalStorage(data_file, **kwargs), flush_interval=0)
+    store.open()
+    return store
+
+
+def test_mutations_append_one_record_each(data_file):
+    store = open_store(data_file)
+    store.put(make_record('a'))
+    store.put(make_record('b', name='Abu'))
+    store.delete('a')
+    lines = (data_file.parent / 'monkeys_data.json.wal').read_bytes().splitlines()
+    assert [json.loads(line)['op'] for line in lines] == ['put', 'put', 'delete']
+    store.close()
+
+
+def test_replays_log_on_top_of_snapshot(data_file):
+    data_file.write_text(json.dumps({'a': make_record('a'), 'b': make_record('b', name='Abu')}))
+    store = open_store(data_file)
+    store.delete('a')
+    store.put(make_record('c', name='Momo'))
+    store.close()
+
+    reopened = open_store(data_file)
+    assert set(reopened.all()) == {'b', 'c'}
+    reopened.close()
+
+
+def test_torn_tail_is_discarded(data_file):
+    store = open_store(data_file)
+    store.put(make_record('a'))
+    store.close()
+    log_path = data_file.parent / 'monkeys_data.json.wal'
+    with open(log_path, 'ab') as f:
+        f.write(b'{"op":"put","record":{"monkey_id":"b"')
+
+    reopened = open_store(data_file)
+    assert set(reopened.all()) == {'a'}
+    reopened.put(make_record('c', name='Momo'))
+    reopened.close()
+    assert set(open_store(data_file).all()) == {'a', 'c'}
+
+
+def test_partial_append_is_cut_off_the_log(data_file, monkeypatch):
+    store = open_store(data_file)
+    write = os.write
+    calls = []
+
+    def short_then_full_disk(fd, payload):
+        calls.append(len(payload))
+        if len(calls) == 1:
+            return write(fd, payload[:10])
+        if len(calls) == 2:
+            raise OSError(28, "No space left on device")
+        return write(fd, payload)
+
+    monkeypatch.setattr(os, 'write', short_then_full_disk)
+    with pytest.raises(OSError):
+        store.put(make_record('a'))
+    store.put(make_record('b', name='Abu'))
+    store.put(make_record('c', name='Momo'))
+    monkeypatch.setattr(os, 'write', write)
+    store.close()
+
+    reopened = open_store(data_file)
+    assert set(reopened.all()) == {'b', 'c'}
+    reopened.close()
+
+
+def test_short_writes_are_completed(data_file, monkeypatch):
+    store = open_store(data_file)
+    write = os.write
+    monkeypatch.setattr(os, 'write', lambda fd, payload: write(fd, payload[:7]))
+    store.put(make_record('a'))
+    monkeypatch.setattr(os, 'write', write)
+    store.close()
+    reopened = open_store(data_file)
+    assert set(reopened.all()) == {'a'}
+    reopened.close()
+
+
+def test_compaction_folds_log_into_snapshot(data_file):
+    store = open_store(data_file, compact_min_bytes=0)
+    for i in range(20):
+        store.put(make_record(str(i), name=f'Monkey{i}'))
+    store.flush()
+    log_path = data_file.parent / 'monkeys_data.json.wal'
+    assert log_path.stat().st_size == 0
+    assert len(json.loads(data_file.read_text())) == 20
+    store.close()
+
+
+def test_compaction_keeps_records_appended_after_the_cut(data_file):
+    store = open_store(data_file)
+    store.put(make_record('a'))
+    original_snapshot = store.snapshot
+
+    def snapshot_then_write():
+        result = original_snapshot()
+        store.put(make_record('late', name='Late'))
+        return result
+
+    store.snapshot = snapshot_then_write
+    store.storage.compact(store)
+    store.snapshot = original_snapshot
+    store.close()
+    assert set(open_store(data_file).all()) == {'a', 'late'}
+
+
+WRITER = textwrap.dedent('''
+    import sys
+    sys.path.insert(0, {backend!r})
+    from storage import WalStorage
+    from store import MonkeyStore
+
+    store = MonkeyStore(storage=WalStorage({path!r}, compact_min_bytes=4096), flush_interval=0.001)
+    store.open()
+    i = 0
+    while True:
+        store.put({{'monkey_id': str(i), 'name': 'Monkey%d' % i, 'species': 'howler',
+                   'age_years': 3, 'favourite_fruit': 'fig', 'last_checkup_at': None,
+                   'created_at': 'x', 'updated_at': 'x'}}).result()
+        if i % 3 == 0:
+            store.delete(str(i - 1)).result()
+        print(i, flush=True)
+        i += 1
+''')
+
+
+def test_kill_9_never_loses_acknowledged_writes(data_file):
+    backend = os.path.dirname(sys.modules['storage'].__file__)
+    for delay in (0.2, 0.5, 0.9):
+        proc = subprocess.Popen(
+            [sys.executable, '-c', WRITER.format(backend=backend, path=str(data_file))],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        time.sleep(delay)
+        os.kill(proc.pid, signal.SIGKILL)
+        acknowledged = [int(line) for line in proc.stdout.read().split()]
+        proc.wait()
+        if not acknowledged:
+            continue
+        last = acknowledged[-1]
+
+        store = open_store(data_file)
+        data = store.all()
+        for i in range(last):
+            deleted = (i + 1) % 3 == 0
+            assert (str(i) in data) != deleted, i
+        store.close()
+        for path in data_file.parent.iterdir():
+            path.unlink()
@@ -0,0 +1,275 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import server
+from locks import KeyedLocks
+from storage import WalStorage
+from store import MonkeyStore
+from writer import StorageWriter, WriteError
+
+from .test_store import make_record
+
+
+class GatedStorage:
+    """Engine stand-in whose writes wait for ``gate`` and are recorded"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.writes = []
+        self.syncs = 0
+
+    def write(self, entries):
+        self.gate.wait()
+        if any(entry.get('fail') for entry in entries):
+            raise OSError("disk full")
+        self.writes.append(list(entries))
+
+    def sync(self, store):
+        self.syncs += 1
+        return True
+
+
+def test_pending_entries_coalesce_into_one_write():
+    storage = GatedStorage()
+    writer = StorageWriter(storage, None, interval=3600)
+    writer.start()
+    first = writer.submit({'n': 0})
+    time.sleep(0.05)  # the thread is now stuck writing the first entry
+    futures = [writer.submit({'n': n}) for n in range(1, 50)]
+    storage.gate.set()
+    assert writer.flush() is True
+    assert all(future.done() and future.exception() is None for future in [first] + futures)
+    assert [len(group) for group in storage.writes] == [1, 49]
+    assert [entry['n'] for group in storage.writes for entry in group] == list(range(50))
+    writer.stop()
+
+
+def test_failed_write_fails_its_futures_only():
+    storage = GatedStorage()
+    storage.gate.set()
+    writer = StorageWriter(storage, None, interval=3600)
+    writer.start()
+    failed = writer.submit({'fail': True})
+    with pytest.raises(WriteError) as error:
+        failed.result(timeout=1)
+    assert isinstance(error.value.__cause__, OSError)
+    assert writer.submit({'n': 1}).result(timeout=1) is None
+    writer.stop()
+
+
+def test_failed_group_fails_only_the_offending_entry():
+    storage = GatedStorage()
+    writer = StorageWriter(storage, None, interval=3600)
+    writer.start()
+    writer.submit({'n': 0})
+    time.sleep(0.05)
+    futures = [writer.submit({'n': n, 'fail': n == 3}) for n in range(1, 6)]
+    storage.gate.set()
+    writer.flush()
+    assert [future.exception() is not None for future in futures] == [False, False, True, False, False]
+    assert [entry['n'] for group in storage.writes for entry in group] == [0, 1, 2, 4, 5]
+    writer.stop()
+
+
+def test_failed_write_is_rolled_back_in_memory(data_file, monkeypatch):
+    store = MonkeyStore(storage=WalStorage(data_file), flush_interval=3600)
+    store.open()
+    store.put(make_record('a', name='Abu')).result()
+    write = store.storage.write
+    gate = threading.Event()
+
+    def failing_write(entries):
+        gate.wait()
+        if any(entry.get('record', {}).get('name') == 'Bad' for entry in entries):
+            raise OSError("disk full")
+        write(entries)
+
+    monkeypatch.setattr(store.storage, 'write', failing_write)
+    store.put(make_record('b', name='Momo'))
+    time.sleep(0.05)  # the thread is now stuck writing it
+    renamed = store.put(make_record('a', name='Bad'))
+    created = store.put(make_record('c', name='Bad', species='howler'))
+    other = store.put(make_record('d', name='Zed'))
+    assert store.get('a')['name'] == 'Bad'
+    gate.set()
+    store.flush()
+
+    for failed, monkey_id in ((renamed, 'a'), (created, 'c')):
+        with pytest.raises(WriteError) as error:
+            failed.result()
+        assert error.value.reverted == [monkey_id]
+    assert other.result() is None
+    assert store.get('a')['name'] == 'Abu'
+    assert 'c' not in store
+    assert store.find_by_name('capuchin', 'Abu') == 'a'
+    store.close()
+    reopened = MonkeyStore(storage=WalStorage(data_file), flush_interval=0)
+    reopened.open()
+    assert reopened.all() == store.all()
+    reopened.close()
+
+
+def test_failed_write_is_rolled_back_on_the_attached_loop(data_file, monkeypatch):
+    store = MonkeyStore(storage=WalStorage(data_file), flush_interval=3600)
+    store.open()
+    loop = asyncio.new_event_loop()
+    store.attach(loop)
+
+    def failing_write(entries):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store.storage, 'write', failing_write)
+    failed = store.put(make_record('a', name='Abu'))
+    time.sleep(0.05)  # the thread has failed the write by now
+    assert not failed.done()
+    assert 'a' in store
+    with pytest.raises(WriteError):
+        loop.run_until_complete(asyncio.wrap_future(failed, loop=loop))
+    assert 'a' not in store
+    loop.close()
+    monkeypatch.undo()
+    store.close()
+
+
+def test_snapshots_leave_out_unwritten_mutations(data_file, monkeypatch):
+    store = MonkeyStore(storage=WalStorage(data_file), flush_interval=3600)
+    store.open()
+    store.put(make_record('a', name='Abu')).result()
+    write = store.storage.write
+    gate = threading.Event()
+
+    def gated_write(entries):
+        gate.wait()
+        write(entries)
+
+    monkeypatch.setattr(store.storage, 'write', gated_write)
+    store.put(make_record('b', name='Momo'))
+    time.sleep(0.05)  # the thread is now stuck writing it
+    store.put(make_record('a', name='Zed'))
+    store.delete('b')
+    assert store.get('a')['name'] == 'Zed'
+    data, _ = store.snapshot()
+    assert list(data) == ['a']
+    assert data['a']['name'] == 'Abu'
+    gate.set()
+    store.flush()
+    data, _ = store.snapshot()
+    assert data == store.all()
+    assert data['a']['name'] == 'Zed'
+    store.close()
+
+
+def test_queue_is_bounded():
+    storage = GatedStorage()
+    writer = StorageWriter(storage, None, interval=3600, max_pending=5)
+    writer.start()
+    writer.submit({'n': 0})
+    time.sleep(0.05)
+    for n in range(5):
+        writer.submit({'n': n})
+    waiter = threading.Thread(target=writer.wait_for_room)
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    storage.gate.set()
+    waiter.join(1)
+    assert not waiter.is_alive()
+    writer.stop()
+    assert storage.syncs == 1
+
+
+def test_close_writes_everything_queued(data_file):
+    store = MonkeyStore(storage=WalStorage(data_file), flush_interval=3600)
+    store.open()
+    for i in range(100):
+        store.put(make_record(str(i), name=f'Monkey{i}'))
+    store.close()
+    reopened = MonkeyStore(storage=WalStorage(data_file), flush_interval=0)
+    reopened.open()
+    assert len(reopened) == 100
+    reopened.close()
+
+
+def test_get_latency_stays_low_during_a_large_write(data_file, monkeypatch):
+    store = MonkeyStore(storage=WalStorage(data_file), flush_interval=0.05)
+    store.open()
+    monkeypatch.setattr(server, 'store', store)
+    monkeypatch.setattr(server, 'mutation_locks', KeyedLocks())
+    store.put(make_record('probe', name='Probe')).result()
+
+    # A slow disk under a registry-sized write
+    write = store.storage.write
+
+    def slow_write(entries):
+        time.sleep(0.5)
+        write(entries)
+
+    monkeypatch.setattr(store.storage, 'write', slow_write)
+    registry = {str(i): make_record(str(i), name=f'Monkey{i}') for i in range(20000)}
+    registry['probe'] = make_record('probe', name='Probe')
+    pending = store.replace(registry)
+
+    async def measure():
+        transport = httpx.ASGITransport(app=server.app)
+        latencies = []
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+            update = asyncio.create_task(http.put('/api/monkeys/probe', json={'age_years': 9}))
+            while not pending.done():
+                start = time.perf_counter()
+                response = await http.get('/api/monkeys/probe')
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+            assert (await update).status_code == 200
+        return sorted(latencies)
+
+    latencies = asyncio.run(measure())
+    store.close()
+    assert len(latencies) >= 50
+    p99 = latencies[int(len(latencies) * 0.99)]
+    assert p99 < 0.05, p99
+
+
+def test_full_queue_does_not_block_the_event_loop(data_file, monkeypatch):
+    store = MonkeyStore(storage=WalStorage(data_file), flush_interval=3600, max_pending=2)
+    store.open()
+    monkeypatch.setattr(server, 'store', store)
+    monkeypatch.setattr(server, 'mutation_locks', KeyedLocks())
+    store.put(make_record('probe', name='Probe')).result()
+    write = store.storage.write
+    gate = threading.Event()
+
+    def stalled_write(entries):
+        gate.wait()
+        write(entries)
+
+    monkeypatch.setattr(store.storage, 'write', stalled_write)
+    store.put(make_record('a', name='Abu'))
+    time.sleep(0.05)  # the thread is now stuck writing it
+    store.put(make_record('b', name='Momo'))
+    store.put(make_record('c', name='Zed'))
+    assert not store.has_room()
+
+    async def requests():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+            update = asyncio.create_task(http.put('/api/monkeys/probe', json={'age_years': 9}))
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            response = await http.get('/api/monkeys/probe')
+            latency = time.perf_counter() - start
+            assert response.json()['age_years'] == 5
+            gate.set()
+            return latency, await update
+
+    # Unstalls the disk even if the loop is blocked, so a regression fails
+    # rather than hangs
+    threading.Timer(1, gate.set).start()
+    latency, update = asyncio.run(requests())
+    assert latency < 0.5, latency
+    assert update.status_code == 200
+    assert store.get('probe')['age_years'] == 9
+    store.close()